@@ -1,5 +1,6 @@
 import streamlit as st
 import warnings
+import app_paths
 
 # CUSTOMIZE FUN APP COLORS HERE:
 st.markdown(
@@ -79,16 +80,16 @@ col1, col2 = st.sidebar.columns(2)
 
 # Image for NSIDC on the left column
 with col1:
-    st.image("/workspaces/Greenland-icebergmeltrate-interactive/Iceberg-images/NSIDC-Streamlit.png", caption="NSIDC Banner", use_container_width=True, width=240)
+    st.image(app_paths.app_path("Iceberg-images", "NSIDC-Streamlit.png"), caption="NSIDC Banner", use_container_width=True, width=240)
 
 # Image for NSF on the right column
 with col2:
-    st.image("/workspaces/Greenland-icebergmeltrate-interactive/Iceberg-images/NSF-streamlit.png", caption="NSF Banner", use_container_width=True, width=250)
+    st.image(app_paths.app_path("Iceberg-images", "NSF-streamlit.png"), caption="NSF Banner", use_container_width=True, width=250)
 
 # Existing sidebar images
-st.sidebar.image("/workspaces/Greenland-icebergmeltrate-interactive/Iceberg-images/Institutions-streamlit.png")
-st.sidebar.image("Iceberg-images/Scenic-glacier-streamlit.png", caption="Tundra ponds form along the coast near Ilulissat, Greenland, while icebergs are visible along the horizon. Credit: Twila Moon, NSIDC")
-st.sidebar.image("Iceberg-images/Chilly-iceberg-streamlit.png", caption="Credit: Twila Moon, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Institutions-streamlit.png"))
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Scenic-glacier-streamlit.png"), caption="Tundra ponds form along the coast near Ilulissat, Greenland, while icebergs are visible along the horizon. Credit: Twila Moon, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Chilly-iceberg-streamlit.png"), caption="Credit: Twila Moon, NSIDC")
 
 # Links section
 st.markdown("<h3>If you liked this ICE-AGE application, you may also be interested in: </h3>", unsafe_allow_html=True)
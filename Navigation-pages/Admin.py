@@ -0,0 +1,95 @@
+import streamlit as st
+import pandas as pd
+import warnings
+import data_cache
+import app_paths
+import page_registry
+import shapefile_catalog
+
+# CUSTOMIZE FUN APP COLORS HERE:
+st.markdown(
+    """
+    <style>
+    /* Main page background color */
+    .stApp {
+        background-color: #1a1a1a;
+    }
+    /* Sidebar background color */
+    [data-testid="stSidebar"] {
+        background-color: #333333;
+    }
+    /* Title text color */
+    .stTitle {
+        color: #000000;
+    }
+    </style>
+    """,
+    unsafe_allow_html=True
+)
+
+warnings.filterwarnings("ignore")
+
+st.title("🛠️ Admin")
+st.markdown("Health of the shared data cache used by every page. The cache lives for the life of the server process and is shared by all sessions.")
+
+# Data cache hit/miss counters:
+st.subheader("Data cache")
+stats = data_cache.cache_stats()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Hits", stats["hits"])
+col2.metric("Misses", stats["misses"])
+col3.metric("Hit rate", f"{stats['hit_rate']:.0%}")
+col4.metric("Evictions", stats["evictions"])
+st.progress(min(stats["size_mb"] / stats["max_mb"], 1.0) if stats["max_mb"] else 0.0, text=f"{stats['size_mb']:.1f} MB of {stats['max_mb']:.0f} MB used by {stats['entries']} entries (set ICEAGE_CACHE_MB to change the ceiling)")
+
+# Cache misses run on a shared pool; identical loads requested at the same time run only once:
+st.subheader("Compute pool")
+compute = data_cache.compute_stats()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Loads executed", compute["executed"])
+col2.metric("Coalesced", compute["coalesced"], help="Requests that waited for an identical load already running instead of starting their own")
+col3.metric("Running now", f"{compute['running']} / {compute['workers']}")
+col4.metric("Failed", compute["failed"])
+st.caption(f"{compute['compute_s']:.1f} s spent loading, {compute['coalesced_wait_s']:.1f} s spent waiting on shared loads (set ICEAGE_COMPUTE_WORKERS to change the pool size)")
+
+# This table lists what is currently cached, least recently used first:
+entries = data_cache.cache_entries()
+if entries:
+    entry_df = pd.DataFrame(
+        [{"Kind": key[0], "Source": ", ".join(path for path, _ in key[1]), "Size (MB)": round(size / 1e6, 3)} for key, size in entries]
+    )
+    st.dataframe(entry_df, use_container_width=True)
+else:
+    st.info("The cache is empty. Visit a page to fill it up!")
+
+if st.button("🧹 Clear data cache"):
+    data_cache.clear_cache()
+    st.success("Cache cleared.")
+
+# How long each page took to start, the first time in this process (cold) and after that (warm):
+st.subheader("Page load times")
+timings = page_registry.page_timings()
+if timings:
+    st.dataframe(pd.DataFrame(timings), use_container_width=True, hide_index=True)
+    st.caption("Pages are compiled once per server process. The cold start also pays for the first import of the libraries listed, which later pages then share.")
+else:
+    st.info("No page has been opened through the app yet.")
+
+# What the shapefile catalog (used for the site/date selectboxes) currently knows about:
+st.subheader("Shapefile catalog")
+catalog = shapefile_catalog.get_catalog()
+catalog_stats = catalog.stats()
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Sites", catalog_stats["sites"])
+col2.metric("Date pairs", catalog_stats["date_pairs"])
+col3.metric("Shapefiles", catalog_stats["shapefiles"])
+col4.metric("Missing sidecar files", catalog_stats["incomplete"])
+st.caption(("Watching the folders for changes." if catalog_stats["watching"] else f"Checking folder modification times at most every {shapefile_catalog.CATALOG_POLL_SECONDS:.0f} s.") + f" {catalog_stats['unreadable']} shapefiles can't be read (no .shx) and are left out of the selectboxes.")
+if catalog_stats["incomplete"]:
+    with st.expander("Shapefiles with missing sidecar files"):
+        st.dataframe(pd.DataFrame(catalog.incomplete(), columns=["Site", "Date pair", "Shapefile", "Missing"]).assign(Missing=lambda df: df["Missing"].str.join(", ")), use_container_width=True, hide_index=True)
+
+# Where the app reads its data from (see app_paths.py):
+st.subheader("Data locations")
+st.dataframe(pd.DataFrame(app_paths.resolved_paths()), use_container_width=True, hide_index=True)
+st.caption(f"Config file: {app_paths.config_file()} · set the environment variables or the [paths] section and restart the app to move the data.")
@@ -1,11 +1,12 @@
 import streamlit as st
 from streamlit_folium import st_folium
-import geopandas as gpd
 import folium
 import pandas as pd
 import warnings
 import matplotlib.pyplot as plt  
-import seaborn as sns
+import data_cache
+from glacier_index import glacier_footprints
+import app_paths
 
 
 # This will allow you to customize the fun application colors:
@@ -89,18 +90,15 @@ map_style = st.sidebar.selectbox(
 )
 
 #Define your path to data here:
-csv_file_path = "/workspaces/Greenland-icebergmeltrate-interactive/Glacier-Locations.csv"
-natural_earth_path = "/workspaces/Greenland-icebergmeltrate-interactive/ne_110m_admin_0_countries.zip"
-histo_csv_file_path = "/workspaces/Greenland-icebergmeltrate-interactive/abbreviations-datepairings.csv"
+csv_file_path = app_paths.data_path("Glacier-Locations.csv")
+natural_earth_path = app_paths.data_path("ne_110m_admin_0_countries.zip")
+histo_csv_file_path = app_paths.data_path("abbreviations-datepairings.csv")
 
 #Function for the interactive map:
 def create_interactive_map(glacier_sites, map_style):
-    # Load Natural Earth dataset
-    world = gpd.read_file(natural_earth_path)
-    greenland = world[world['NAME'] == 'Greenland']
-
-    # This will convert Greenland to GeoJSON for Folium package: 
-    greenland_geojson = greenland.to_crs("EPSG:4326").__geo_interface__
+    # Load Natural Earth dataset; Greenland comes back already converted to GeoJSON for the Folium package
+    # and is cached between reruns, so the zip is only opened once:
+    greenland_geojson = data_cache.greenland_geojson(natural_earth_path)
     m = folium.Map(location=[72, -40], zoom_start=4, tiles=map_style)  
 
     # Main Greenland shapefile customization:
@@ -110,6 +108,14 @@ def create_interactive_map(glacier_sites, map_style):
         style_function=lambda x: {"fillColor": "#3156de", "color": "black", "weight": 1.0},
     ).add_to(m)
 
+    # Glacier outlines from All_Glacier_Coordinates.csv, built once from the grouped coordinate arrays:
+    folium.GeoJson(
+        glacier_footprints(),
+        name="Glaciers",
+        style_function=lambda x: {"fillColor": "white", "color": "white", "weight": 1.5, "fillOpacity": 0.5},
+        tooltip=folium.GeoJsonTooltip(fields=["glacier_name", "glacier_id"], aliases=["Glacier:", "Glacier ID:"]),
+    ).add_to(m)
+
     # Sorts sites into regional categories: 
     region_colors = {
         'SE': 'red', 
@@ -137,7 +143,7 @@ def create_interactive_map(glacier_sites, map_style):
 # Create the map with interactive controls in an expandable section
 with st.expander("🗺️ Map of Greenland with selected study sites", expanded=True):
     try:
-        glacier_sites = pd.read_csv(csv_file_path)
+        glacier_sites = data_cache.read_csv(csv_file_path)
         required_columns = {'LAT', 'LON', 'Official_n', 'Glacier_ID', 'Region'}
         if not required_columns.issubset(glacier_sites.columns):
             st.error(f"The uploaded file must contain the following columns: {', '.join(required_columns)}")
@@ -153,8 +159,8 @@ with st.expander("How to access ICE-AGE:", expanded=True):
     st.markdown("ICE-AGE data will be archived at the Arctic Data Center. Code is available via GitHub, and Zenodo for future growth and automated figure generation.")
 
 # Sidebar images with captions (using use_container_width instead of use_column_width)
-st.sidebar.image("Iceberg-images/aerial-shot-streamlit.png", caption = "Low-angled sunlight illuminates Antarctica’s Matusevich Glacier in this image from September 6, 2010. The image was acquired by the Advanced Land Imager (ALI) on NASA’s Earth Observing-1 (EO-1) satellite, and it shows a deeply crevassed glacier breaking apart amid ocean waves. Credit: NASA")
-st.sidebar.image("Iceberg-images/aerial-iceborgs.png", caption = "Aerial view of icebergs in the sea ice near Qaanaaq, Greenland. Icebergs form when chunks of ice calve, or break off, from glaciers, ice shelves, or a larger iceberg. The North Atlantic and the cold waters surrounding Antarctica are home to most of the icebergs on Earth.Credit: Shari Fox, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "aerial-shot-streamlit.png"), caption = "Low-angled sunlight illuminates Antarctica’s Matusevich Glacier in this image from September 6, 2010. The image was acquired by the Advanced Land Imager (ALI) on NASA’s Earth Observing-1 (EO-1) satellite, and it shows a deeply crevassed glacier breaking apart amid ocean waves. Credit: NASA")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "aerial-iceborgs.png"), caption = "Aerial view of icebergs in the sea ice near Qaanaaq, Greenland. Icebergs form when chunks of ice calve, or break off, from glaciers, ice shelves, or a larger iceberg. The North Atlantic and the cold waters surrounding Antarctica are home to most of the icebergs on Earth.Credit: Shari Fox, NSIDC")
 
 st.title("Contents of ICE-AGE application:")
 
@@ -198,7 +204,7 @@ with st.expander("🏞️ Regional Iceberg Metrics", expanded=True):
 
 
 st.info("ICE-AGE will be under continuous development and growth! Some sites do not have data quite yet, so we appreciate your patience while we work on updating our datasets. The following histogram shows how much data each study site has.")
-df = pd.read_csv(histo_csv_file_path)
+df = data_cache.read_csv(histo_csv_file_path)
 
 import streamlit as st
 import matplotlib.pyplot as plt
@@ -211,10 +217,10 @@ import pandas as pd
 import numpy as np
 
 # Path to your CSV file (update this path if necessary)
-csv_file_path = "/workspaces/Greenland-icebergmeltrate-interactive/abbreviations-datepairings.csv"
+csv_file_path = app_paths.data_path("abbreviations-datepairings.csv")
 
 # Read the CSV file
-df = pd.read_csv(csv_file_path)
+df = data_cache.read_csv(csv_file_path)
 
 # Check if the necessary columns exist
 if 'Official_n' in df.columns and 'Corresponding icebergs' in df.columns:
@@ -1,12 +1,12 @@
 import streamlit as st
 import os
-import geopandas as gpd
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
-from shapely.affinity import translate
-import io
+from data_cache import load_outlines
+from geometry_metrics import build_selection_dataset, dominant_angle, quartile_summary, selection_extent
+from iceberg_render import page_count, render_outline_grid, quartile_overlay, DEFAULT_QUARTILE_COLORS, DEFAULT_QUARTILE_OPACITY
+import time
 import warnings
+import app_paths
+from shapefile_catalog import get_catalog
 
 # This line will hide warnings on the front end of the application.
 warnings.filterwarnings("ignore")
@@ -33,8 +33,8 @@ st.markdown(
 )
 
 # The two lines below will display the images in the sidebar:
-st.sidebar.image("Iceberg-images/Swirly-iceberg-streamlit.png", caption="A sculpted Iceberg drifts off of Baffin Island, Nunavut. Icebergs form when chunks of ice calve, or break off, from glaciers, ice shelves, or a larger iceberg. The North Atlantic and the cold waters surrounding Antarctica are home to most of the icebergs on Earth. Credit: Shari Fox, NSIDC")
-st.sidebar.image("Iceberg-images/Beautiful-icebergs-streamlit.png", caption="Credit: Twila Moon, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Swirly-iceberg-streamlit.png"), caption="A sculpted Iceberg drifts off of Baffin Island, Nunavut. Icebergs form when chunks of ice calve, or break off, from glaciers, ice shelves, or a larger iceberg. The North Atlantic and the cold waters surrounding Antarctica are home to most of the icebergs on Earth. Credit: Shari Fox, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Beautiful-icebergs-streamlit.png"), caption="Credit: Twila Moon, NSIDC")
 
 # Title of the page with description:
 st.title("🔍👀 Iceberg Shapefile Viewer:")
@@ -46,10 +46,14 @@ st.markdown("The shapefiles are then divided into four groups based on area, sim
 #The spreadsheet in the link below will display the available data:
 st.info('Click here for the [Fjord Abbreviation List & Paired Dates](https://docs.google.com/spreadsheets/d/1kCcKqf717kK3_Xx-GDe0f61jhlUpZ5n6BN1qtiw7S4w/edit?gid=0#gid=0)')
 
+
 #This will load the shapefiles, they will plot whether they exist within the folders or not.
-base_path = "Iceberg-shapefiles"
+base_path = app_paths.shapefiles_path()
+selection = None
 if os.path.exists(base_path):
-    site_names = [name for name in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, name))]
+    # Sites and date folders come from the shapefile catalog instead of listing the folders on every rerun:
+    catalog = get_catalog(base_path)
+    site_names = catalog.sites()
 
     # The default option will be KOG, so the user can see an example of the output:
     default_site_name = 'KOG'
@@ -58,8 +62,7 @@ if os.path.exists(base_path):
 #This will get all of the available data for the date folders for the selected site, then it will sort the dates.
     if site_name:
         site_path = os.path.join(base_path, site_name)
-        date_folders = [folder for folder in os.listdir(site_path) if '-' in folder]
-        date_folders.sort() 
+        date_folders = catalog.date_pairs(site_name)
         
         #This will Pre-load dates based on the available folders. The default date range is set here and it can be changed if you'd like.
         date_options = [(folder.split('-')[0], folder.split('-')[1]) for folder in date_folders]
@@ -77,66 +80,15 @@ if os.path.exists(base_path):
             target_folder = os.path.join(site_path, date_range_folder)
 
             if os.path.exists(target_folder):
-                shapefiles = [f for f in os.listdir(target_folder) if f.endswith('.shp')]
-
-                if shapefiles:
-                    st.subheader(f"Displaying {len(shapefiles)} Shapefiles")
-
-                    max_width, max_height = 0, 0
-                    shapefile_metadata = []
-                    area_data = []
-
-                    for filename in shapefiles:
-                        shapefile_path = os.path.join(target_folder, filename)
-                        gdf = gpd.read_file(shapefile_path)
-
-                        if gdf.crs is None:
-                            gdf = gdf.set_crs('EPSG:3413')
-                        gdf = gdf.to_crs('EPSG:3413')
-
-                        if not gdf.empty:
-                            overall_bounds = gdf.total_bounds
-                            width = overall_bounds[2] - overall_bounds[0]
-                            height = overall_bounds[3] - overall_bounds[1]
-                            max_width = max(max_width, width)
-                            max_height = max(max_height, height)
-
-                            area = gdf.area.sum() 
-                            area_data.append(area)
-
-                            shapefile_metadata.append((filename, gdf, width, height))
-
-                    num_columns = 3
-                    cols = st.columns(num_columns)
-
-                    for i, (filename, gdf, width, height) in enumerate(shapefile_metadata):
-                        col = cols[i % num_columns]
-                        with col:
-                            fig, ax = plt.subplots(figsize=(6, 6))
-                            color = '#f5a442' if early_date in filename else '#8bc34a'
-
-                            overall_bounds = gdf.total_bounds
-                            gdf['geometry'] = gdf['geometry'].apply(lambda geom: translate(geom, -overall_bounds[0], -overall_bounds[1]))
-
-                            gdf.plot(ax=ax, color=color, edgecolor='black', alpha=0.8, linewidth=2)
-
-                            ax.set_xlim(0, max_width)
-                            ax.set_ylim(0, max_height)
-                            ax.set_xlabel("Width (m)")
-                            ax.set_ylabel("Height (m)")
-                            ax.set_title(filename, fontsize=10)
-                            ax.axis("on")
-
-                            st.pyplot(fig)
-
-                    # This will display an iceberg area information table, necessary for quartile sorting:
-                    area_df = pd.DataFrame({"Shapefile": shapefiles, "Area (m²)": area_data})
-                    st.subheader("Iceberg Area Information:")
-                    st.dataframe(area_df)
+                # All outlines of the selection are read and measured exactly once:
+                load_start = time.perf_counter()
+                selection = build_selection_dataset(load_outlines(site_name, date_range_folder), early_date)
+                load_seconds = time.perf_counter() - load_start
 
 #This codeblock is helpful for debugging, locating missing files, and ensuring that the path to data is correct:
-                else:
+                if selection.empty:
                     st.error(f"No shapefiles found in the folder: {target_folder}") 
+                    selection = None
             else:
                 st.error(f"Target folder '{target_folder}' does not exist. Please check the dates and site name.")
         else:
@@ -144,88 +96,61 @@ if os.path.exists(base_path):
 else:
     st.error(f"Base path '{base_path}' does not exist. Please check your folder structure.")
 
-# This function will calculate the dominant angle of the iceberg shapes, so that they plot a little nicer and more uniform. It will use the average dominant angle.
-def calculate_dominant_angle(gdf):
-    """Calculate the dominant angle for the geometry in the shapefile."""
-    gdf = gdf[gdf['geometry'].is_valid]  # Ensure geometry is valid
-    bounds = gdf['geometry'].apply(lambda geom: geom.minimum_rotated_rectangle)
-    
-    def longest_edge_angle(box):
-        coords = np.array(box.exterior.coords)
-        edges = np.diff(coords, axis=0)[:-1]  
-        lengths = np.linalg.norm(edges, axis=1)
-        longest_idx = np.argmax(lengths)
-        longest_edge = edges[longest_idx]
-        angle = np.arctan2(longest_edge[1], longest_edge[0])
-        return np.degrees(angle)
-    
-    angles = bounds.apply(longest_edge_angle)
-    return angles.mean()  
+if selection is None:
+    st.stop()
 
-st.title("📊 Quartile-Based Iceberg Shape Comparison")
-area_df["Quartile"] = pd.qcut(area_df["Area (m²)"], 4, labels=["Q1", "Q2", "Q3", "Q4"])
+render_start = time.perf_counter()
+timing_placeholder = st.empty()
 
-#Change the colors of the quartiles using the Hex Color picker:
-quartile_colors = {"Q1": "#8bd67a", "Q2": "#e080d7", "Q3": "#f7bf07", "Q4": "#f78307"}
-quartile_opacity = {"Q1": 0.4, "Q2": 0.4, "Q3": 0.4, "Q4": 0.4}
-
-# This will help with consistent scaling:
-max_width, max_height = 0, 0
-for shapefile in area_df["Shapefile"]:
-    shapefile_path = os.path.join(target_folder, shapefile)
-    gdf = gpd.read_file(shapefile_path)
-    
-    if gdf.crs is None:
-        gdf = gdf.set_crs('EPSG:3413')
-    gdf = gdf.to_crs('EPSG:3413')
-    
-    if not gdf.empty:
-        bounds = gdf.total_bounds
-        max_width = max(max_width, bounds[2] - bounds[0])
-        max_height = max(max_height, bounds[3] - bounds[1])
-
-# Subplot customization:
-fig, axes = plt.subplots(2, 2, figsize=(12, 12), sharex=True, sharey=True)
-axes = axes.flatten()
-
-for i, quartile in enumerate(["Q1", "Q2", "Q3", "Q4"]):
-    ax = axes[i]
-    ax.set_title(f"Quartile {quartile}", fontsize=10)
-    
-    quartile_files = area_df[area_df["Quartile"] == quartile]["Shapefile"]
-    
-    for shapefile in quartile_files:
-        shapefile_path = os.path.join(target_folder, shapefile)
-        gdf = gpd.read_file(shapefile_path)
-
-        if gdf.crs is None:
-            gdf = gdf.set_crs('EPSG:3413') #Proper projection for Greenland; this value will change depending on where your data is!
-        gdf = gdf.to_crs('EPSG:3413')
-        
-        color = quartile_colors[quartile]
-        opacity = quartile_opacity[quartile]
+# The plots share one scale, set by the largest iceberg in the selection:
+max_width, max_height = selection_extent(selection)
 
-        overall_bounds = gdf.total_bounds
-        gdf['geometry'] = gdf['geometry'].apply(lambda geom: translate(geom, -overall_bounds[0], -overall_bounds[1]))
+st.subheader(f"Displaying {len(selection)} Shapefiles")
 
-        gdf.plot(ax=ax, color=color, edgecolor='black', alpha=opacity, linewidth=2)
-    
-    ax.set_xlim(0, max_width)
-    ax.set_ylim(0, max_height)
-    ax.set_xlabel("Width (m)")
-    ax.set_ylabel("Height (m)")
+# Large selections are split into pages; each page is drawn as one small-multiples image:
+page_col, size_col = st.columns(2)
+with size_col:
+    page_size = st.select_slider("Icebergs per page", options=[6, 12, 24, 48, 96], value=12, key="grid_page_size")
+num_pages = page_count(len(selection), page_size)
+with page_col:
+    grid_page = st.number_input(f"Page (1 - {num_pages})", min_value=1, max_value=num_pages, value=1, step=1, key="grid_page") - 1
 
-#Plot the figure!
-st.pyplot(fig)
+grid_png = render_outline_grid(selection, max_width, max_height, page=grid_page, page_size=page_size)
+st.image(grid_png, use_container_width=True)
 
-# This will allow you to save the image as a .png file. 
-image_stream = io.BytesIO()
-fig.savefig(image_stream, format='png', bbox_inches="tight")
-image_stream.seek(0)
+#Change the colors of the quartiles using the Hex Color picker:
+with st.expander("🎨 Quartile colors and opacity"):
+    color_cols = st.columns(4)
+    quartile_colors = {q: color_cols[i].color_picker(q, DEFAULT_QUARTILE_COLORS[q], key=f"quartile_color_{q}") for i, q in enumerate(DEFAULT_QUARTILE_COLORS)}
+    shared_opacity = st.slider("Opacity", 0.1, 1.0, DEFAULT_QUARTILE_OPACITY["Q1"], 0.05, key="quartile_opacity")
+    quartile_opacity = {q: shared_opacity for q in DEFAULT_QUARTILE_COLORS}
+    # Turn every berg so its long axis is horizontal before stacking, to compare shapes rather than headings:
+    align_bergs = st.checkbox("Rotate icebergs to a common axis", value=False, key="quartile_align")
+
+# The quartile figure and area table are cached per site, date pair, colors/opacity and data version,
+# so they are only drawn again when one of those changes (or can be pre-warmed with `python iceberg_render.py prewarm`):
+quartile_png, area_df = quartile_overlay(site_name, date_range_folder, quartile_colors, quartile_opacity, selection=selection, align=align_bergs)
+
+# This will display an iceberg area information table, necessary for quartile sorting:
+st.subheader("Iceberg Area Information:")
+st.dataframe(area_df)
+with st.expander("📐 Area range of each quartile"):
+    st.dataframe(quartile_summary(selection).round(1), hide_index=True)
+
+st.title("📊 Quartile-Based Iceberg Shape Comparison")
 
+#Plot the figure!
+st.caption(f"Dominant long-axis orientation: {dominant_angle(selection['angle']):.0f}° from the map grid x axis · median elongation {selection['elongation'].median():.1f}")
+st.image(quartile_png, use_container_width=True)
+
+# This will allow you to save the image as a .png file, straight from the cached bytes:
 st.download_button(
     label="💾 Save Image",
-    data=image_stream,
+    data=quartile_png,
     file_name="quartile_icebergs.png",
     mime="image/png"
 )
+
+# Load vs. render cost for this rerun, shown above the plots:
+render_seconds = time.perf_counter() - render_start
+timing_placeholder.caption(f"⏱️ Loaded {len(selection)} outlines in {load_seconds:.2f} s · rendered in {render_seconds:.2f} s")
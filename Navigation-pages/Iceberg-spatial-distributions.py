@@ -1,10 +1,15 @@
 import streamlit as st
-import pandas as pd
-import geopandas as gpd
 import folium
 from streamlit_folium import st_folium
-import os
+import data_cache
+from map_layers import site_feature_collection, filter_features, feature_collection_center, detail_level, site_summary, lod_feature_collection
+from outline_store import iter_date_pairs
+from outline_index import get_index
+from drift import site_drift, drift_feature_collection
+from shapefile_catalog import get_catalog
+from berg_catalog import get_berg_catalog
 import warnings
+import app_paths
 
 # CUSTOMIZE FUN APP COLORS HERE:
 st.markdown(
@@ -37,7 +42,7 @@ st.title("🗺️ Visualize iceberg spatial distributions")
 st.markdown("This interactive map allows you to zoom into specific sites and visualize iceberg distributions in Greenland.")
 
 # Sidebar image and informational links
-st.sidebar.image("Iceberg-images/Glacier-iceberg-Streamlit.png", caption="Iceberg in Kongsfjord, Svalbard. Credit: Allen Pope, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Glacier-iceberg-Streamlit.png"), caption="Iceberg in Kongsfjord, Svalbard. Credit: Allen Pope, NSIDC")
 st.sidebar.markdown('Fill out the prompts below to display the interactive map!')
 st.markdown('👆Click the icebergs to view their width, height, and more details!')
 st.markdown('✋ Pan around the map to see how icebergs drift!')
@@ -47,82 +52,123 @@ st.markdown('🔎 Zoom out to see the full extent!')
 st.info('Click here for the [Fjord Abbreviation List & Paired Dates](https://docs.google.com/spreadsheets/d/1kCcKqf717kK3_Xx-GDe0f61jhlUpZ5n6BN1qtiw7S4w/edit?gid=0#gid=0)')
 
 # File paths
-csv_file_path = "/workspaces/Greenland-icebergmeltrate-interactive/Glacier-Locations.csv"
-shapefile_base_path = "/workspaces/Greenland-icebergmeltrate-interactive/Iceberg-shapefiles"
-
-# Function to load and reproject shapefile
-def load_and_reproject_shapefile(filepath):
-    gdf = gpd.read_file(filepath)
-    if gdf.crs is None:
-        gdf.set_crs("EPSG:3413", inplace=True)  
-    return gdf.to_crs("EPSG:4326")  
-
-# Function to calculate width and height of iceberg
-def calculate_width_height(gdf):
-    # Reproject to EPSG:3413 (meters)
-    gdf = gdf.to_crs("EPSG:3413")
-    
-    # Get the bounding box of the iceberg shape in meters
-    bounds = gdf.total_bounds
-    width = bounds[2] - bounds[0]  # x_max - x_min (in meters)
-    height = bounds[3] - bounds[1]  # y_max - y_min (in meters)
-    
-    # Return width and height rounded to 2 decimal places
-    return round(width, 2), round(height, 2)
+csv_file_path = app_paths.data_path("Glacier-Locations.csv")
+shapefile_base_path = app_paths.shapefiles_path()
 
 # Function to get available date ranges based on site ID
 def get_available_dates(site_id):
-    site_path = os.path.join(shapefile_base_path, site_id)
-    if os.path.exists(site_path):
-        return [f for f in os.listdir(site_path) if os.path.isdir(os.path.join(site_path, f))]
-    return []
+    return get_catalog(shapefile_base_path).date_pairs(site_id)
 
 # Function to create the interactive map with icebergs
-def create_interactive_map(glacier_sites, site_id, early_date, later_date, selected_icebergs):
+def create_interactive_map(glacier_sites, site_id, early_date, later_date, selected_icebergs, show_drift=False):
     site = glacier_sites[glacier_sites['Glacier_ID'] == site_id]
     site_lat, site_lon = site.iloc[0]['LAT'], site.iloc[0]['LON']
     
     # Initialize map
     m = folium.Map(location=[site_lat, site_lon], zoom_start=12.3, tiles="CartoDB positron")
     
-    # Define color mapping for dates
-    date_colors = {
-        early_date: "blue",
-        later_date: "green"
-    }
-
-    # Add iceberg shapefiles to the map
-    site_path = os.path.join(shapefile_base_path, site_id, f"{early_date}-{later_date}")
-    if os.path.exists(site_path):
-        shapefiles = [f for f in os.listdir(site_path) if f.endswith(".shp")]
-        for iceberg in shapefiles:
-            shp_path = os.path.join(site_path, iceberg)
-            gdf = load_and_reproject_shapefile(shp_path)
-            
-            # Calculate width and height
-            width, height = calculate_width_height(gdf)
-            
-            color = "#7a1037" if early_date in iceberg else "#033b59" if later_date in iceberg else "gray"
-            popup_content = f"<strong>Iceberg ID:</strong> {iceberg}<br><strong>Width:</strong> {width} meters<br><strong>Height:</strong> {height} meters"
-            
-            # Add GeoJson to map with popups
+    # Add iceberg shapefiles to the map as one pre-merged FeatureCollection (a single Leaflet layer);
+    # popups and colors come from each feature's properties:
+    icebergs = filter_features(site_feature_collection(site_id, f"{early_date}-{later_date}"), selected_icebergs)
+    if icebergs["features"]:
+        folium.GeoJson(
+            icebergs,
+            name=f"{site_id} {early_date}-{later_date}",
+            style_function=lambda feature: {"color": feature["properties"]["color"], "weight": 1},
+            popup=folium.GeoJsonPopup(
+                fields=["iceberg", "width_m", "height_m", "glacier", "glacier_distance_km"],
+                aliases=["Iceberg ID:", "Width (meters):", "Height (meters):", "Nearest glacier:", "Distance to glacier (km):"],
+                max_width=300,
+            ),
+        ).add_to(m)
+
+        # Drift arrows from each berg's early to late position (paired in drift.py):
+        if show_drift:
+            pair_drift = site_drift(site_id)
+            pair_drift = pair_drift[(pair_drift["date_pair"] == f"{early_date}-{later_date}") & (pair_drift["early_file"].isin(selected_icebergs) | pair_drift["late_file"].isin(selected_icebergs))]
             folium.GeoJson(
-                gdf.__geo_interface__,
-                name=iceberg,
-                style_function=lambda x, color=color: {"color": color, "weight": 1},
-                popup=folium.Popup(popup_content, max_width=300)
+                drift_feature_collection(pair_drift),
+                name="Drift",
+                style_function=lambda feature: {"color": "#e8590c", "weight": 2},
+                tooltip=folium.GeoJsonTooltip(
+                    fields=["berg_id", "displacement_m", "speed_m_per_day", "area_change_pct"],
+                    aliases=["Iceberg:", "Drift (meters):", "Speed (m/day):", "Area change (%):"],
+                ),
             ).add_to(m)
-            
-            # Zoom into iceberg centroid
-            centroid = gdf.geometry.centroid.iloc[0]
-            m.location = [centroid.y, centroid.x]
-            m.zoom_start = 12
+
+        # Zoom into the icebergs
+        m.location = feature_collection_center(icebergs)
+        m.zoom_start = 12
     
     return m
 
+# Function to create the Greenland-wide map; what gets drawn depends on how far the user has zoomed in
+def create_all_sites_map(selected_sites, zoom, center, bounds):
+    m = folium.Map(location=center, zoom_start=zoom, tiles="CartoDB positron")
+    level = detail_level(zoom)
+
+    if level == "sites":
+        # Zoomed out: one marker per site with its iceberg count
+        summary = site_summary()
+        for site in summary[summary["site"].isin(selected_sites)].itertuples(index=False):
+            folium.Marker(
+                location=[site.lat, site.lon],
+                popup=f"<strong>Site:</strong> {site.site}<br><strong>Icebergs:</strong> {site.icebergs}<br><strong>Date pairs:</strong> {site.date_pairs}",
+                icon=folium.DivIcon(html=f'<div style="background:#033b59;color:white;border-radius:12px;padding:2px 6px;font-size:11px;white-space:nowrap;">{site.site} · {site.icebergs}</div>'),
+            ).add_to(m)
+    else:
+        # Zoomed in: simplified (or, close up, full-resolution) outlines for the visible part of the map only
+        icebergs = lod_feature_collection(level, selected_sites, bounds)
+        if icebergs["features"]:
+            folium.GeoJson(
+                icebergs,
+                name="Icebergs",
+                style_function=lambda feature: {"color": "blue", "weight": 1},
+                popup=folium.GeoJsonPopup(
+                    fields=["site", "date_pair", "iceberg", "width_m", "height_m"],
+                    aliases=["Site:", "Date:", "Iceberg ID:", "Width (meters):", "Height (meters):"],
+                    max_width=300,
+                ),
+            ).add_to(m)
+    return m, level
+
 # Read glacier sites and process user input
 try:
-    glacier_sites = pd.read_csv(csv_file_path)
+    glacier_sites = data_cache.read_csv(csv_file_path)
+
+    map_mode = st.sidebar.radio("Map mode:", ("Single site", "All sites"))
+    if map_mode == "All sites":
+        sites = sorted({site for site, _ in iter_date_pairs(shapefile_base_path)})
+        selected_sites = st.sidebar.multiselect("Select Sites to Include", sites, default=sites)
+
+        # The map view is remembered between reruns so the level of detail can follow the zoom:
+        view = st.session_state.setdefault("all_sites_view", {"zoom": 4, "center": [72, -40], "bounds": None})
+        if selected_sites:
+            map_object, level = create_all_sites_map(selected_sites, view["zoom"], view["center"], view["bounds"])
+            st.caption("Showing: " + ("site totals (zoom in to see outlines)" if level == "sites" else "full-resolution outlines" if level == "full" else "simplified outlines (zoom in for full detail)"))
+            map_state = st_folium(map_object, width=800, height=600, key="all_sites_map", returned_objects=["zoom", "center", "bounds", "last_clicked"])
+
+            # Click anywhere on the map to list the closest icebergs:
+            clicked = (map_state or {}).get("last_clicked")
+            if clicked:
+                closest = get_index().nearest(clicked["lng"], clicked["lat"], k=5, crs="EPSG:4326")
+                st.markdown(f"📍 Icebergs nearest to ({clicked['lat']:.4f}, {clicked['lng']:.4f}):")
+                st.dataframe(closest.assign(distance_m=closest["distance_m"].round(1)), hide_index=True)
+
+            if map_state and map_state.get("zoom") is not None:
+                new_bounds = map_state.get("bounds") or {}
+                new_view = {
+                    "zoom": map_state["zoom"],
+                    "center": [map_state["center"]["lat"], map_state["center"]["lng"]] if map_state.get("center") else view["center"],
+                    "bounds": ((new_bounds["_southWest"]["lat"], new_bounds["_southWest"]["lng"]), (new_bounds["_northEast"]["lat"], new_bounds["_northEast"]["lng"])) if new_bounds.get("_southWest") else None,
+                }
+                # Only redraw when the level of detail or the visible area of a detailed level actually changed:
+                if detail_level(new_view["zoom"]) != level or (level != "sites" and new_view["bounds"] != view["bounds"]):
+                    st.session_state["all_sites_view"] = new_view
+                    st.rerun()
+        else:
+            st.warning("Please select at least one site.")
+        st.stop()
     
     # Sidebar: Select site ID
     #site_id = st.sidebar.selectbox("Select Glacier Site", sorted(glacier_sites['Glacier_ID'].unique()))
@@ -137,19 +183,41 @@ try:
         st.error(f"No available date ranges found for site: {site_id}")
         early_date, later_date = "", ""
     
-    # Sidebar: Select icebergs for map
-    shapefile_dir = os.path.join(shapefile_base_path, site_id, f"{early_date}-{later_date}")
-    shapefiles = [f for f in os.listdir(shapefile_dir) if f.endswith(".shp")] if os.path.exists(shapefile_dir) else []
+    # Sidebar: Select icebergs for map (shapefiles missing their .shx can't be read, so they aren't listed)
+    shapefiles = get_catalog(shapefile_base_path).shapefiles(site_id, f"{early_date}-{later_date}")
     
-    plot_option = st.sidebar.radio("Plot icebergs:", ("Plot selected date range", "Select specific icebergs"))
+    # Filtering by area needs the berg catalog; it is only offered once that has been built
+    berg_catalog = get_berg_catalog(build=False)
+    plot_options = ("Plot selected date range", "Select specific icebergs") + (("Filter by area",) if berg_catalog is not None else ())
+    plot_option = st.sidebar.radio("Plot icebergs:", plot_options)
     
     # Select specific icebergs
     selected_icebergs = st.multiselect("Select Icebergs to View", shapefiles, default=shapefiles[:1]) if plot_option == "Select specific icebergs" else shapefiles
+
+    # Filter by area: the areas come from the berg catalog, so only the bergs in range are drawn
+    if plot_option == "Filter by area":
+        bergs = berg_catalog.query(site_id, [f"{early_date}-{later_date}"])
+        if len(bergs) and bergs["area"].min() < bergs["area"].max():
+            area_min, area_max = float(bergs["area"].min()), float(bergs["area"].max())
+            area_range = st.sidebar.slider("Area (m²):", area_min, area_max, (area_min, area_max))
+            in_range = set(bergs.loc[bergs["area"].between(*area_range), "source_file"])
+            selected_icebergs = [name for name in shapefiles if name in in_range]
     
+    show_drift = st.sidebar.checkbox("Show drift arrows", value=False)
+
     # Generate and display map
     if selected_icebergs:
-        map_object = create_interactive_map(glacier_sites, site_id, early_date, later_date, selected_icebergs)
+        map_object = create_interactive_map(glacier_sites, site_id, early_date, later_date, selected_icebergs, show_drift)
         st_folium(map_object, width=800, height=600)
+
+        if show_drift:
+            with st.expander("🧭 Iceberg drift between the two dates"):
+                pair_drift = site_drift(site_id)
+                pair_drift = pair_drift[pair_drift["date_pair"] == f"{early_date}-{later_date}"]
+                st.dataframe(
+                    pair_drift[["berg_id", "early_file", "late_file", "match_method", "displacement_m", "direction_deg", "days", "speed_m_per_day", "area_change_pct"]].round(1),
+                    hide_index=True,
+                )
     else:
         st.write("")
 
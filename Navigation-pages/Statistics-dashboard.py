@@ -1,10 +1,12 @@
 
 import streamlit as st
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import os
+import berg_catalog
+import melt_catalog
+import melt_correlation
+import melt_rates
+import melt_stats
 import warnings
+import app_paths
 
 # CUSTOMIZE FUN APP COLORS HERE:
 st.markdown(
@@ -34,19 +36,41 @@ st.title('📊 Iceberg Statistics Dashboard')
 st.markdown('This page will allow you to......')
 st.info('Click here for the [Fjord Abbreviation List & Paired Dates](https://docs.google.com/spreadsheets/d/1kCcKqf717kK3_Xx-GDe0f61jhlUpZ5n6BN1qtiw7S4w/edit?gid=0#gid=0)')
 
-# Base directory where data is stored
-base_path = "/workspaces/Greenland-icebergmeltrate-interactive/Melt-rates"
+# Every meltinfo CSV under Melt-rates/, collected into one table (see melt_catalog.py)
+catalog = melt_catalog.get_catalog()
 
-# Sidebar inputs with default values
+# Sidebar inputs, filled from the catalog so only site/date pairs that exist can be picked
 st.sidebar.header("Inputs")
-site_name = st.sidebar.selectbox("Select Site Name:", ["KOG", "SEK", "ASG"], index=0)  # Default is "KOG"
-early_date = st.sidebar.text_input("Enter Early Date (YYYYMMDD):", "20170515")  #Default date
-later_date = st.sidebar.text_input("Enter Later Date (YYYYMMDD):", "20170611")  
+site_options = catalog.sites
+mode = st.sidebar.radio("Mode:", ["Single date pair", "Compare sites"], horizontal=True)
+correlation_method = st.sidebar.radio("Correlation:", ["Pearson", "Spearman"], horizontal=True)
+
+if mode == "Single date pair":
+    site_name = st.sidebar.selectbox("Select Site Name:", site_options, index=site_options.index("KOG") if "KOG" in site_options else 0)
+    date_pair = st.sidebar.selectbox("Select Date Pair:", catalog.date_pairs(site_name) if site_name else [])
+
+    # Optional thresholds on the initial volume and the median draft
+    site_rows = catalog.query(sites=site_name, date_pairs=[date_pair]) if site_name and date_pair else catalog.table.iloc[:0]
+    volume_filter = draft_filter = None
+    if not site_rows.empty:
+        volume_min, volume_max = float(site_rows[melt_catalog.VOLUME_COLUMN].min()), float(site_rows[melt_catalog.VOLUME_COLUMN].max())
+        draft_min, draft_max = float(site_rows[melt_catalog.DRAFT_COLUMN].min()), float(site_rows[melt_catalog.DRAFT_COLUMN].max())
+        with st.sidebar.expander("Filter icebergs"):
+            if volume_min < volume_max:
+                volume_filter = st.slider("Initial volume (m³):", volume_min, volume_max, (volume_min, volume_max))
+            if draft_min < draft_max:
+                draft_filter = st.slider("Median draft (m):", draft_min, draft_max, (draft_min, draft_max))
+else:
+    # Any number of sites and date pairs, aggregated from the per-date-pair summaries in melt_stats.py
+    selected_sites = st.sidebar.multiselect("Select Sites:", site_options, default=site_options)
+    pair_options = sorted({pair for site in selected_sites for pair in catalog.date_pairs(site)})
+    selected_pairs = st.sidebar.multiselect("Select Date Pairs:", pair_options, default=pair_options)
+    compare_column = st.sidebar.selectbox("Compare Sites By:", melt_stats.STAT_COLUMNS, index=melt_stats.STAT_COLUMNS.index("MeltRate"))
 
 # Sidebar images
-st.sidebar.image("Iceberg-images/Ice-bridge-streamlit.png", caption="Surprising iceberg shapes drift in the coastal waters near Ilulissat, Greenland. Credit: Twila Moon, NSIDC")
-st.sidebar.image("Iceberg-images/Icebergs-streamlit.png", caption="An iceberg drifts in the sea off the coast of Ilulissat, Greenland. Credit: Twila Moon, NSIDC")
-st.sidebar.image("Iceberg-images/Sunset-icebergs-streamlit.png", caption="Icebergs crowd the waters along the northwestern Greenland coast. Credit: Twila Moon, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Ice-bridge-streamlit.png"), caption="Surprising iceberg shapes drift in the coastal waters near Ilulissat, Greenland. Credit: Twila Moon, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Icebergs-streamlit.png"), caption="An iceberg drifts in the sea off the coast of Ilulissat, Greenland. Credit: Twila Moon, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Sunset-icebergs-streamlit.png"), caption="Icebergs crowd the waters along the northwestern Greenland coast. Credit: Twila Moon, NSIDC")
 
 # Add placeholder for the GIF or animation
 gif_placeholder = st.empty()
@@ -61,20 +85,67 @@ gif_placeholder.markdown(
     unsafe_allow_html=True
 )
 
-# Construct folder and file paths
-if site_name and early_date and later_date:
-    folder_path = os.path.join(base_path, site_name, f"{early_date}-{later_date}")
-    csv_file_name = f"{site_name}_{early_date}-{later_date}_iceberg_meltinfo.csv"
-    csv_file_path = os.path.join(folder_path, csv_file_name)
+# Compare sites: merge the pre-aggregated summaries of every picked site/date pair
+if mode == "Compare sites":
+    partitions = melt_stats.site_partitions(selected_sites, catalog, set(selected_pairs))
+    gif_placeholder.empty()
+    if not partitions:
+        st.warning("⚠️ Please pick at least one site and date pair.")
+    else:
+        summary = melt_stats.combine(partitions, catalog)
+        st.write(f"### Summary of {summary.count} Icebergs from {len(partitions)} Date Pairs")
+        st.caption("MeltRate is the freshwater flux from submarine melting divided by the submerged area (m/day water equivalent).")
+        st.dataframe(summary.to_frame())
+
+        st.write(f"### {compare_column} by Site")
+        comparison = melt_stats.site_comparison(partitions, compare_column, catalog)
+        st.dataframe(comparison, hide_index=True)
+        st.bar_chart(comparison[comparison["site"] != "All selected"], x="site", y="mean")
+
+        # Outline sizes of the same selection, from the berg catalog when it has been built (no shapefiles are opened)
+        bergs = berg_catalog.get_berg_catalog(build=False)
+        if bergs is not None:
+            with st.expander("🧊 Outline sizes by site"):
+                st.dataframe(bergs.site_comparison(selected_sites, selected_pairs).round(2), hide_index=True)
+
+        st.write("### Correlogram of the Selection")
+        if correlation_method == "Pearson":
+            # Straight from the merged co-moments of the cached partition summaries
+            matrix = summary.correlation()
+        else:
+            # Ranks need the rows: one chunk per site/date pair, so the selection is never concatenated into one table
+            chunks = lambda: (melt_stats.add_melt_rate(catalog.query(sites=site, date_pairs=[pair])) for site, pair in partitions)
+            matrix, _ = melt_correlation.correlation(chunks, melt_stats.STAT_COLUMNS, "spearman")
+        correlogram_png = melt_correlation.correlogram_png(matrix)
+        st.image(correlogram_png)
+        st.download_button(
+            label="Press here to download as a .png image",
+            data=correlogram_png,
+            file_name="correlogram.png",
+            mime="image/png",
+        )
 
-    # Check if file exists
-    if os.path.exists(csv_file_path):
+# Pick the rows of the selected site/date pair out of the catalog
+elif site_name and date_pair:
+    df = catalog.query(
+        sites=site_name,
+        date_pairs=[date_pair],
+        min_volume=volume_filter[0] if volume_filter else None,
+        max_volume=volume_filter[1] if volume_filter else None,
+        min_draft=draft_filter[0] if draft_filter else None,
+        max_draft=draft_filter[1] if draft_filter else None,
+    )
+
+    # Check if there is anything left to show
+    if not df.empty:
         # Clear the GIF once the data loads
         gif_placeholder.empty()
 
-        st.success("🎉 CSV file found! 🎉")
-        # Load the CSV file
-        df = pd.read_csv(csv_file_path)
+        # Keep the table looking like the original meltinfo CSV
+        df = df.drop(columns=["site", "date_pair", "early_date", "later_date", "berg", "source_file"]).reset_index(drop=True)
+
+        # Add the freshwater flux and submarine melt rate (with uncertainties) computed in melt_rates.py
+        df = melt_rates.add_melt_rates(df)
         st.write("### Iceberg Meltrate Information:")
         st.dataframe(df)
 
@@ -87,34 +158,36 @@ if site_name and early_date and later_date:
             mime="text/csv",
         )
 
+        # Outline area quartiles of the same date pair, from the berg catalog when it has been built (no shapefiles are opened)
+        bergs = berg_catalog.get_berg_catalog(build=False)
+        if bergs is not None:
+            with st.expander("🧊 Outline area quartiles"):
+                st.dataframe(bergs.quartile_summary(site_name, date_pair).round(1), hide_index=True)
+
         # Drop unwanted columns
-        unwanted_columns = ['X_i', 'Y_i', 'TimeSeparation', 'VerticalAdjustment_i', 'VerticalAdjustment_f', 'Density_i', 'Density_f']
+        unwanted_columns = ['X_i', 'Y_i', 'TimeSeparation', 'VerticalAdjustment_i', 'VerticalAdjustment_f', 'Density_i', 'Density_f',
+                            'FreshwaterFlux', 'FreshwaterFlux_uncert', 'MeltRate_uncert', 'MeltRate_yr', 'MeltRate_yr_uncert']
         df = df.drop(columns=[col for col in unwanted_columns if col in df.columns])
 
-        # Display the correlogram
+        # Display the correlogram (computed chunk by chunk, rendered straight to PNG bytes)
         st.write("### Correlogram of Iceberg Features")
-        fig, ax = plt.subplots(figsize=(10, 8))
-        sns.heatmap(df.corr(), annot=True, fmt=".2f", cmap="coolwarm", ax=ax)
-        st.pyplot(fig)
-
-        # Save correlogram as an image
-        correlogram_path = "correlogram.png"
-        fig.savefig(correlogram_path)
+        matrix, _ = melt_correlation.correlation(melt_correlation.frame_chunks(df), list(df.columns), correlation_method.lower())
+        correlogram_png = melt_correlation.correlogram_png(matrix)
+        st.image(correlogram_png)
 
         # Add a save button for the correlogram
-        with open(correlogram_path, "rb") as img_file:
-            st.download_button(
-                label="Press here to download as a .png image",
-                data=img_file,
-                file_name="correlogram.png",
-                mime="image/png",
-            )
+        st.download_button(
+            label="Press here to download as a .png image",
+            data=correlogram_png,
+            file_name="correlogram.png",
+            mime="image/png",
+        )
     else:
         # Clear the GIF if file not found, but show error
         gif_placeholder.empty()
-        st.error("🚫 CSV file not found. Please check your inputs! 🚫")
+        st.error("🚫 No icebergs match these inputs. Please check your filters! 🚫")
 else:
-    st.warning("⚠️ Please provide all inputs: Site Name, Early Date, and Later Date.")
+    st.warning("⚠️ No melt-rate files were found under Melt-rates/.")
 
 
 
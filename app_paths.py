@@ -0,0 +1,89 @@
+import configparser
+import os
+
+# This module is the one place the app looks up where its files live, so the data can be moved off
+# the repo checkout (e.g. the shapefiles onto a RAM disk, the derived caches onto another volume)
+# without touching any page.
+#
+# Every location is resolved in this order:
+#   1. an environment variable            ICEAGE_DATA_ROOT=/mnt/tmpfs/iceage
+#   2. the [paths] section of iceage.cfg  (or the file named by ICEAGE_CONFIG)
+#   3. the default inside the repo checkout
+#
+#   [paths]
+#   data_root = /mnt/tmpfs/iceage         # Iceberg-shapefiles/, Melt-rates/, the CSV catalogs, ...
+#   derived_root = /mnt/cache/iceage      # outline store, render caches, batch outputs
+#   shapefiles = /mnt/ssd/Iceberg-shapefiles
+#   melt_rates = /mnt/ssd/Melt-rates
+#
+# Relative paths are taken from the repo root. Locations are read once per process, so restart the
+# app after changing them.
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILENAME = "iceage.cfg"
+
+# setting name: (environment variable, default)
+SETTINGS = {
+    "data_root": ("ICEAGE_DATA_ROOT", "."),
+    "derived_root": ("ICEAGE_DERIVED_ROOT", None),
+    "shapefiles": ("ICEAGE_SHAPEFILES", None),
+    "melt_rates": ("ICEAGE_MELT_RATES", None),
+}
+
+
+def config_file():
+    return os.environ.get("ICEAGE_CONFIG", os.path.join(APP_ROOT, CONFIG_FILENAME))
+
+
+def _read_config():
+    parser = configparser.ConfigParser(inline_comment_prefixes=("#", ";"))
+    parser.read(config_file())
+    return dict(parser["paths"]) if parser.has_section("paths") else {}
+
+
+_config = _read_config()
+
+
+def _absolute(path):
+    return os.path.normpath(os.path.join(APP_ROOT, os.path.expanduser(path)))
+
+
+# This function will give back the configured location for one of the SETTINGS (None if it falls back to a default):
+def setting(name):
+    env_var, default = SETTINGS[name]
+    value = os.environ.get(env_var) or _config.get(name) or default
+    return _absolute(value) if value else None
+
+
+def data_path(*parts):
+    """A file or folder of the source data (shapefiles, meltinfo CSVs, glacier catalogs, ...)."""
+    return os.path.join(setting("data_root"), *parts)
+
+
+def derived_path(*parts):
+    """A file or folder of generated data (outline store, caches, batch outputs)."""
+    return os.path.join(setting("derived_root") or data_path("Derived-data"), *parts)
+
+
+def shapefiles_path(*parts):
+    return os.path.join(setting("shapefiles") or data_path("Iceberg-shapefiles"), *parts)
+
+
+def melt_rates_path(*parts):
+    return os.path.join(setting("melt_rates") or data_path("Melt-rates"), *parts)
+
+
+def app_path(*parts):
+    """A file shipped with the app itself (pages, images), relative to the repo root."""
+    return os.path.join(APP_ROOT, *parts)
+
+
+def resolved_paths():
+    """Every location with where its value came from, for the Admin page."""
+    rows = []
+    for name, (env_var, _) in SETTINGS.items():
+        source = "environment" if os.environ.get(env_var) else "config file" if _config.get(name) else "default"
+        rows.append({"setting": name, "env var": env_var, "source": source})
+    for row, path in zip(rows, [data_path(), derived_path(), shapefiles_path(), melt_rates_path()]):
+        row["path"] = path
+    return rows
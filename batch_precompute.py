@@ -0,0 +1,257 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import app_paths
+import melt_catalog
+import outline_store
+
+# This module is the offline batch job: it walks Iceberg-shapefiles/ and Melt-rates/ with a pool of
+# worker processes and writes, for every site/date pair,
+#
+#   Derived-data/Batch/site=KOG/date_pair=20170515-20170611/
+#       bergs.parquet      per-berg metrics (area, bounds, centroid, perimeter, angle, elongation)
+#       summary.json       per-date-pair summary (outline and melt-rate statistics)
+#       quartiles.png      default quartile overlay
+#       grid-1.png         first page of the outline grid
+#       manifest.json      size, mtime and hash of every source file, written last
+#
+# plus bergs.parquet and summaries.parquet with every partition combined. Every file is written to a
+# temporary name and moved into place, so readers never see half-written output.
+#
+# A partition is skipped when its source files still match the manifest (same names, sizes and
+# mtimes; with --hash, files whose mtime moved are compared by content instead), so nightly reruns
+# only redo what changed:
+#   $ python batch_precompute.py                  (all sites, one worker per core)
+#   $ python batch_precompute.py --site KOG --workers 4 --hash
+#   $ python batch_precompute.py --force
+
+BATCH_OUTPUT_PATH = app_paths.derived_path("Batch")
+
+# Bump when the outputs change shape, so every partition is recomputed once.
+# 2: grid-1.png holds the first grid page (it held the second, often blank, one).
+PIPELINE_VERSION = 2
+
+GRID_PAGE_SIZE = 24
+
+
+def _write_atomically(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _write_parquet_atomically(frame, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    frame.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# This function will record the size, mtime and content hash of every source file of a partition:
+def source_records(paths):
+    records = {}
+    for path in sorted(paths):
+        info = os.stat(path)
+        records[os.path.basename(path)] = {"size": info.st_size, "mtime_ns": info.st_mtime_ns, "sha1": _file_hash(path)}
+    return records
+
+
+def melt_files_by_partition(melt_root=melt_catalog.MELT_RATES_PATH):
+    """{(site, date_pair): meltinfo CSV path} for every meltinfo file, whatever the folder layout."""
+    files = {}
+    for path in melt_catalog.discover_meltinfo_files(melt_root):
+        match = melt_catalog.MELTINFO_FILENAME.match(os.path.basename(path))
+        files[(match.group("site").upper(), f"{match.group('early')}-{match.group('later')}")] = path
+    return files
+
+
+# This function will list every partition with its source files and where its outputs go:
+def plan_partitions(base_path=outline_store.SHAPEFILE_BASE_PATH, melt_root=melt_catalog.MELT_RATES_PATH, output_path=BATCH_OUTPUT_PATH, sites=None):
+    melt_files = melt_files_by_partition(melt_root)
+    pairs = set(outline_store.iter_date_pairs(base_path, sites))
+    pairs |= {pair for pair in melt_files if not sites or pair[0] in sites}
+
+    tasks = []
+    for site, date_pair in sorted(pairs):
+        folder = os.path.join(base_path, site, date_pair)
+        sources = [os.path.join(folder, name) for name in os.listdir(folder)] if os.path.isdir(folder) else []
+        melt_path = melt_files.get((site, date_pair))
+        if melt_path:
+            sources.append(melt_path)
+        tasks.append({
+            "site": site,
+            "date_pair": date_pair,
+            "base_path": base_path,
+            "melt_root": melt_root,
+            "melt_path": melt_path,
+            "sources": sources,
+            "target": outline_store.partition_path(site, date_pair, output_path),
+        })
+    return tasks
+
+
+def _read_manifest(task):
+    manifest_path = os.path.join(task["target"], "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+# This function will check whether a partition's outputs still match its source files:
+def is_up_to_date(task, use_hash=False):
+    """True when no source file was added, removed or changed since the partition was computed.
+
+    A file counts as unchanged when its size and mtime match the manifest. With use_hash, a file
+    whose mtime moved but whose contents hash the same also counts as unchanged (and the manifest
+    is refreshed, so the next run doesn't hash it again).
+    """
+    manifest = _read_manifest(task)
+    if manifest is None or manifest.get("pipeline") != PIPELINE_VERSION:
+        return False
+    recorded = manifest.get("files", {})
+    paths = {os.path.basename(path): path for path in task["sources"]}
+    if set(paths) != set(recorded):
+        return False
+
+    refreshed = False
+    for name, path in paths.items():
+        info = os.stat(path)
+        record = recorded[name]
+        if info.st_size != record["size"]:
+            return False
+        if info.st_mtime_ns != record["mtime_ns"]:
+            if not use_hash or _file_hash(path) != record["sha1"]:
+                return False
+            record["mtime_ns"] = info.st_mtime_ns
+            refreshed = True
+
+    if refreshed:
+        _write_atomically(os.path.join(task["target"], "manifest.json"), json.dumps(manifest, indent=2).encode())
+    return True
+
+
+# This function will compute one partition (runs in a worker process):
+def process_partition(task):
+    # Imported here so the parent process stays light; each worker imports matplotlib once.
+    import iceberg_render
+    import melt_rates
+    from geometry_metrics import build_selection_dataset, outline_metrics, outline_shape_metrics, selection_extent
+
+    start = time.perf_counter()
+    site, date_pair, target = task["site"], task["date_pair"], task["target"]
+    early_date = date_pair.split("-")[0]
+    os.makedirs(target, exist_ok=True)
+
+    outlines = outline_store.read_shapefile_folder(site, date_pair, task["base_path"])
+    bergs = outlines[["berg_id", "date_tag", "acquired", "is_early", "source_file"]].reset_index(drop=True)
+    bergs = pd.concat([bergs, outline_metrics(outlines.geometry).reset_index(drop=True), outline_shape_metrics(outlines.geometry).reset_index(drop=True)], axis=1)
+    bergs.insert(0, "date_pair", date_pair)
+    bergs.insert(0, "site", site)
+    _write_parquet_atomically(bergs, os.path.join(target, "bergs.parquet"))
+
+    summary = {
+        "site": site,
+        "date_pair": date_pair,
+        "icebergs": int(len(bergs)),
+        "icebergs_early": int(bergs["is_early"].sum()),
+        "icebergs_late": int((~bergs["is_early"]).sum()),
+        "area_total": float(bergs["area"].sum()),
+        "area_mean": float(bergs["area"].mean()) if len(bergs) else None,
+        "area_median": float(bergs["area"].median()) if len(bergs) else None,
+        "perimeter_mean": float(bergs["perimeter"].mean()) if len(bergs) else None,
+        "elongation_mean": float(bergs["elongation"].mean()) if len(bergs) else None,
+        "melt_icebergs": 0,
+        "melt_rate_mean": None,
+        "volume_change_rate_mean": None,
+    }
+    if task["melt_path"]:
+        melt = melt_rates.add_melt_rates(melt_catalog.read_meltinfo(task["melt_path"], task["melt_root"]))
+        summary["melt_icebergs"] = int(len(melt))
+        summary["melt_rate_mean"] = float(melt["MeltRate"].mean())
+        summary["volume_change_rate_mean"] = float(melt["VolumeChangeRate"].mean())
+    summary = {key: (None if isinstance(value, float) and np.isnan(value) else value) for key, value in summary.items()}
+    _write_atomically(os.path.join(target, "summary.json"), json.dumps(summary, indent=2).encode())
+
+    # Render artifacts: the default quartile overlay and the first grid page
+    if len(outlines):
+        selection = build_selection_dataset(outlines, early_date)
+        max_width, max_height = selection_extent(selection)
+        _write_atomically(os.path.join(target, "quartiles.png"), iceberg_render.render_quartile_overlay(selection, max_width, max_height))
+        # render_outline_grid counts pages from 0; the file is named for people, from 1.
+        _write_atomically(os.path.join(target, "grid-1.png"), iceberg_render.render_outline_grid(selection, max_width, max_height, page=0, page_size=GRID_PAGE_SIZE))
+
+    # The manifest goes last: a partition only counts as done once it exists.
+    manifest = {"pipeline": PIPELINE_VERSION, "files": source_records(task["sources"])}
+    _write_atomically(os.path.join(target, "manifest.json"), json.dumps(manifest, indent=2).encode())
+    return site, date_pair, len(bergs), time.perf_counter() - start
+
+
+def combine_outputs(tasks, output_path=BATCH_OUTPUT_PATH):
+    """Rewrite the all-partition bergs.parquet and summaries.parquet from the partition outputs."""
+    bergs, summaries = [], []
+    for task in tasks:
+        bergs_path = os.path.join(task["target"], "bergs.parquet")
+        summary_path = os.path.join(task["target"], "summary.json")
+        if os.path.exists(bergs_path):
+            bergs.append(pd.read_parquet(bergs_path))
+        if os.path.exists(summary_path):
+            with open(summary_path) as f:
+                summaries.append(json.load(f))
+    bergs = [frame for frame in bergs if not frame.empty]
+    if bergs:
+        _write_parquet_atomically(pd.concat(bergs, ignore_index=True), os.path.join(output_path, "bergs.parquet"))
+    if summaries:
+        _write_parquet_atomically(pd.DataFrame(summaries), os.path.join(output_path, "summaries.parquet"))
+    return len(summaries)
+
+
+# This function will run the whole batch, skipping partitions whose sources haven't changed:
+def run_batch(output_path=BATCH_OUTPUT_PATH, sites=None, workers=None, force=False, use_hash=False,
+              base_path=outline_store.SHAPEFILE_BASE_PATH, melt_root=melt_catalog.MELT_RATES_PATH):
+    tasks = plan_partitions(base_path, melt_root, output_path, sites)
+    todo = [task for task in tasks if force or not is_up_to_date(task, use_hash)]
+    print(f"{len(tasks)} partitions, {len(tasks) - len(todo)} up to date, {len(todo)} to compute")
+
+    start = time.perf_counter()
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(process_partition, task) for task in todo]
+            for future in as_completed(futures):
+                site, date_pair, count, seconds = future.result()
+                print(f"{site} {date_pair}: {count} icebergs in {seconds:.2f} s")
+
+    os.makedirs(output_path, exist_ok=True)
+    combined = combine_outputs(tasks, output_path)
+    print(f"Computed {len(todo)} partitions in {time.perf_counter() - start:.1f} s; {combined} summaries in {output_path}")
+    return len(todo)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute per-berg metrics, summaries and renders for every site.")
+    parser.add_argument("--output", default=BATCH_OUTPUT_PATH, help="Derived-data directory for the outputs")
+    parser.add_argument("--site", action="append", help="Only process this site (repeatable)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    parser.add_argument("--force", action="store_true", help="Recompute every partition")
+    parser.add_argument("--hash", action="store_true", help="Compare file contents instead of modification times")
+    args = parser.parse_args()
+    run_batch(args.output, args.site, args.workers, args.force, args.hash)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Let the benchmark import the app modules when run from the repo root or from benchmarks/:
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import melt_catalog
+import melt_rates
+
+# Throughput of the vectorized melt-rate computation, in rows per second, next to a row-by-row
+# Python loop doing the same arithmetic. The catalog rows are tiled to reach each table size.
+#   $ python benchmarks/bench_melt_rates.py --rows 1000 100000 1000000
+
+
+def row_by_row(table):
+    results = []
+    for row in table.itertuples(index=False):
+        density = (row.Density_i + row.Density_f) / 2
+        flux = row.VolumeChangeRate * density / melt_rates.FRESHWATER_DENSITY
+        flux_uncert = abs(row.VolumeChangeRate_uncert * density / melt_rates.FRESHWATER_DENSITY)
+        melt_rate = flux / row.SubmergedArea_mean
+        melt_rate_uncert = abs(melt_rate) * np.hypot(flux_uncert / flux, row.SubmergedArea_uncert / row.SubmergedArea_mean)
+        results.append((flux, flux_uncert, melt_rate, melt_rate_uncert))
+    return results
+
+
+def best_time(function, table, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(table)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized melt-rate computation.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--loop-max-rows", type=int, default=100_000, help="Skip the row loop above this size")
+    args = parser.parse_args()
+
+    base = melt_catalog.get_catalog().table
+    print(f"{'rows':>10} {'vectorized rows/s':>18} {'row loop rows/s':>16} {'speedup':>8}")
+    for rows in args.rows:
+        table = pd.concat([base] * (rows // len(base) + 1), ignore_index=True).iloc[:rows]
+        vectorized = best_time(melt_rates.compute_melt_rates, table, args.repeats)
+        line = f"{rows:>10} {rows / vectorized:>18,.0f}"
+        if rows <= args.loop_max_rows:
+            loop = best_time(row_by_row, table, 1)
+            line += f" {rows / loop:>16,.0f} {loop / vectorized:>7.0f}x"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Let the benchmark import the app modules when run from the repo root or from benchmarks/:
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import outline_store
+import projection
+
+# Time spent getting one site/date selection's outlines into lon/lat for the web map, per selection:
+#   per-outline round trip  what the old map pages did: every outline to EPSG:4326 for the map and
+#                           back to EPSG:3413 to measure it, one GeoDataFrame at a time
+#   geopandas to_crs        the whole selection in one GeoDataFrame.to_crs call
+#   cached transformer      projection.transform_geometries: one shared Transformer, one call
+#   precomputed column      projection.web_geometries on the store's EPSG:4326 copy
+#   no-op 3413 -> 3413      GeoDataFrame.to_crs vs. projection.to_crs for data already in EPSG:3413
+#   $ python benchmarks/bench_projection.py --selections 20
+
+
+def per_outline_round_trip(outlines):
+    for i in range(len(outlines)):
+        web = outlines.iloc[[i]].to_crs("EPSG:4326")
+        web.to_crs("EPSG:3413").total_bounds
+
+
+def geopandas_to_crs(outlines):
+    outlines.to_crs("EPSG:4326").geometry.values
+
+
+def cached_transformer(outlines):
+    projection.transform_geometries(outlines.geometry.values, outlines.crs, projection.WEB_CRS)
+
+
+def precomputed_column(outlines):
+    projection.web_geometries(outlines)
+
+
+def geopandas_noop(outlines):
+    outlines.to_crs("EPSG:3413")
+
+
+def projection_noop(outlines):
+    projection.to_crs(outlines, projection.CANONICAL_CRS)
+
+
+def best_time(function, outlines, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(outlines)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-selection reprojection of iceberg outlines.")
+    parser.add_argument("--selections", type=int, default=20, help="Number of site/date pairs to time")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if not outline_store.store_exists():
+        sys.exit("Build the outline store first: python outline_store.py ingest")
+
+    selections = []
+    for site, date_pair in list(outline_store.iter_date_pairs())[:args.selections]:
+        outlines = outline_store.load_outlines(site, date_pair)
+        if len(outlines):
+            selections.append(outlines)
+    if projection.WEB_GEOMETRY_COLUMN not in selections[0].columns:
+        print("The store has no precomputed EPSG:4326 column yet; re-run python outline_store.py ingest for the last row.")
+
+    functions = [
+        ("per-outline round trip", per_outline_round_trip),
+        ("geopandas to_crs", geopandas_to_crs),
+        ("cached transformer", cached_transformer),
+        ("precomputed column", precomputed_column),
+        ("no-op 3413 -> 3413 (geopandas)", geopandas_noop),
+        ("no-op 3413 -> 3413 (projection)", projection_noop),
+    ]
+    outline_count = sum(len(outlines) for outlines in selections)
+    print(f"{len(selections)} selections, {outline_count / len(selections):.0f} outlines each on average")
+    print(f"{'method':<32} {'ms/selection (median)':>22} {'ms/selection (max)':>19}")
+    for name, function in functions:
+        function(selections[0])  # warm up (imports, transformer construction)
+        times = np.array([best_time(function, outlines, args.repeats) for outlines in selections]) * 1000
+        print(f"{name:<32} {np.median(times):>22.3f} {times.max():>19.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# Let the benchmark import the app modules when run from the repo root or from benchmarks/:
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import outline_buffers
+import outline_store
+
+# Memory used by N app processes that each hold every iceberg outline, the way N Streamlit servers
+# behind a load balancer would:
+#   geoparquet        each worker reads the GeoParquet outlines onto its own heap (the old data path)
+#   buffers           each worker maps the coordinate buffers and reads every vertex (outline_buffers.py)
+#   buffers+shapely   each worker maps the buffers and turns every outline into shapely geometries
+#
+# The collection is tiled --copies times (default 20) so it is big enough to stand out from the
+# interpreter itself. All workers hold their data at the same time, then each reports how much its
+# memory grew from loading it (Linux /proc/<pid>/smaps_rollup):
+#   RSS    resident pages, shared ones included
+#   PSS    proportional set size: shared pages divided between the processes mapping them
+#   USS    private pages (what this worker alone costs)
+# The sum of PSS over all workers is what the machine actually spends on the outlines. (With a single
+# worker the mapped file pages show up as private, since nobody else maps them; they are still page cache.)
+#   $ python benchmarks/bench_worker_memory.py --workers 1 4 8
+
+
+def memory_kb():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss": fields["Rss"], "pss": fields["Pss"], "uss": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def hold_outlines(mode, parquet_file, buffers_folder):
+    if mode == "geoparquet":
+        import geopandas as gpd
+        return gpd.read_parquet(parquet_file)
+    buffers = outline_buffers.OutlineBuffers(buffers_folder)
+    if mode == "buffers+shapely":
+        return buffers.geometries(0, len(buffers)), buffers.geometries(0, len(buffers), web=True)
+    # Read every vertex (both coordinate systems) without copying, e.g. for per-outline bounds:
+    ring_starts = np.asarray(buffers.offsets[0][:-1])
+    bounds = [np.minimum.reduceat(coords, ring_starts) for coords in (buffers.coords, buffers.web_coords)]
+    return buffers, bounds
+
+
+def worker(mode, parquet_file, buffers_folder, barrier, results):
+    # Import the libraries first so only the outlines count, not geopandas/shapely themselves.
+    import geopandas  # noqa: F401
+    import shapely  # noqa: F401
+
+    before = memory_kb()
+    held = hold_outlines(mode, parquet_file, buffers_folder)
+    barrier.wait()  # every worker now holds its outlines, so shared pages are split between all of them
+    after = memory_kb()
+    results.put({key: after[key] - before[key] for key in after})
+    barrier.wait()
+    del held
+
+
+def run(mode, workers, parquet_file, buffers_folder):
+    context = mp.get_context("spawn")  # fresh interpreters, as separate server processes would be
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, parquet_file, buffers_folder, barrier, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    deltas = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return deltas
+
+
+def build_inputs(folder, copies):
+    import geopandas as gpd
+    import pandas as pd
+
+    import projection
+    from berg_catalog import load_collection
+
+    _, frames = load_collection()
+    outlines = pd.concat([frame for frame in frames if len(frame)], ignore_index=True)
+    tiled = gpd.GeoDataFrame(pd.concat([outlines] * copies, ignore_index=True), geometry="geometry", crs=outlines.crs)
+    if projection.WEB_GEOMETRY_COLUMN not in tiled.columns:
+        tiled = projection.add_web_geometry(tiled)
+
+    parquet_file = os.path.join(folder, "outlines.parquet")
+    tiled.to_parquet(parquet_file, index=False)
+    buffers_folder = outline_buffers.write_buffers(np.asarray(tiled.geometry.values, dtype=object), os.path.join(folder, "buffers"), "benchmark")
+    buffers = outline_buffers.OutlineBuffers(buffers_folder)
+    print(f"{len(tiled)} outlines ({copies} copies), {len(buffers.coords)} vertices: "
+          f"GeoParquet {os.path.getsize(parquet_file) / 1e6:.1f} MB on disk, buffers {(buffers.coords.nbytes + buffers.web_coords.nbytes) / 1e6:.1f} MB")
+    return parquet_file, buffers_folder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per worker process: GeoParquet on the heap vs. memory-mapped buffers.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--copies", type=int, default=20, help="Tile the outline collection this many times")
+    parser.add_argument("--modes", nargs="+", default=["geoparquet", "buffers", "buffers+shapely"])
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("This benchmark reads /proc/self/smaps_rollup, so it only runs on Linux.")
+    if not outline_store.store_exists():
+        sys.exit("Build the outline store first: python outline_store.py ingest")
+
+    with tempfile.TemporaryDirectory() as folder:
+        parquet_file, buffers_folder = build_inputs(folder, args.copies)
+        print(f"{'mode':<17} {'workers':>7} {'total PSS (MB)':>15} {'PSS/worker':>11} {'USS/worker':>11} {'RSS/worker':>11}")
+        for mode in args.modes:
+            for workers in args.workers:
+                deltas = run(mode, workers, parquet_file, buffers_folder)
+                total_pss = sum(delta["pss"] for delta in deltas) / 1024
+                mean = {key: np.mean([delta[key] for delta in deltas]) / 1024 for key in deltas[0]}
+                print(f"{mode:<17} {workers:>7} {total_pss:>15.1f} {mean['pss']:>11.1f} {mean['uss']:>11.1f} {mean['rss']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
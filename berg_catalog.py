@@ -0,0 +1,304 @@
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import app_paths
+import data_cache
+
+# This module keeps one row of measurements per iceberg outline for the whole collection, so the
+# pages can fill tables, quartiles and filters without opening any geometry:
+#
+#   site, date pair, source file, berg id, date tag, acquisition time, early/late, area, width, height,
+#   perimeter, centroid (EPSG:3413 and lon/lat), vertex count, long-axis angle, elongation
+#
+# The rows are one NumPy structured array saved as a .npy file next to the outline store, with the
+# site and date pair stored as small integer codes (their names are in the JSON file beside it).
+# The pages open it with mmap, so every Streamlit process on the machine reads the same pages of the
+# OS page cache instead of keeping its own copy.
+#
+# The catalog is built from the outline store and named after its store_version(), so changing the
+# outlines (re-ingesting, adding PScoords, ...) makes the pages build a fresh one on first use. Its
+# rows are in the same order as the geometry buffers of outline_buffers.py (row i is outline i).
+#   $ python berg_catalog.py ingest
+
+BERG_CATALOG_PATH = app_paths.derived_path("Berg-catalog")
+
+# Bump when RECORD_FIELDS change, so catalogs written with the old layout are rebuilt instead of misread.
+CATALOG_LAYOUT = 2
+
+# One record per outline. Lengths are in meters and areas in m² (EPSG:3413); lon/lat in degrees.
+RECORD_FIELDS = [
+    ("site", "u2"),
+    ("date_pair", "u2"),
+    ("berg_id", "i4"),
+    ("date_tag", "i4"),  # YYYYMMDD
+    ("acquired", "M8[s]"),
+    ("is_early", "?"),
+    ("area", "f8"),
+    ("width", "f4"),
+    ("height", "f4"),
+    ("perimeter", "f4"),
+    ("centroid_x", "f8"),
+    ("centroid_y", "f8"),
+    ("lon", "f8"),
+    ("lat", "f8"),
+    ("vertices", "i4"),
+    ("angle", "f4"),
+    ("elongation", "f4"),
+]
+
+
+def catalog_files(version, catalog_path=BERG_CATALOG_PATH):
+    """(records .npy, names .json) of the catalog built from one version of the outline store."""
+    stem = os.path.join(catalog_path, f"bergs-{CATALOG_LAYOUT}-{version}")
+    return stem + ".npy", stem + ".json"
+
+
+# This function will load every outline of the collection, one frame per site, in the order the catalog and the geometry buffers use:
+def load_collection(store_path=None, base_path=None):
+    """(sites, frames): sorted site names and each site's outlines (sorted by date pair, then source file)."""
+    import outline_store
+    store_path = store_path or outline_store.OUTLINE_STORE_PATH
+    base_path = base_path or outline_store.SHAPEFILE_BASE_PATH
+    sites = sorted({site for site, _ in outline_store.iter_date_pairs(base_path)})
+    return sites, [outline_store.load_outlines(site, None, store_path, base_path) for site in sites]
+
+
+# This function will measure every outline of every site into one structured array:
+def build_records(store_path=None, base_path=None):
+    """Records sorted by site, date pair and source file, plus the site and date pair names their codes refer to."""
+    # Imported here so reading a finished catalog doesn't pull in geopandas/shapely/pyproj.
+    import shapely
+
+    import projection
+    from geometry_metrics import outline_metrics, outline_shape_metrics
+
+    sites, frames = load_collection(store_path, base_path)
+    date_pairs = sorted({pair for frame in frames for pair in frame["date_pair"].unique()})
+    pair_codes = {pair: code for code, pair in enumerate(date_pairs)}
+
+    source_width = max([len(name) for frame in frames for name in frame["source_file"]] or [1])
+    dtype = np.dtype(RECORD_FIELDS[:2] + [("source_file", f"S{source_width}")] + RECORD_FIELDS[2:])
+    # load_outlines sorts each site by date pair then source file; that order is kept (it decides quartile ties).
+    chunks = []
+    for site_code, outlines in enumerate(frames):
+        records = np.zeros(len(outlines), dtype=dtype)
+        if outlines.empty:
+            continue
+        geoms = outlines.geometry.values
+        metrics = outline_metrics(geoms)
+        shape = outline_shape_metrics(geoms)
+        lon, lat = projection.transform_xy(metrics["centroid_x"].to_numpy(), metrics["centroid_y"].to_numpy(), outlines.crs, projection.WEB_CRS)
+
+        records["site"] = site_code
+        records["date_pair"] = outlines["date_pair"].map(pair_codes).to_numpy()
+        records["source_file"] = outlines["source_file"].str.encode("ascii", "replace").to_numpy()
+        records["berg_id"] = outlines["berg_id"].to_numpy()
+        records["date_tag"] = pd.to_numeric(outlines["date_tag"], errors="coerce").fillna(0).to_numpy()
+        records["acquired"] = outlines["acquired"].to_numpy()
+        records["is_early"] = outlines["is_early"].to_numpy()
+        for field in ["area", "width", "height", "centroid_x", "centroid_y"]:
+            records[field] = metrics[field].to_numpy()
+        for field in ["perimeter", "angle", "elongation"]:
+            records[field] = shape[field].to_numpy()
+        records["lon"], records["lat"] = lon, lat
+        records["vertices"] = shapely.get_num_coordinates(geoms)
+        chunks.append(records)
+
+    records = np.concatenate(chunks) if chunks else np.zeros(0, dtype=dtype)
+    return records, {"sites": sites, "date_pairs": date_pairs}
+
+
+# This function will build the catalog for the current outline store and write it next to the store:
+def ingest(store_path=None, base_path=None, catalog_path=BERG_CATALOG_PATH):
+    import outline_store
+    store_path = store_path or outline_store.OUTLINE_STORE_PATH
+    base_path = base_path or outline_store.SHAPEFILE_BASE_PATH
+    version = outline_store.store_version(store_path, base_path)
+    records, names = build_records(store_path, base_path)
+    names["version"] = version
+
+    os.makedirs(catalog_path, exist_ok=True)
+    records_file, names_file = catalog_files(version, catalog_path)
+    tmp_path = f"{records_file}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, records)
+    os.replace(tmp_path, records_file)
+    # The names file goes last: once it exists, the records beside it are complete.
+    tmp_path = f"{names_file}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(names, f)
+    os.replace(tmp_path, names_file)
+
+    # Catalogs of older store versions are no longer used (processes that still have one mapped keep reading it fine).
+    for path in glob.glob(os.path.join(catalog_path, "bergs-*")):
+        if path not in (records_file, names_file) and not path.endswith(".tmp"):
+            os.remove(path)
+    return records_file
+
+
+class BergCatalog:
+    """Per-berg measurements of every outline as one structured array, with a row range per site."""
+
+    def __init__(self, records, names):
+        self.records = records
+        self.site_names = list(names["sites"])
+        self.date_pair_names = list(names["date_pairs"])
+        self.version = names.get("version")
+        # Rows are sorted by site code, so each site is one contiguous block of rows:
+        bounds = np.searchsorted(records["site"], np.arange(len(self.site_names) + 1))
+        self.site_slices = {site: (int(bounds[i]), int(bounds[i + 1])) for i, site in enumerate(self.site_names) if bounds[i] < bounds[i + 1]}
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def sites(self):
+        return sorted(self.site_slices)
+
+    def date_pairs(self, site):
+        start, stop = self.site_slices.get(site, (0, 0))
+        return [self.date_pair_names[code] for code in np.unique(self.records["date_pair"][start:stop])]
+
+    def row_range(self, site, date_pair=None):
+        """(start, stop) rows of a site, or of one of its date pairs (both are contiguous)."""
+        start, stop = self.site_slices.get(site, (0, 0))
+        if date_pair is None:
+            return start, stop
+        if date_pair not in self.date_pair_names:
+            return start, start
+        # Date pair codes are numbered in sorted order, so within a site they are sorted too:
+        code = self.date_pair_names.index(date_pair)
+        codes = self.records["date_pair"][start:stop]
+        return start + int(np.searchsorted(codes, code, side="left")), start + int(np.searchsorted(codes, code, side="right"))
+
+    # This function will pick the records of some sites/date pairs, optionally only early or late bergs within an area range:
+    def rows(self, sites=None, date_pairs=None, early=None, min_area=None, max_area=None):
+        if sites is None:
+            sites = self.sites
+        elif isinstance(sites, str):
+            sites = [sites]
+        if isinstance(date_pairs, str):
+            date_pairs = [date_pairs]
+
+        blocks = [self.records[slice(*self.site_slices[site])] for site in sites if site in self.site_slices]
+        rows = np.concatenate(blocks) if blocks else self.records[:0]
+        mask = np.ones(len(rows), dtype=bool)
+        if date_pairs is not None:
+            codes = [self.date_pair_names.index(pair) for pair in date_pairs if pair in self.date_pair_names]
+            mask &= np.isin(rows["date_pair"], codes)
+        if early is not None:
+            mask &= rows["is_early"] == early
+        if min_area is not None:
+            mask &= rows["area"] >= min_area
+        if max_area is not None:
+            mask &= rows["area"] <= max_area
+        return rows[mask]
+
+    def frame(self, rows):
+        """Records as a DataFrame with the site and date pair names as categoricals."""
+        frame = pd.DataFrame({name: rows[name] for name in rows.dtype.names})
+        frame["site"] = pd.Categorical.from_codes(frame["site"], self.site_names)
+        frame["date_pair"] = pd.Categorical.from_codes(frame["date_pair"], self.date_pair_names)
+        frame["source_file"] = frame["source_file"].str.decode("ascii")
+        frame["date_tag"] = frame["date_tag"].astype(str)
+        return frame
+
+    def query(self, sites=None, date_pairs=None, early=None, min_area=None, max_area=None):
+        return self.frame(self.rows(sites, date_pairs, early, min_area, max_area))
+
+    # This function will split a site/date selection into four equal-count area groups, the same way the viewer's plots do:
+    def quartiles(self, site, date_pair):
+        """The selection's records with a Q1-Q4 column (rank-based, so it also works for fewer than four bergs)."""
+        frame = self.query(site, [date_pair])
+        if len(frame):
+            rank = frame["area"].rank(method="first").to_numpy() - 1
+            frame["quartile"] = ["Q" + str(int(r * 4 // len(frame)) + 1) for r in rank]
+        else:
+            frame["quartile"] = []
+        return frame
+
+    def quartile_summary(self, site, date_pair):
+        """Count and area range of each quartile of a selection."""
+        from geometry_metrics import quartile_summary
+        return quartile_summary(self.quartiles(site, date_pair))
+
+    # This function will give one row per site: iceberg count, number of date pairs and mean centroid, straight from the codes:
+    def site_summary(self, sites=None):
+        counts = np.bincount(self.records["site"], minlength=len(self.site_names))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            lat = np.bincount(self.records["site"], weights=self.records["lat"], minlength=len(self.site_names)) / counts
+            lon = np.bincount(self.records["site"], weights=self.records["lon"], minlength=len(self.site_names)) / counts
+        pairs = np.unique(self.records["site"].astype("i8") * 65536 + self.records["date_pair"]) // 65536
+        summary = pd.DataFrame({
+            "site": self.site_names,
+            "icebergs": counts,
+            "date_pairs": np.bincount(pairs, minlength=len(self.site_names)),
+            "lat": lat,
+            "lon": lon,
+        })
+        summary = summary[summary["icebergs"] > 0]
+        if sites is not None:
+            summary = summary[summary["site"].isin(list(sites))]
+        return summary.reset_index(drop=True)
+
+    def site_comparison(self, sites=None, date_pairs=None):
+        """Outline count and median size/shape per site for a selection."""
+        return self.query(sites, date_pairs).groupby("site", observed=True).agg(
+            icebergs=("area", "size"),
+            median_area=("area", "median"),
+            median_width=("width", "median"),
+            median_height=("height", "median"),
+            median_vertices=("vertices", "median"),
+            median_elongation=("elongation", "median"),
+        ).reset_index()
+
+
+# This function is what the pages use to get the (cached, memory-mapped) berg catalog:
+def get_berg_catalog(store_path=None, base_path=None, catalog_path=BERG_CATALOG_PATH, build=True):
+    """Open the catalog for the current outline store, building it first if there isn't one yet.
+
+    With build=False nothing is measured or written: None comes back unless the outline store and a
+    catalog for its current version already exist, so pages can offer the catalog's extras without
+    ever paying for a rebuild inside a request.
+    """
+    import outline_store
+    store_path = store_path or outline_store.OUTLINE_STORE_PATH
+    base_path = base_path or outline_store.SHAPEFILE_BASE_PATH
+    if not build and not outline_store.store_exists(store_path):
+        return None
+    version = outline_store.store_version(store_path, base_path)
+    records_file, names_file = catalog_files(version, catalog_path)
+    if not build and not os.path.exists(names_file):
+        return None
+
+    def load():
+        if not os.path.exists(names_file):
+            ingest(store_path, base_path, catalog_path)
+        with open(names_file) as f:
+            names = json.load(f)
+        return BergCatalog(np.load(records_file, mmap_mode="r"), names)
+
+    return data_cache.cached("berg-catalog", [], load, os.path.abspath(catalog_path), version)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure every iceberg outline into the memory-mapped berg catalog.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Build the catalog from the outline store")
+    ingest_parser.add_argument("--store", default=None, help="Outline store to read (default: the configured one)")
+    ingest_parser.add_argument("--catalog", default=BERG_CATALOG_PATH, help="Where to write the catalog")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        records_file = ingest(args.store, None, args.catalog)
+        records = np.load(records_file, mmap_mode="r")
+        print(f"Wrote {len(records)} icebergs ({records.nbytes / 1e6:.2f} MB) to {records_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# This module is the shared data-access layer for the pages in Navigation-pages/.
+# Streamlit re-runs the whole page script on every click, so anything read from disk here is kept
+# in one process-wide LRU cache (shared by every rerun and every browser session) keyed by the
+# file path and its modification time. Editing or replacing a file on disk invalidates its entry.
+#
+# The cache size is capped by the ICEAGE_CACHE_MB environment variable (default 512 MB); the least
+# recently used entries are evicted once the estimated size goes over the ceiling.
+#
+# Objects handed out by the cache are shared, so pages should treat them as read-only and .copy()
+# before modifying them.
+#
+# Cache misses don't load in the session's script thread: they run on one bounded pool of compute
+# threads (ICEAGE_COMPUTE_WORKERS, default 4). When several sessions ask for the same thing at once
+# (everyone opening KOG after a restart), the first request loads it and the others wait for that
+# same result instead of reading and rendering it again. The Admin page shows how many loads were
+# executed and how many were coalesced onto one already running.
+
+DEFAULT_CACHE_MB = 512
+DEFAULT_COMPUTE_WORKERS = 4
+
+
+def estimate_size(obj):
+    """Rough in-memory size of a cached object in bytes."""
+    if isinstance(obj, pd.DataFrame):
+        size = int(obj.memory_usage(deep=True, index=True).sum())
+        # GEOS geometries live outside the NumPy buffers, so count their coordinates separately.
+        if "geometry" in obj.columns and len(obj):
+            import shapely
+            size += int(shapely.get_num_coordinates(obj["geometry"].values).sum()) * 16 + len(obj) * 100
+        return size
+    if isinstance(obj, (bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, np.memmap):
+        # Memory-mapped files live in the OS page cache (shared with other processes), not on our heap.
+        return 0
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(estimate_size(v) for v in obj)
+    if hasattr(obj, "__dict__"):
+        # Wrapper objects (e.g. the spatial index): count the data frames and arrays they hold, one level deep.
+        return sys.getsizeof(obj) + sum(estimate_size(v) for v in vars(obj).values() if isinstance(v, (pd.DataFrame, np.ndarray)))
+    return sys.getsizeof(obj)
+
+
+class _Job:
+    """One load on the compute pool: what to run, its result, and whether some thread has started it."""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.future = Future()
+        self.started = False
+
+
+class ComputePool:
+    """Bounded thread pool that runs each distinct key at most once at a time (single-flight)."""
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="iceage-compute")
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.executed = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.compute_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def _execute(self, key, job):
+        # Whoever claims a job first runs it: the pool thread it was submitted to, or a pool thread
+        # that needs its result before that thread got to it (see run()).
+        with self._lock:
+            if job.started:
+                return
+            job.started = True
+        previous = getattr(self._local, "in_pool", False)
+        self._local.in_pool = True
+        start = time.perf_counter()
+        try:
+            job.future.set_result(job.fn())
+        except BaseException as e:
+            job.future.set_exception(e)
+        finally:
+            self._local.in_pool = previous
+            with self._lock:
+                self._in_flight.pop(key, None)
+                self.executed += 1
+                self.failed += job.future.exception() is not None
+                self.compute_seconds += time.perf_counter() - start
+
+    # This function will give back fn()'s result, joining an identical run that is already going if there is one:
+    def run(self, key, fn):
+        with self._lock:
+            job = self._in_flight.get(key)
+            joined = job is not None
+            if joined:
+                self.coalesced += 1
+            else:
+                job = self._in_flight[key] = _Job(fn)
+
+        if getattr(self._local, "in_pool", False):
+            # A load that needs another load (e.g. drift needs the outlines) runs it in the same thread
+            # unless it is already running somewhere. Waiting on a job that is still queued could wait
+            # forever: it may be queued behind this very thread's job on a full pool.
+            self._execute(key, job)
+        elif not joined:
+            self._executor.submit(self._execute, key, job)
+
+        start = time.perf_counter()
+        try:
+            return job.future.result()
+        finally:
+            if joined:
+                with self._lock:
+                    self.wait_seconds += time.perf_counter() - start
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "running": len(self._in_flight),
+                "executed": self.executed,
+                "coalesced": self.coalesced,
+                "failed": self.failed,
+                "compute_s": self.compute_seconds,
+                "coalesced_wait_s": self.wait_seconds,
+            }
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a byte ceiling and hit/miss counters."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        # Load outside the lock (on the compute pool) so one slow read doesn't block every other session.
+        return _pool.run(key, lambda: self._load_and_store(key, loader))
+
+    def _load_and_store(self, key, loader):
+        # A run that started just after another one finished finds its result here instead of loading again.
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key][0]
+        value = loader()
+        size = estimate_size(value)
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size_mb": self.current_bytes / 1e6,
+                "max_mb": self.max_bytes / 1e6,
+            }
+
+    def keys(self):
+        with self._lock:
+            return [(key, size) for key, (_, size) in self._entries.items()]
+
+
+_cache = LRUCache(int(float(os.environ.get("ICEAGE_CACHE_MB", DEFAULT_CACHE_MB)) * 1e6))
+_pool = ComputePool(max(1, int(os.environ.get("ICEAGE_COMPUTE_WORKERS", DEFAULT_COMPUTE_WORKERS))))
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def cached(kind, paths, loader, *extra_key):
+    """Return loader() through the shared cache, keyed on kind, the paths' mtimes and extra_key."""
+    if isinstance(paths, str):
+        paths = [paths]
+    key = (kind, tuple((os.path.abspath(p), _mtime(p)) for p in paths)) + tuple(extra_key)
+    return _cache.get_or_load(key, loader)
+
+
+# This function will read a CSV catalog (Glacier-Locations.csv, meltinfo tables, etc.):
+def read_csv(path, **kwargs):
+    return cached("csv", path, lambda: pd.read_csv(path, **kwargs), tuple(sorted(kwargs.items())))
+
+
+# This function will read any vector file geopandas understands:
+def read_geodataframe(path):
+    import geopandas as gpd
+    return cached("geodataframe", path, lambda: gpd.read_file(path))
+
+
+# This function will give back Greenland from the Natural Earth countries file, already as GeoJSON for folium:
+def greenland_geojson(natural_earth_path):
+    def load():
+        world = read_geodataframe(natural_earth_path)
+        greenland = world[world['NAME'] == 'Greenland']
+        # Natural Earth is already in lon/lat, so this is normally a no-op.
+        import projection
+        return projection.to_crs(greenland, projection.WEB_CRS).__geo_interface__
+    return cached("greenland", natural_earth_path, load)
+
+
+# This function will load the outlines of a site/date selection through the cache:
+def load_outlines(site, date_pair=None, store_path=None, base_path=None, include_points=False):
+    # Imported here so pages that never load outlines (Admin, Acknowledgements) don't pull in geopandas.
+    import outline_store
+    default_store = store_path is None and base_path in (None, outline_store.SHAPEFILE_BASE_PATH)
+    store_path = store_path or outline_store.OUTLINE_STORE_PATH
+    base_path = base_path or outline_store.SHAPEFILE_BASE_PATH
+    if default_store and not include_points and outline_store.store_exists(store_path):
+        # Straight from the memory-mapped coordinate buffers shared by every process (see outline_buffers.py).
+        # The frame isn't kept in this cache: building it is a slice of the shared arrays, about a millisecond.
+        import outline_buffers
+        try:
+            return outline_buffers.load_outlines(site, date_pair)
+        except OSError:
+            pass  # No buffers/catalog for this store version yet (or they disagree); read the store instead.
+    if outline_store.store_exists(store_path):
+        if date_pair is not None:
+            # Files are swapped into the partition folder with os.replace, which updates its mtime.
+            watched = outline_store.partition_path(site, date_pair, store_path)
+        else:
+            watched = os.path.join(store_path, f"site={site}")
+    else:
+        watched = os.path.join(base_path, site, date_pair) if date_pair is not None else os.path.join(base_path, site)
+    return cached(
+        "outlines",
+        [store_path, watched],
+        lambda: outline_store.load_outlines(site, date_pair, store_path, base_path, include_points),
+        site,
+        date_pair,
+        include_points,
+    )
+
+
+def cache_stats():
+    return _cache.stats()
+
+
+def compute_stats():
+    """Executed vs. coalesced loads on the compute pool, and how long they took."""
+    return _pool.stats()
+
+
+def cache_entries():
+    """Cached keys with their estimated size, least recently used first."""
+    return _cache.keys()
+
+
+def clear_cache():
+    _cache.clear()
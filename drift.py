@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+import shapely
+from scipy.optimize import linear_sum_assignment
+
+import data_cache
+import outline_store
+import projection
+
+# This module pairs the early and late outline of each iceberg in a date pair and measures how it
+# drifted and shrank between the two images.
+#
+# Outlines are paired by their berg number first (icebergshape04 on both dates). Bergs left over on
+# either date are paired with scipy's linear_sum_assignment on a cost that mixes centroid distance
+# and area ratio:
+#
+#   cost = centroid distance / MATCH_DISTANCE_SCALE_M + |log(late area / early area)|
+#
+# and any assignment costing more than MAX_MATCH_COST is dropped as "no match" (e.g. 0.75 allows
+# 4 km of drift with a third of the area gone, but not an outline twice the size in the same place).
+
+MATCH_DISTANCE_SCALE_M = 10_000.0
+MAX_MATCH_COST = 0.75
+
+DRIFT_COLUMNS = [
+    "site", "date_pair", "berg_id", "early_file", "late_file", "match_method",
+    "x_early", "y_early", "x_late", "y_late", "dx_m", "dy_m", "displacement_m", "direction_deg",
+    "days", "speed_m_per_day", "area_early", "area_late", "area_change", "area_change_pct",
+]
+
+
+def _assign_leftovers(early, late):
+    # Pair unmatched outlines by position and size; returns (early rows, late rows) positions.
+    if early.empty or late.empty:
+        return np.array([], dtype=int), np.array([], dtype=int)
+    early_c = shapely.centroid(early.geometry.values)
+    late_c = shapely.centroid(late.geometry.values)
+    distance = np.hypot(
+        shapely.get_x(early_c)[:, None] - shapely.get_x(late_c)[None, :],
+        shapely.get_y(early_c)[:, None] - shapely.get_y(late_c)[None, :],
+    )
+    area_ratio = np.abs(np.log(shapely.area(late.geometry.values)[None, :] / shapely.area(early.geometry.values)[:, None]))
+    cost = distance / MATCH_DISTANCE_SCALE_M + area_ratio
+    rows, columns = linear_sum_assignment(cost)
+    keep = cost[rows, columns] <= MAX_MATCH_COST
+    return rows[keep], columns[keep]
+
+
+# This function will pair the early/late outlines of one date pair:
+def match_outlines(outlines):
+    """Early and late rows of every matched berg, as two aligned GeoDataFrames plus the match method."""
+    early = outlines[outlines["is_early"]].drop_duplicates("berg_id").reset_index(drop=True)
+    late = outlines[~outlines["is_early"]].drop_duplicates("berg_id").reset_index(drop=True)
+
+    # 1) Same berg number on both dates:
+    early_pos = pd.Series(np.arange(len(early)), index=early["berg_id"].values)
+    late_pos = pd.Series(np.arange(len(late)), index=late["berg_id"].values)
+    shared = early_pos.index.intersection(late_pos.index)
+    early_rows = [early_pos[shared].to_numpy()]
+    late_rows = [late_pos[shared].to_numpy()]
+    methods = [np.full(len(shared), "berg_id", dtype=object)]
+
+    # 2) Everything else by assignment on position and area:
+    early_left = np.setdiff1d(np.arange(len(early)), early_rows[0])
+    late_left = np.setdiff1d(np.arange(len(late)), late_rows[0])
+    assigned_early, assigned_late = _assign_leftovers(early.iloc[early_left], late.iloc[late_left])
+    early_rows.append(early_left[assigned_early])
+    late_rows.append(late_left[assigned_late])
+    methods.append(np.full(len(assigned_early), "assignment", dtype=object))
+
+    early_rows, late_rows = np.concatenate(early_rows).astype(int), np.concatenate(late_rows).astype(int)
+    return early.iloc[early_rows].reset_index(drop=True), late.iloc[late_rows].reset_index(drop=True), np.concatenate(methods)
+
+
+# This function will measure the drift of every matched berg in a set of outlines (any number of date pairs):
+def drift_table(outlines):
+    frames = []
+    for (site, date_pair), pair_outlines in outlines.groupby(["site", "date_pair"], sort=True):
+        early, late, methods = match_outlines(pair_outlines)
+        if early.empty:
+            continue
+        frames.append(pd.DataFrame({
+            "site": site,
+            "date_pair": date_pair,
+            "berg_id": early["berg_id"].to_numpy(),
+            "early_file": early["source_file"].to_numpy(),
+            "late_file": late["source_file"].to_numpy(),
+            "match_method": methods,
+            "geometry_early": early.geometry.values,
+            "geometry_late": late.geometry.values,
+            "days": (late["acquired"].to_numpy() - early["acquired"].to_numpy()) / np.timedelta64(1, "D"),
+        }))
+    if not frames:
+        return pd.DataFrame(columns=DRIFT_COLUMNS)
+    table = pd.concat(frames, ignore_index=True)
+
+    # All the measurements at once, on whole columns:
+    early_geoms = np.asarray(table.pop("geometry_early"), dtype=object)
+    late_geoms = np.asarray(table.pop("geometry_late"), dtype=object)
+    early_c, late_c = shapely.centroid(early_geoms), shapely.centroid(late_geoms)
+    table["x_early"], table["y_early"] = shapely.get_x(early_c), shapely.get_y(early_c)
+    table["x_late"], table["y_late"] = shapely.get_x(late_c), shapely.get_y(late_c)
+    table["dx_m"] = table["x_late"] - table["x_early"]
+    table["dy_m"] = table["y_late"] - table["y_early"]
+    table["displacement_m"] = np.hypot(table["dx_m"], table["dy_m"])
+    # Direction in the map's grid (EPSG:3413), clockwise from grid north:
+    table["direction_deg"] = np.degrees(np.arctan2(table["dx_m"], table["dy_m"])) % 360
+    with np.errstate(invalid="ignore", divide="ignore"):
+        table["speed_m_per_day"] = table["displacement_m"] / table["days"]
+        table["area_early"] = shapely.area(early_geoms)
+        table["area_late"] = shapely.area(late_geoms)
+        table["area_change"] = table["area_late"] - table["area_early"]
+        table["area_change_pct"] = 100 * table["area_change"] / table["area_early"]
+    return table[DRIFT_COLUMNS]
+
+
+# This function will give the (cached) drift table of a whole site:
+def site_drift(site):
+    versions = tuple(outline_store.data_version(site, date_pair) for _, date_pair in outline_store.iter_date_pairs(sites=[site]))
+    return data_cache.cached("drift", [], lambda: drift_table(data_cache.load_outlines(site)), site, versions)
+
+
+def drift_feature_collection(drift, head_fraction=0.25, head_angle_deg=25):
+    """Drift arrows (early centroid -> late centroid, with an arrowhead) as GeoJSON in lon/lat."""
+    if drift.empty:
+        return {"type": "FeatureCollection", "features": []}
+
+    # Arrowheads are built in meters, before the one reprojection of every vertex:
+    start = drift[["x_early", "y_early"]].to_numpy()
+    end = drift[["x_late", "y_late"]].to_numpy()
+    back = start - end
+    length = np.hypot(back[:, 0], back[:, 1])[:, None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        unit = np.where(length > 0, back / length, 0)
+    head = np.clip(length * head_fraction, 0, 500)
+    heads = []
+    for sign in (1, -1):
+        angle = np.radians(sign * head_angle_deg)
+        rotated = np.column_stack([
+            unit[:, 0] * np.cos(angle) - unit[:, 1] * np.sin(angle),
+            unit[:, 0] * np.sin(angle) + unit[:, 1] * np.cos(angle),
+        ])
+        heads.append(end + rotated * head)
+
+    lines = shapely.multilinestrings(
+        shapely.linestrings(np.stack([np.stack([start, end], axis=1), np.stack([heads[0], end], axis=1), np.stack([heads[1], end], axis=1)], axis=1).reshape(-1, 2, 2)),
+        indices=np.repeat(np.arange(len(drift)), 3),
+    )
+    lines = projection.transform_geometries(lines, outline_store.DEFAULT_CRS, projection.WEB_CRS)
+
+    features = []
+    for berg, line in zip(drift.itertuples(index=False), lines):
+        features.append({
+            "type": "Feature",
+            "geometry": shapely.geometry.mapping(line),
+            "properties": {
+                "berg_id": int(berg.berg_id),
+                "match_method": berg.match_method,
+                "displacement_m": round(float(berg.displacement_m), 1),
+                "speed_m_per_day": round(float(berg.speed_m_per_day), 1),
+                "area_change_pct": round(float(berg.area_change_pct), 1),
+            },
+        })
+    return {"type": "FeatureCollection", "features": features}
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+import shapely
+
+# This module measures whole selections of iceberg outlines at once. Everything works on the
+# underlying array of shapely geometries, so the cost grows with the total number of vertices
+# rather than with a Python-level loop (or .apply) per iceberg.
+#
+# All measurements are in the units of the input coordinates; the outlines are stored in
+# EPSG:3413, so widths, heights and centroids are in meters and areas in m².
+
+
+def _geometry_array(geometries):
+    # Accept a GeoSeries, a GeoDataFrame's geometry column, a list or a NumPy array of geometries.
+    if hasattr(geometries, "geometry") and not isinstance(geometries, np.ndarray):
+        geometries = geometries.geometry
+    return np.asarray(getattr(geometries, "values", geometries), dtype=object)
+
+
+# This function will return bounds, width, height, area and centroid for every outline in one go:
+def outline_metrics(geometries):
+    """Per-outline bounds, width, height, area and centroid as a DataFrame (one row per geometry)."""
+    geoms = _geometry_array(geometries)
+    bounds = shapely.bounds(geoms).reshape(-1, 4)
+    centroids = shapely.centroid(geoms)
+
+    metrics = pd.DataFrame({
+        "minx": bounds[:, 0],
+        "miny": bounds[:, 1],
+        "maxx": bounds[:, 2],
+        "maxy": bounds[:, 3],
+        "width": bounds[:, 2] - bounds[:, 0],
+        "height": bounds[:, 3] - bounds[:, 1],
+        "area": shapely.area(geoms),
+        "centroid_x": shapely.get_x(centroids),
+        "centroid_y": shapely.get_y(centroids),
+    })
+    if isinstance(geometries, (pd.Series, pd.DataFrame)):
+        metrics.index = geometries.index
+    return metrics
+
+
+# This function will measure the shape of every outline: perimeter and its minimum rotated rectangle.
+def outline_shape_metrics(geometries):
+    """Per-outline perimeter, rotated-rectangle length/width, long-axis angle and elongation.
+
+    The angle is the direction of the rectangle's long side in degrees, in [0, 180) counter-clockwise
+    from the x axis; elongation is length / width of the rectangle (1 for a square).
+    """
+    geoms = _geometry_array(geometries)
+    n = len(geoms)
+    length = np.full(n, np.nan)
+    width = np.full(n, np.nan)
+    angle = np.full(n, np.nan)
+
+    # All the rectangles at once; each one's first three corners give its two side vectors.
+    rectangles = shapely.oriented_envelope(geoms)
+    coords, owner = shapely.get_coordinates(rectangles, return_index=True)
+    starts = np.searchsorted(owner, np.arange(n))
+    counts = np.bincount(owner, minlength=n)
+    ok = counts >= 4
+    if ok.any():
+        first = starts[ok]
+        side_a = coords[first + 1] - coords[first]
+        side_b = coords[first + 2] - coords[first + 1]
+        len_a = np.hypot(side_a[:, 0], side_a[:, 1])
+        len_b = np.hypot(side_b[:, 0], side_b[:, 1])
+        long_side = np.where((len_a >= len_b)[:, None], side_a, side_b)
+        length[ok] = np.maximum(len_a, len_b)
+        width[ok] = np.minimum(len_a, len_b)
+        angle[ok] = np.degrees(np.arctan2(long_side[:, 1], long_side[:, 0])) % 180
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        elongation = length / width
+    metrics = pd.DataFrame({
+        "perimeter": shapely.length(geoms),
+        "rect_length": length,
+        "rect_width": width,
+        "angle": angle,
+        "elongation": elongation,
+    })
+    if isinstance(geometries, (pd.Series, pd.DataFrame)):
+        metrics.index = geometries.index
+    return metrics
+
+
+def dominant_angle(angles, weights=None):
+    """Mean long-axis direction of a set of outlines, in [0, 180) degrees (NaN if there are none).
+
+    Orientations are axial (10° and 170° are only 20° apart), so they are averaged on the doubled angle.
+    """
+    angles = np.asarray(angles, dtype=float)
+    weights = np.ones_like(angles) if weights is None else np.asarray(weights, dtype=float)
+    ok = np.isfinite(angles) & np.isfinite(weights)
+    if not ok.any():
+        return float("nan")
+    doubled = np.radians(2 * angles[ok])
+    mean = np.arctan2((weights[ok] * np.sin(doubled)).sum(), (weights[ok] * np.cos(doubled)).sum())
+    return float(np.degrees(mean) / 2 % 180)
+
+
+def rotate_many(geometries, angles, origin_x, origin_y):
+    """Rotate each geometry counter-clockwise by its own angle (degrees) about its own origin point."""
+    geoms = _geometry_array(geometries)
+    theta = np.radians(np.broadcast_to(np.asarray(angles, dtype=float), len(geoms)))
+    origins = np.column_stack([np.broadcast_to(origin_x, len(geoms)), np.broadcast_to(origin_y, len(geoms))]).astype(float)
+    coords, owner = shapely.get_coordinates(geoms, return_index=True)
+    cos, sin = np.cos(theta)[owner], np.sin(theta)[owner]
+    shifted = coords - origins[owner]
+    rotated = np.column_stack([shifted[:, 0] * cos - shifted[:, 1] * sin, shifted[:, 0] * sin + shifted[:, 1] * cos])
+    return shapely.set_coordinates(np.array(geoms, copy=True), rotated + origins[owner])
+
+
+# This function will turn every outline so its long axis points the same way, then shift it back to the origin:
+def align_selection(selection, target_angle=0.0):
+    """Copy of a selection dataset with each berg rotated from its own `angle` to target_angle."""
+    aligned = selection.copy()
+    if aligned.empty:
+        return aligned
+    geoms = _geometry_array(aligned["geometry"])
+    centroids = shapely.centroid(geoms)
+    turn = target_angle - aligned["angle"].fillna(target_angle).to_numpy()
+    rotated = rotate_many(geoms, turn, shapely.get_x(centroids), shapely.get_y(centroids))
+
+    metrics = outline_metrics(rotated)
+    aligned["geometry"] = normalize_to_origin(rotated, metrics[["minx", "miny", "maxx", "maxy"]].values)
+    aligned["width"] = metrics["width"].to_numpy()
+    aligned["height"] = metrics["height"].to_numpy()
+    aligned["angle"] = np.where(aligned["angle"].notna(), target_angle % 180, np.nan)
+    return aligned
+
+
+# This function will shift every outline so its own bounding box starts at (0, 0):
+def normalize_to_origin(geometries, bounds=None):
+    """Translate each geometry by minus its own (minx, miny), as one batched coordinate update."""
+    geoms = _geometry_array(geometries)
+    if bounds is None:
+        bounds = shapely.bounds(geoms).reshape(-1, 4)
+    bounds = np.asarray(bounds, dtype=float)
+    return translate_many(geoms, -bounds[:, 0], -bounds[:, 1])
+
+
+def translate_many(geometries, xoff, yoff):
+    """Translate each geometry by its own (xoff, yoff); offsets are arrays with one value per geometry."""
+    geoms = _geometry_array(geometries)
+    offsets = np.column_stack([np.broadcast_to(xoff, len(geoms)), np.broadcast_to(yoff, len(geoms))]).astype(float)
+    coords, owner = shapely.get_coordinates(geoms, return_index=True)
+    return shapely.set_coordinates(np.array(geoms, copy=True), coords + offsets[owner])
+
+
+def selection_extent(metrics):
+    """Largest width and height in a selection, for shared plot limits."""
+    if metrics.empty:
+        return 0.0, 0.0
+    return float(metrics["width"].max()), float(metrics["height"].max())
+
+
+# This function will build the dataset for a site/date selection in one pass: one row per iceberg with its
+# outline shifted to the origin, its bounds, area, orientation, date tag and area quartile. The viewer's plots and tables all reuse it.
+def build_selection_dataset(outlines, early_date):
+    """Origin-shifted outlines plus width, height, area, angle, elongation, early/late flag and quartile for one selection."""
+    selection = outlines[["source_file", "date_tag", "geometry"]].copy()
+    selection["is_early"] = selection["date_tag"] == early_date
+
+    # Bounds, width, height and area for the whole selection at once, then shift every outline to the origin:
+    metrics = outline_metrics(selection.geometry)
+    selection = selection.join(metrics[["width", "height", "area"]])
+    selection = selection.join(outline_shape_metrics(selection.geometry)[["angle", "elongation"]])
+    selection["geometry"] = normalize_to_origin(selection.geometry, metrics[["minx", "miny", "maxx", "maxy"]].values)
+
+    # Split into four equal-count groups by area (same idea as pd.qcut, but also works for fewer than four bergs):
+    if len(selection):
+        rank = selection["area"].rank(method="first") - 1
+        selection["quartile"] = ["Q" + str(int(r * 4 // len(selection)) + 1) for r in rank]
+    else:
+        selection["quartile"] = []
+    return selection.reset_index(drop=True)
+
+
+def quartile_summary(selection):
+    """Count, area range and median elongation of each quartile of a selection (needs area, elongation and quartile columns)."""
+    return selection.groupby("quartile").agg(
+        icebergs=("area", "size"),
+        min_area=("area", "min"),
+        median_area=("area", "median"),
+        max_area=("area", "max"),
+        median_elongation=("elongation", "median"),
+    ).reset_index()
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import shapely
+from scipy.spatial import cKDTree
+
+import app_paths
+import data_cache
+import outline_store
+import projection
+
+# This module loads All_Glacier_Coordinates.csv (EPSG:3413 points tagged with GlacierName/GlacierID)
+# into flat arrays grouped by glacier:
+#
+#   coords[offsets[i]:offsets[i + 1]]   the points of glacier i (one contiguous float64 block)
+#
+# plus a KD-tree over all points, so icebergs can be tagged with their nearest glacier and the
+# distance to it in one vectorized query, and the Home map can draw each glacier without looping
+# over DataFrame rows.
+#
+# The points sit on a regular grid (750 m spacing), so the map draws each glacier as the outline
+# of its grid cells.
+
+GLACIER_COORDINATES_PATH = app_paths.data_path("All_Glacier_Coordinates.csv")
+
+
+class GlacierIndex:
+    """Glacier points as contiguous coordinate blocks per GlacierID, with a KD-tree for nearest lookups."""
+
+    def __init__(self, glacier_ids, glacier_names, offsets, coords):
+        self.glacier_ids = np.asarray(glacier_ids)
+        self.glacier_names = np.asarray(glacier_names)
+        self.offsets = np.asarray(offsets, dtype="int64")
+        self.coords = np.ascontiguousarray(coords, dtype="float64")
+        # Which glacier every point belongs to, for mapping KD-tree hits back to glaciers:
+        self.point_glacier = np.repeat(np.arange(len(self.glacier_ids), dtype="int32"), np.diff(self.offsets))
+        self.tree = cKDTree(self.coords)
+
+    @classmethod
+    def from_csv(cls, path=GLACIER_COORDINATES_PATH):
+        table = pd.read_csv(path, dtype={"GlacierID": str})
+        table = table.sort_values("GlacierID", kind="stable")
+        ids, starts = np.unique(table["GlacierID"].to_numpy(), return_index=True)
+        names = table["GlacierName"].to_numpy()[starts]
+        offsets = np.append(starts, len(table))
+        return cls(ids, names, offsets, table[["X_Coordinate", "Y_Coordinate"]].to_numpy(dtype="float64"))
+
+    def __len__(self):
+        return len(self.glacier_ids)
+
+    def points(self, glacier_id):
+        i = int(np.searchsorted(self.glacier_ids, glacier_id))
+        if i == len(self) or self.glacier_ids[i] != glacier_id:
+            raise KeyError(glacier_id)
+        return self.coords[self.offsets[i]:self.offsets[i + 1]]
+
+    # This function will find the nearest glacier (and the distance to it) for many points at once:
+    def nearest(self, x, y):
+        distances, hits = self.tree.query(np.column_stack([np.atleast_1d(x), np.atleast_1d(y)]))
+        glacier = self.point_glacier[hits]
+        return pd.DataFrame({
+            "glacier_id": self.glacier_ids[glacier],
+            "glacier_name": self.glacier_names[glacier],
+            "glacier_distance_m": distances,
+        })
+
+    def tag_outlines(self, outlines):
+        """Nearest glacier and centroid distance (m) for every outline of a GeoDataFrame in EPSG:3413."""
+        centroids = shapely.centroid(outlines.geometry.values)
+        tags = self.nearest(shapely.get_x(centroids), shapely.get_y(centroids))
+        tags.index = outlines.index
+        return tags
+
+    def cell_size(self):
+        # Grid spacing, from the most common step between neighbouring points.
+        if len(self.coords) < 2:
+            return 0.0
+        distances, _ = self.tree.query(self.coords, k=2)
+        return float(np.median(distances[:, 1]))
+
+    # This function will give the grid-cell outline of every glacier as one GeoJSON FeatureCollection in lon/lat:
+    def footprints_geojson(self, simplify_m=None):
+        half = self.cell_size() / 2
+        cells = shapely.box(self.coords[:, 0] - half, self.coords[:, 1] - half, self.coords[:, 0] + half, self.coords[:, 1] + half)
+        footprints = [shapely.union_all(cells[self.offsets[i]:self.offsets[i + 1]]) for i in range(len(self))]
+        footprints = shapely.simplify(np.asarray(footprints, dtype=object), simplify_m if simplify_m is not None else half)
+        # Every glacier's vertices go to lon/lat in one transform call:
+        footprints = projection.transform_geometries(footprints, outline_store.DEFAULT_CRS, projection.WEB_CRS)
+
+        features = []
+        for i, (glacier_id, name, footprint) in enumerate(zip(self.glacier_ids, self.glacier_names, footprints)):
+            features.append({
+                "type": "Feature",
+                "geometry": shapely.geometry.mapping(footprint),
+                "properties": {"glacier_id": str(glacier_id), "glacier_name": str(name), "points": int(self.offsets[i + 1] - self.offsets[i])},
+            })
+        return {"type": "FeatureCollection", "features": features}
+
+
+# This function is what the pages use to get the (cached) glacier index:
+def get_glacier_index(path=GLACIER_COORDINATES_PATH):
+    return data_cache.cached("glacier-index", path, lambda: GlacierIndex.from_csv(path))
+
+
+def glacier_footprints(path=GLACIER_COORDINATES_PATH):
+    return data_cache.cached("glacier-footprints", path, lambda: get_glacier_index(path).footprints_geojson())
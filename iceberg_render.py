@@ -0,0 +1,207 @@
+import argparse
+import hashlib
+import io
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.patches import PathPatch
+from matplotlib.path import Path
+
+import app_paths
+import data_cache
+import outline_store
+from geometry_metrics import align_selection, build_selection_dataset, selection_extent
+
+# This module draws iceberg outlines into finished PNG images.
+# Figures are built with matplotlib's object-oriented Figure (not pyplot), so they are never
+# registered in pyplot's global figure list and are freed as soon as the PNG bytes are written.
+#
+# Quartile overlays are cached in memory (through data_cache). Only the default colors and opacity
+# (the renders prewarm makes) are also kept on disk under RENDER_CACHE_PATH, so custom color picks
+# can't pile up files there. Pre-warm the disk cache for every site and date pair from the command line:
+#   $ python iceberg_render.py prewarm
+
+EARLY_COLOR = '#f5a442'
+LATE_COLOR = '#8bc34a'
+
+#Change the default colors of the quartiles using the Hex Color picker:
+DEFAULT_QUARTILE_COLORS = {"Q1": "#8bd67a", "Q2": "#e080d7", "Q3": "#f7bf07", "Q4": "#f78307"}
+DEFAULT_QUARTILE_OPACITY = {"Q1": 0.4, "Q2": 0.4, "Q3": 0.4, "Q4": 0.4}
+
+RENDER_CACHE_PATH = app_paths.derived_path("Render-cache")
+
+
+def _polygon_path(geom):
+    # Build one matplotlib Path for a Polygon/MultiPolygon, holes included.
+    polygons = getattr(geom, "geoms", [geom])
+    vertices, codes = [], []
+    for polygon in polygons:
+        for ring in [polygon.exterior, *polygon.interiors]:
+            ring_coords = np.asarray(ring.coords)[:, :2]
+            if len(ring_coords) < 3:
+                continue
+            ring_codes = np.full(len(ring_coords), Path.LINETO, dtype=Path.code_type)
+            ring_codes[0] = Path.MOVETO
+            ring_codes[-1] = Path.CLOSEPOLY
+            vertices.append(ring_coords)
+            codes.append(ring_codes)
+    if not vertices:
+        return None
+    return Path(np.concatenate(vertices), np.concatenate(codes))
+
+
+def draw_outline(ax, geom, color, alpha=0.8, linewidth=2):
+    path = _polygon_path(geom)
+    if path is not None:
+        ax.add_patch(PathPatch(path, facecolor=color, edgecolor='black', alpha=alpha, linewidth=linewidth))
+
+
+def figure_to_png(fig, dpi=100):
+    image_stream = io.BytesIO()
+    fig.savefig(image_stream, format='png', bbox_inches="tight", dpi=dpi)
+    # Drop every artist now rather than waiting for the garbage collector.
+    fig.clear()
+    return image_stream.getvalue()
+
+
+def page_count(n_bergs, page_size):
+    return max(1, math.ceil(n_bergs / page_size))
+
+
+# This function will draw one page of the per-iceberg grid as a single small-multiples image:
+def render_outline_grid(selection, max_width, max_height, page=0, page_size=12, num_columns=3, panel_size=3.0):
+    """Render bergs [page * page_size, (page + 1) * page_size) of a selection into one PNG.
+
+    `selection` needs origin-shifted `geometry`, `source_file` and `is_early` columns.
+    """
+    bergs = selection.iloc[page * page_size:(page + 1) * page_size]
+    num_rows = max(1, math.ceil(len(bergs) / num_columns))
+
+    # Panels take the aspect ratio of the shared extent so the equal-aspect axes fill them:
+    panel_height = panel_size * min(max(max_height / max_width, 0.3), 3.0) if max_width else panel_size
+    fig = Figure(figsize=(panel_size * num_columns, (panel_height + 0.6) * num_rows))
+    axes = fig.subplots(num_rows, num_columns, squeeze=False).flatten()
+
+    for ax, (_, berg) in zip(axes, bergs.iterrows()):
+        draw_outline(ax, berg["geometry"], EARLY_COLOR if berg["is_early"] else LATE_COLOR)
+        ax.set_xlim(0, max_width)
+        ax.set_ylim(0, max_height)
+        ax.set_aspect('equal', adjustable='box')
+        ax.set_xlabel("Width (m)", fontsize=8)
+        ax.set_ylabel("Height (m)", fontsize=8)
+        ax.tick_params(labelsize=7)
+        ax.set_title(berg["source_file"], fontsize=8)
+
+    # Hide the unused panels on the last page:
+    for ax in axes[len(bergs):]:
+        ax.set_visible(False)
+
+    fig.tight_layout()
+    return figure_to_png(fig)
+
+
+# This function will overlay every berg of a quartile in its own panel of a 2x2 figure:
+def render_quartile_overlay(selection, max_width, max_height, quartile_colors=DEFAULT_QUARTILE_COLORS, quartile_opacity=DEFAULT_QUARTILE_OPACITY):
+    fig = Figure(figsize=(12, 12))
+    axes = fig.subplots(2, 2, sharex=True, sharey=True).flatten()
+
+    for ax, quartile in zip(axes, ["Q1", "Q2", "Q3", "Q4"]):
+        ax.set_title(f"Quartile {quartile}", fontsize=10)
+        for geom in selection.loc[selection["quartile"] == quartile, "geometry"]:
+            draw_outline(ax, geom, quartile_colors[quartile], alpha=quartile_opacity[quartile])
+
+        ax.set_xlim(0, max_width)
+        ax.set_ylim(0, max_height)
+        ax.set_xlabel("Width (m)")
+        ax.set_ylabel("Height (m)")
+
+    return figure_to_png(fig)
+
+
+def area_table(selection):
+    return pd.DataFrame({"Shapefile": selection["source_file"], "Area (m²)": selection["area"], "Quartile": selection["quartile"]})
+
+
+def render_key(kind, site, date_pair, settings, version):
+    payload = json.dumps([kind, site, date_pair, settings, version], sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:20]
+
+
+def _write_atomically(path, data):
+    # Write to a temporary file first so a concurrent reader never sees a half-written PNG.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+# This function will return the quartile PNG and the area/quartile table for a selection, rendering only on a cache miss:
+def quartile_overlay(site, date_pair, quartile_colors=DEFAULT_QUARTILE_COLORS, quartile_opacity=DEFAULT_QUARTILE_OPACITY, selection=None, cache_path=RENDER_CACHE_PATH, align=False):
+    """Cached (png_bytes, area_df) keyed on site, date pair, color/opacity/alignment settings and data version.
+
+    Pass `selection` when the caller already built it, to save a reload on a cache miss. With `align`,
+    every berg is rotated so its long axis is horizontal before the bergs are stacked. Only default
+    (unaligned) settings are written to cache_path; other settings live in the in-memory cache only.
+    """
+    settings = {"colors": dict(quartile_colors), "opacity": dict(quartile_opacity)}
+    if align:
+        settings["align"] = True
+    version = outline_store.data_version(site, date_pair)
+    key = render_key("quartiles", site, date_pair, settings, version)
+    png_path = os.path.join(cache_path, f"quartiles-{key}.png")
+    table_path = os.path.join(cache_path, f"quartiles-{key}.csv")
+    on_disk = not align and dict(quartile_colors) == DEFAULT_QUARTILE_COLORS and dict(quartile_opacity) == DEFAULT_QUARTILE_OPACITY
+
+    def load():
+        if on_disk and os.path.exists(png_path) and os.path.exists(table_path):
+            with open(png_path, "rb") as f:
+                return f.read(), pd.read_csv(table_path)
+
+        data = selection
+        if data is None:
+            data = build_selection_dataset(data_cache.load_outlines(site, date_pair), date_pair.split("-")[0])
+        if align:
+            data = align_selection(data)
+        max_width, max_height = selection_extent(data)
+        png = render_quartile_overlay(data, max_width, max_height, quartile_colors, quartile_opacity)
+        table = area_table(data)
+
+        if on_disk:
+            os.makedirs(cache_path, exist_ok=True)
+            _write_atomically(table_path, table.to_csv(index=False).encode())
+            _write_atomically(png_path, png)
+        return png, table
+
+    return data_cache.cached("quartile-render", [], load, key)
+
+
+# This function will render the default quartile overlay for every site and date pair ahead of time:
+def prewarm(sites=None, cache_path=RENDER_CACHE_PATH):
+    count = 0
+    for site, date_pair in outline_store.iter_date_pairs(sites=sites):
+        png, table = quartile_overlay(site, date_pair, cache_path=cache_path)
+        count += 1
+        print(f"{site} {date_pair}: {len(table)} icebergs, {len(png) / 1e3:.0f} kB")
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render cache tools for the iceberg viewer.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    warm = subparsers.add_parser("prewarm", help="Render the quartile overlays for every site/date pair")
+    warm.add_argument("--site", action="append", help="Only pre-warm this site (repeatable)")
+    warm.add_argument("--cache", default=RENDER_CACHE_PATH, help="Render cache directory")
+
+    args = parser.parse_args()
+    if args.command == "prewarm":
+        count = prewarm(args.site, args.cache)
+        print(f"Pre-warmed {count} date pairs into {args.cache}")
+
+
+if __name__ == "__main__":
+    main()
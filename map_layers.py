@@ -0,0 +1,261 @@
+import argparse
+import math
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+import app_paths
+import data_cache
+import outline_buffers
+import outline_index
+import outline_store
+import projection
+from berg_catalog import get_berg_catalog
+from geometry_metrics import outline_metrics
+from glacier_index import GLACIER_COORDINATES_PATH, get_glacier_index
+
+# This module turns iceberg outlines into ready-to-ship GeoJSON for the folium maps.
+# A whole site/date pair becomes one FeatureCollection with the popup fields and colors stored
+# as per-feature properties, so the map needs a single GeoJson layer no matter how many bergs
+# there are, and the browser only receives each outline once.
+
+EARLY_MAP_COLOR = "#7a1037"
+LATE_MAP_COLOR = "#033b59"
+
+# Six decimal places of a degree is about 0.1 m, far finer than the outlines themselves.
+COORDINATE_DECIMALS = 6
+
+
+def _round_coordinates(geoms, decimals=COORDINATE_DECIMALS):
+    return shapely.transform(geoms, lambda coords: np.round(coords, decimals))
+
+
+# This function will build the FeatureCollection for a set of outlines (in EPSG:3413):
+def outlines_to_feature_collection(outlines, early_date=None, later_date=None):
+    if outlines.empty:
+        return {"type": "FeatureCollection", "features": []}
+
+    # Width and height are measured in meters; the lon/lat outlines for the web map were projected once, at ingest:
+    metrics = outline_metrics(outlines.geometry).round(2)
+    glaciers = get_glacier_index().tag_outlines(outlines)
+    geoms = _round_coordinates(projection.web_geometries(outlines))
+
+    features = []
+    for i, (berg, geom) in enumerate(zip(outlines.itertuples(index=False), geoms)):
+        if berg.date_tag == early_date:
+            color = EARLY_MAP_COLOR
+        elif berg.date_tag == later_date:
+            color = LATE_MAP_COLOR
+        else:
+            color = "gray"
+        features.append({
+            "type": "Feature",
+            "geometry": shapely.geometry.mapping(geom),
+            "properties": {
+                "iceberg": berg.source_file,
+                "site": berg.site,
+                "date_pair": berg.date_pair,
+                "date": berg.date_tag,
+                "width_m": float(metrics["width"].iat[i]),
+                "height_m": float(metrics["height"].iat[i]),
+                "glacier": str(glaciers["glacier_name"].iat[i]),
+                "glacier_distance_km": round(float(glaciers["glacier_distance_m"].iat[i]) / 1000, 2),
+                "color": color,
+            },
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+# This function will give back the cached FeatureCollection for one site/date pair:
+def site_feature_collection(site, date_pair):
+    early_date, later_date = date_pair.split("-")
+    version = outline_store.data_version(site, date_pair)
+    return data_cache.cached(
+        "feature-collection",
+        [GLACIER_COORDINATES_PATH],
+        lambda: outlines_to_feature_collection(data_cache.load_outlines(site, date_pair), early_date, later_date),
+        site,
+        date_pair,
+        version,
+    )
+
+
+def filter_features(collection, icebergs):
+    """Keep only the features whose `iceberg` property is in `icebergs`."""
+    wanted = set(icebergs)
+    return {"type": "FeatureCollection", "features": [f for f in collection["features"] if f["properties"]["iceberg"] in wanted]}
+
+
+def feature_collection_center(collection):
+    """(lat, lon) of the middle of a FeatureCollection's bounding box, or None if it is empty."""
+    if not collection["features"]:
+        return None
+    geoms = np.array([shapely.geometry.shape(f["geometry"]) for f in collection["features"]], dtype=object)
+    minx, miny, maxx, maxy = shapely.total_bounds(geoms)
+    return [(miny + maxy) / 2, (minx + maxx) / 2]
+
+
+# ---------------------------------------------------------------------------------------------
+# All-sites (Greenland-wide) map with level of detail.
+#
+#   zoom <= SITE_MARKER_MAX_ZOOM      one marker per site with its iceberg count
+#   zoom <  FULL_RESOLUTION_ZOOM      outlines simplified to ~1 screen pixel for that zoom
+#   zoom >= FULL_RESOLUTION_ZOOM      full-resolution outlines
+#
+# The simplified levels are precomputed once (topology-preserving, in meters) and cached in memory
+# and under LOD_CACHE_PATH. Build them ahead of time with:
+#   $ python map_layers.py precompute
+# ---------------------------------------------------------------------------------------------
+
+SITE_MARKER_MAX_ZOOM = 7
+FULL_RESOLUTION_ZOOM = 12
+LOD_CACHE_PATH = app_paths.derived_path("Map-lod")
+
+
+def meters_per_pixel(zoom, latitude=72.0):
+    """Size of one web-map pixel on the ground at this zoom (Greenland's mid latitude by default)."""
+    return 156543.03392 * math.cos(math.radians(latitude)) / 2 ** zoom
+
+
+def detail_level(zoom):
+    """'sites', 'full', or the integer zoom whose simplification tolerance should be used."""
+    zoom = int(round(zoom))
+    if zoom <= SITE_MARKER_MAX_ZOOM:
+        return "sites"
+    if zoom >= FULL_RESOLUTION_ZOOM:
+        return "full"
+    return zoom
+
+
+# This function will load every outline of every site (in EPSG:3413) in one go:
+def all_outlines():
+    if outline_store.store_exists():
+        # One slice of the memory-mapped buffers (see outline_buffers.py) instead of concatenating every site.
+        try:
+            return outline_buffers.load_outlines()
+        except OSError:
+            pass
+
+    def load():
+        frames = [data_cache.load_outlines(site) for site in sorted({site for site, _ in outline_store.iter_date_pairs()})]
+        frames = [frame for frame in frames if not frame.empty]
+        return pd.concat(frames, ignore_index=True) if frames else outline_store.load_outlines("")
+    return data_cache.cached("all-outlines", [], load, outline_store.store_version())
+
+
+# This function will give one row per site: iceberg count, number of date pairs and a marker location.
+# It comes from the berg catalog (centroids already in lon/lat) when one has been built, so zooming out never loads an outline:
+def site_summary():
+    catalog = get_berg_catalog(build=False)
+    if catalog is not None:
+        return catalog.site_summary()
+
+    def load():
+        outlines = all_outlines()
+        # Centroids in meters, then only those points (not every vertex) go to lon/lat:
+        centroids = shapely.centroid(outlines.geometry.values)
+        lon, lat = projection.transform_xy(shapely.get_x(centroids), shapely.get_y(centroids), outlines.crs, projection.WEB_CRS)
+        frame = pd.DataFrame({
+            "site": outlines["site"].values,
+            "date_pair": outlines["date_pair"].values,
+            "lon": lon,
+            "lat": lat,
+        })
+        return frame.groupby("site").agg(
+            icebergs=("date_pair", "size"),
+            date_pairs=("date_pair", "nunique"),
+            lat=("lat", "mean"),
+            lon=("lon", "mean"),
+        ).reset_index()
+    return data_cache.cached("site-summary", [], load, outline_store.store_version())
+
+
+def _level_layer(level):
+    # The full-resolution or simplified outlines of every site for one level, as a GeoDataFrame in EPSG:4326.
+    version = outline_store.store_version()
+    cache_file = os.path.join(LOD_CACHE_PATH, f"level-{level}-{version}.parquet")
+
+    def load():
+        if os.path.exists(cache_file):
+            return gpd.read_parquet(cache_file)
+
+        outlines = all_outlines()
+        metrics = outline_metrics(outlines.geometry).round(2)
+        if level == "full":
+            geoms = projection.web_geometries(outlines)
+        else:
+            # Simplified in meters, then reprojected (the precomputed lon/lat copy is full resolution).
+            geoms = shapely.simplify(outlines.geometry.values, meters_per_pixel(level), preserve_topology=True)
+            geoms = projection.transform_geometries(geoms, outlines.crs, projection.WEB_CRS)
+
+        layer = gpd.GeoDataFrame({
+            "iceberg": outlines["source_file"].values,
+            "site": outlines["site"].values,
+            "date_pair": outlines["date_pair"].values,
+            "width_m": metrics["width"].values,
+            "height_m": metrics["height"].values,
+        }, geometry=_round_coordinates(geoms), crs=projection.WEB_CRS)
+
+        os.makedirs(LOD_CACHE_PATH, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        layer.to_parquet(tmp_file, index=False)
+        os.replace(tmp_file, cache_file)
+
+        # Levels of older store versions are no longer used (a process still reading one keeps its open file).
+        for name in os.listdir(LOD_CACHE_PATH):
+            if name.startswith("level-") and name.endswith(".parquet") and not name.endswith(f"-{version}.parquet"):
+                try:
+                    os.remove(os.path.join(LOD_CACHE_PATH, name))
+                except OSError:
+                    pass  # Another process removed it first.
+        return layer
+
+    return data_cache.cached("lod-layer", [], load, level, version)
+
+
+# This function will give the outlines to draw for a zoom level, limited to the sites picked and the visible map area:
+def lod_feature_collection(level, sites=None, bounds=None):
+    """FeatureCollection for a detail level; `bounds` is ((south, west), (north, east)) in degrees."""
+    layer = _level_layer(level)
+    if sites is not None:
+        layer = layer[layer["site"].isin(sites)]
+    if bounds is not None:
+        # Ask the spatial index which bergs are in view rather than testing every outline:
+        (south, west), (north, east) = bounds
+        visible = outline_index.get_index().query_bbox(west, south, east, north, crs="EPSG:4326")
+        layer_keys = pd.MultiIndex.from_frame(layer[["site", "date_pair", "iceberg"]])
+        layer = layer[layer_keys.isin(pd.MultiIndex.from_frame(visible[["site", "date_pair", "source_file"]]))]
+
+    features = [
+        {
+            "type": "Feature",
+            "geometry": shapely.geometry.mapping(geom),
+            "properties": {"iceberg": berg.iceberg, "site": berg.site, "date_pair": berg.date_pair, "width_m": berg.width_m, "height_m": berg.height_m},
+        }
+        for berg, geom in zip(layer.itertuples(index=False), layer.geometry.values)
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def precompute_levels():
+    for level in ["full", *range(SITE_MARKER_MAX_ZOOM + 1, FULL_RESOLUTION_ZOOM)]:
+        layer = _level_layer(level)
+        vertices = int(shapely.get_num_coordinates(layer.geometry.values).sum())
+        print(f"level {level}: {len(layer)} outlines, {vertices} vertices")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Map layer tools for the iceberg spatial-distribution page.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("precompute", help="Build the simplified all-sites outline levels")
+
+    args = parser.parse_args()
+    if args.command == "precompute":
+        precompute_levels()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import glob
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+import app_paths
+import data_cache
+
+# This module collects every Melt-rates meltinfo CSV into one typed table.
+# The folder layout isn't consistent (Melt-rates/KOG/20170515-20170611/KOG_..._iceberg_meltinfo.csv vs.
+# the flat Melt-rates/KGS/KGS_..._iceberg_meltinfo.csv), so files are found by name anywhere under the
+# root and the site and date pair are taken from the file name itself.
+#
+# The pages don't search the tree on every rerun: the file list is kept together with the mtime of every
+# folder it came from, and the tree is only walked again when one of those folders changed (adding,
+# removing or renaming a file or folder updates the mtime of the folder that holds it).
+#
+# Build (or rebuild) the catalog from the command line:
+#   $ python melt_catalog.py ingest
+
+MELT_RATES_PATH = app_paths.melt_rates_path()
+MELT_CATALOG_PATH = app_paths.derived_path("Melt-catalog.parquet")
+
+MELTINFO_FILENAME = re.compile(r"^(?P<site>[A-Za-z]+)_(?P<early>\d{8})-(?P<later>\d{8})_iceberg_meltinfo\.csv$")
+
+# Columns used for the volume and draft threshold filters:
+VOLUME_COLUMN = "Volume_i"
+DRAFT_COLUMN = "MedianDraft_mean"
+
+
+def discover_meltinfo_files(root=MELT_RATES_PATH):
+    """Every *_iceberg_meltinfo.csv under the root, whatever folder it sits in."""
+    paths = glob.glob(os.path.join(root, "**", "*_iceberg_meltinfo.csv"), recursive=True)
+    return sorted(path for path in paths if MELTINFO_FILENAME.match(os.path.basename(path)))
+
+
+_discovered = {}
+_discovered_lock = threading.Lock()
+
+
+def _folder_mtimes(folders):
+    mtimes = {}
+    for folder in folders:
+        try:
+            mtimes[folder] = os.stat(folder).st_mtime_ns
+        except OSError:
+            mtimes[folder] = None
+    return mtimes
+
+
+# This function will give the meltinfo files under the root, walking the tree again only when a folder in it changed:
+def meltinfo_files(root=MELT_RATES_PATH):
+    key = os.path.abspath(root)
+    with _discovered_lock:
+        cached = _discovered.get(key)
+        if cached is not None and _folder_mtimes(cached[0]) == cached[0]:
+            return cached[1]
+        # Stat each folder before listing it, so a change made during the walk is seen on the next call.
+        mtimes, paths = {}, []
+        for folder, _, files in os.walk(root):
+            mtimes.update(_folder_mtimes([folder]))
+            paths.extend(os.path.join(folder, name) for name in files if MELTINFO_FILENAME.match(name))
+        if not mtimes:
+            mtimes = _folder_mtimes([root])  # No tree yet: notice when it appears.
+        _discovered[key] = (mtimes, sorted(paths))
+        return _discovered[key][1]
+
+
+def read_meltinfo(path, root=MELT_RATES_PATH):
+    """Read one meltinfo CSV and add its site, date pair and per-file iceberg number."""
+    match = MELTINFO_FILENAME.match(os.path.basename(path))
+    table = pd.read_csv(path)
+    table = table.apply(pd.to_numeric, errors="coerce").astype("float64")
+
+    table.insert(0, "site", match.group("site").upper())
+    table.insert(1, "date_pair", f"{match.group('early')}-{match.group('later')}")
+    table.insert(2, "early_date", pd.to_datetime(match.group("early"), format="%Y%m%d"))
+    table.insert(3, "later_date", pd.to_datetime(match.group("later"), format="%Y%m%d"))
+    table.insert(4, "berg", np.arange(1, len(table) + 1, dtype="int32"))
+    table["source_file"] = os.path.relpath(path, root)
+    return table
+
+
+# This function will build the single catalog table from every meltinfo file:
+def build_catalog(root=MELT_RATES_PATH):
+    frames = [read_meltinfo(path, root) for path in discover_meltinfo_files(root)]
+    if not frames:
+        return pd.DataFrame(columns=["site", "date_pair", "early_date", "later_date", "berg"])
+
+    catalog = pd.concat(frames, ignore_index=True)
+    catalog["site"] = catalog["site"].astype("category")
+    catalog["date_pair"] = catalog["date_pair"].astype("category")
+    catalog["source_file"] = catalog["source_file"].astype("category")
+    return catalog.sort_values(["site", "early_date", "berg"], kind="stable").reset_index(drop=True)
+
+
+def ingest(root=MELT_RATES_PATH, catalog_path=MELT_CATALOG_PATH):
+    catalog = build_catalog(root)
+    os.makedirs(os.path.dirname(catalog_path) or ".", exist_ok=True)
+    tmp_path = f"{catalog_path}.{os.getpid()}.tmp"
+    catalog.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, catalog_path)
+    return catalog
+
+
+class MeltCatalog:
+    """The melt-rate table with a per-site row index for fast filtering in memory."""
+
+    def __init__(self, table):
+        self.table = table.reset_index(drop=True)
+        # Rows are sorted by site then early date, so each site is one contiguous block of rows:
+        site_values = self.table["site"].astype(str).to_numpy()
+        self.site_slices = {}
+        for site in pd.unique(site_values):
+            rows = np.flatnonzero(site_values == site)
+            self.site_slices[site] = (int(rows[0]), int(rows[-1]) + 1)
+        self._early = self.table["early_date"].to_numpy() if len(self.table) else np.array([], dtype="datetime64[ns]")
+        # (site, date pair): the meltinfo files its rows came from, so cache keys don't need a query:
+        self._sources = {}
+        for site, date_pair, source_file in self.table[["site", "date_pair", "source_file"]].astype(str).drop_duplicates().itertuples(index=False):
+            self._sources.setdefault((site, date_pair), []).append(source_file)
+
+    @property
+    def sites(self):
+        return sorted(self.site_slices)
+
+    def date_pairs(self, site):
+        start, stop = self.site_slices.get(site, (0, 0))
+        return list(pd.unique(self.table["date_pair"].iloc[start:stop].astype(str)))
+
+    def source_files(self, site, date_pair):
+        """The meltinfo files (relative to the Melt-rates root) holding a site/date pair."""
+        return self._sources.get((site, date_pair), [])
+
+    # This function will filter the catalog by site, date range and volume/draft thresholds:
+    def query(self, sites=None, start=None, end=None, date_pairs=None, min_volume=None, max_volume=None, min_draft=None, max_draft=None):
+        if sites is None:
+            sites = self.sites
+        elif isinstance(sites, str):
+            sites = [sites]
+
+        start = np.datetime64(pd.Timestamp(start)) if start is not None else None
+        end = np.datetime64(pd.Timestamp(end)) if end is not None else None
+
+        positions = []
+        for site in sites:
+            lo, hi = self.site_slices.get(site, (0, 0))
+            # Within a site the early dates are sorted, so the date range is two binary searches:
+            if start is not None:
+                lo = lo + int(np.searchsorted(self._early[lo:hi], start, side="left"))
+            if end is not None:
+                hi = lo + int(np.searchsorted(self._early[lo:hi], end, side="right"))
+            positions.append(np.arange(lo, hi))
+        rows = self.table.iloc[np.concatenate(positions)] if positions else self.table.iloc[:0]
+
+        mask = np.ones(len(rows), dtype=bool)
+        if date_pairs is not None:
+            mask &= rows["date_pair"].astype(str).isin(list(date_pairs)).to_numpy()
+        if min_volume is not None:
+            mask &= rows[VOLUME_COLUMN].to_numpy() >= min_volume
+        if max_volume is not None:
+            mask &= rows[VOLUME_COLUMN].to_numpy() <= max_volume
+        if min_draft is not None:
+            mask &= rows[DRAFT_COLUMN].to_numpy() >= min_draft
+        if max_draft is not None:
+            mask &= rows[DRAFT_COLUMN].to_numpy() <= max_draft
+        return rows[mask]
+
+
+# This function is what the pages use to get the (cached) catalog:
+def get_catalog(root=MELT_RATES_PATH, catalog_path=MELT_CATALOG_PATH):
+    """Load the catalog, rebuilding it first when any meltinfo CSV is newer than the catalog file."""
+    sources = meltinfo_files(root)
+
+    def load():
+        newest_source = max((os.path.getmtime(path) for path in sources), default=0)
+        if os.path.exists(catalog_path) and os.path.getmtime(catalog_path) >= newest_source:
+            table = pd.read_parquet(catalog_path)
+        else:
+            table = ingest(root, catalog_path)
+        return MeltCatalog(table)
+
+    return data_cache.cached("melt-catalog", [catalog_path, *sources], load)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect every meltinfo CSV into one melt-rate catalog.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Build the catalog from Melt-rates/")
+    ingest_parser.add_argument("--source", default=MELT_RATES_PATH, help="Root of the Melt-rates tree")
+    ingest_parser.add_argument("--catalog", default=MELT_CATALOG_PATH, help="Where to write the catalog")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        catalog = ingest(args.source, args.catalog)
+        print(f"Wrote {len(catalog)} icebergs from {catalog['source_file'].nunique()} files to {args.catalog}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import hashlib
+import io
+
+import numpy as np
+
+import data_cache
+from melt_stats import PartitionSummary
+
+# This module computes correlation matrices over melt-info tables one chunk at a time, so a
+# multi-site, multi-year selection never has to be concatenated into one frame.
+#
+#   Pearson   one pass: every chunk becomes a count/sum/co-moment summary and the summaries are
+#             merged (see melt_stats.PartitionSummary).
+#   Spearman  two passes: the first keeps a uniform sample of up to SPEARMAN_SAMPLE_SIZE rows to
+#             rank against, the second accumulates co-moments of the ranks. When the whole table
+#             fits in the sample the ranks (and so the result) are exact.
+#
+# `chunks` is a function returning a fresh iterator of DataFrames each time it is called.
+#
+# Rows with a missing value in any of the columns are left out, so every entry of a matrix is
+# computed on the same rows.
+
+SPEARMAN_SAMPLE_SIZE = 100_000
+
+
+def pearson(chunks, columns):
+    total = PartitionSummary.empty(columns)
+    for chunk in chunks():
+        total = total.merge(PartitionSummary.from_frame(chunk, columns))
+    return total.correlation(), total.count
+
+
+def _rank_sample(chunks, columns, sample_size, seed=0):
+    # Bottom-k sampling: every row gets a random key and the rows with the smallest keys are kept.
+    rng = np.random.default_rng(seed)
+    sample = np.empty((0, len(columns)))
+    keys = np.empty(0)
+    for chunk in chunks():
+        sample = np.vstack([sample, chunk[columns].to_numpy(dtype="float64")])
+        keys = np.concatenate([keys, rng.random(len(chunk))])
+        if len(keys) > sample_size:
+            keep = np.argpartition(keys, sample_size)[:sample_size]
+            sample, keys = sample[keep], keys[keep]
+    sample = sample[np.isfinite(sample).all(axis=1)]
+    return [np.sort(column) for column in sample.T]
+
+
+def spearman(chunks, columns, sample_size=SPEARMAN_SAMPLE_SIZE):
+    sorted_samples = _rank_sample(chunks, columns, sample_size)
+    total = PartitionSummary.empty(columns)
+    for chunk in chunks():
+        values = chunk[columns].to_numpy(dtype="float64")
+        # Mid-rank against the sample, so tied values share the same (average) rank.
+        ranks = np.column_stack([
+            (np.searchsorted(ranked, column, side="left") + np.searchsorted(ranked, column, side="right")) / 2
+            for ranked, column in zip(sorted_samples, values.T)
+        ])
+        ranks[~np.isfinite(values)] = np.nan
+        total = total.merge(PartitionSummary.from_values(ranks, columns))
+    return total.correlation(), total.count
+
+
+# This function will compute the correlation matrix of a chunked table ("pearson" or "spearman"):
+def correlation(chunks, columns, method="pearson"):
+    if method == "pearson":
+        return pearson(chunks, columns)
+    if method == "spearman":
+        return spearman(chunks, columns)
+    raise ValueError(f"Unknown correlation method: {method}")
+
+
+def frame_chunks(frame, chunk_size=50_000):
+    """Chunk source over one in-memory DataFrame."""
+    return lambda: (frame.iloc[start:start + chunk_size] for start in range(0, max(len(frame), 1), chunk_size))
+
+
+# This function will draw the correlogram heatmap into PNG bytes, cached by the matrix contents:
+def correlogram_png(matrix, dpi=100):
+    # The key is a hash of the matrix itself, so identical selections share one image and
+    # concurrent sessions never overwrite each other's output.
+    digest = hashlib.sha1(matrix.to_numpy(dtype="float64").tobytes() + "|".join(map(str, matrix.columns)).encode()).hexdigest()
+
+    def render():
+        # Plotting libraries are only imported when an image actually has to be drawn.
+        import seaborn as sns
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=(10, 8))
+        ax = fig.add_subplot()
+        sns.heatmap(matrix, annot=True, fmt=".2f", cmap="coolwarm", ax=ax)
+        image_stream = io.BytesIO()
+        fig.savefig(image_stream, format="png", bbox_inches="tight", dpi=dpi)
+        fig.clear()
+        return image_stream.getvalue()
+
+    return data_cache.cached("correlogram", [], render, digest, dpi)
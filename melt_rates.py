@@ -0,0 +1,144 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+import app_paths
+import melt_catalog
+
+# This module turns the meltinfo columns into submarine melt rates, following the last steps of the
+# workflow on the Research Methods page:
+#
+#   volume change (surface melt already removed) -> freshwater flux -> melt rate = flux / submerged area
+#
+# The volume change is the meltinfo VolumeChangeRate, not (Volume_i - Volume_f) / TimeSeparation. The
+# shipped rate is built from the elevation change after the surface melt (and the tide/geoid vertical
+# adjustment) was subtracted, which these tables don't carry on their own:
+#
+#   VolumeChangeRate ~ ElevationChange_mean * SurfaceArea_mean * seawater / (seawater - ice density) / TimeSeparation
+#
+# Differencing the two DEM volumes skips that correction and comes out 0.7 to 11 times the shipped rate on
+# the current files, so it can't stand in for it. check_volume_change() puts the three side by side:
+#   $ python melt_rates.py check
+#
+#   FreshwaterFlux  = VolumeChangeRate * (ice density / freshwater density)        [m³/day water]
+#   MeltRate        = FreshwaterFlux / SubmergedArea_mean                           [m/day water equivalent]
+#
+# The ice density is the mean of Density_i and Density_f. Uncertainties are propagated as
+# independent relative errors added in quadrature (VolumeChangeRate_uncert and SubmergedArea_uncert).
+# Everything is done on whole NumPy columns, so a table of any size is one call.
+#
+# Recompute every site from the melt-rate catalog with:
+#   $ python melt_rates.py compute
+
+FRESHWATER_DENSITY = 1000.0  # kg/m³
+SEAWATER_DENSITY = 1026.0  # kg/m³, for the freeboard -> full thickness step of the cross-check
+DAYS_PER_YEAR = 365.25
+MELT_RATES_OUTPUT_PATH = app_paths.derived_path("Melt-rates-derived.parquet")
+
+MELT_RATE_COLUMNS = ["FreshwaterFlux", "FreshwaterFlux_uncert", "MeltRate", "MeltRate_uncert", "MeltRate_yr", "MeltRate_yr_uncert"]
+
+
+def _column(table, name):
+    return np.asarray(table[name], dtype="float64")
+
+
+# This function will compute freshwater flux and melt rate (with uncertainties) for every row at once:
+def compute_melt_rates(table, freshwater_density=FRESHWATER_DENSITY):
+    volume_rate = _column(table, "VolumeChangeRate")
+    volume_rate_uncert = _column(table, "VolumeChangeRate_uncert")
+    submerged_area = _column(table, "SubmergedArea_mean")
+    submerged_area_uncert = _column(table, "SubmergedArea_uncert")
+    ice_density = (_column(table, "Density_i") + _column(table, "Density_f")) / 2
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        flux = volume_rate * ice_density / freshwater_density
+        flux_uncert = np.abs(volume_rate_uncert * ice_density / freshwater_density)
+
+        melt_rate = flux / submerged_area
+        relative_uncert = np.hypot(flux_uncert / flux, submerged_area_uncert / submerged_area)
+        melt_rate_uncert = np.abs(melt_rate) * relative_uncert
+
+    return pd.DataFrame({
+        "FreshwaterFlux": flux,
+        "FreshwaterFlux_uncert": flux_uncert,
+        "MeltRate": melt_rate,
+        "MeltRate_uncert": melt_rate_uncert,
+        "MeltRate_yr": melt_rate * DAYS_PER_YEAR,
+        "MeltRate_yr_uncert": melt_rate_uncert * DAYS_PER_YEAR,
+    }, index=table.index)
+
+
+# This function will cross-check VolumeChangeRate against the DEM volumes and the corrected elevation change:
+def check_volume_change(table, seawater_density=SEAWATER_DENSITY):
+    """Per-row VolumeChangeRate next to (Volume_i - Volume_f) / TimeSeparation and the rate rebuilt from ElevationChange_mean.
+
+    `differenced_ratio` and `elevation_ratio` are those two divided by VolumeChangeRate; the elevation
+    one should be close to 1, the differenced one shows how much the surface-melt correction changes.
+    """
+    volume_rate = _column(table, "VolumeChangeRate")
+    time_separation = _column(table, "TimeSeparation")
+    ice_density = (_column(table, "Density_i") + _column(table, "Density_f")) / 2
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        differenced = (_column(table, "Volume_i") - _column(table, "Volume_f")) / time_separation
+        from_elevation = (_column(table, "ElevationChange_mean") * _column(table, "SurfaceArea_mean")
+                          * seawater_density / (seawater_density - ice_density) / time_separation)
+        check = pd.DataFrame({
+            "VolumeChangeRate": volume_rate,
+            "differenced_rate": differenced,
+            "elevation_rate": from_elevation,
+            "differenced_ratio": differenced / volume_rate,
+            "elevation_ratio": from_elevation / volume_rate,
+        }, index=table.index)
+    return check
+
+
+def add_melt_rates(table):
+    """The table with the MELT_RATE_COLUMNS appended (existing columns of the same name are replaced)."""
+    table = table.drop(columns=[column for column in MELT_RATE_COLUMNS if column in table.columns])
+    return pd.concat([table, compute_melt_rates(table)], axis=1)
+
+
+# This function will recompute the melt rates of every site in the catalog and write them out:
+def compute_all(output_path=MELT_RATES_OUTPUT_PATH, catalog=None):
+    if catalog is None:
+        catalog = melt_catalog.get_catalog()
+    table = add_melt_rates(catalog.table)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    if output_path.endswith(".csv"):
+        table.to_csv(tmp_path, index=False)
+    else:
+        table.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, output_path)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute submarine melt rates from the meltinfo tables.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compute = subparsers.add_parser("compute", help="Recompute melt rates for every site in the catalog")
+    compute.add_argument("--output", default=MELT_RATES_OUTPUT_PATH, help="Output file (.parquet or .csv)")
+    subparsers.add_parser("check", help="Compare VolumeChangeRate with the DEM volumes and the elevation change")
+
+    args = parser.parse_args()
+    if args.command == "compute":
+        table = compute_all(args.output)
+        summary = table.groupby("site", observed=True)["MeltRate"].agg(["count", "mean"])
+        print(summary.to_string())
+        print(f"Wrote {len(table)} rows to {args.output}")
+    elif args.command == "check":
+        table = melt_catalog.get_catalog().table
+        check = check_volume_change(table)
+        check.insert(0, "site", table["site"].values)
+        summary = check.groupby("site", observed=True)[["differenced_ratio", "elevation_ratio"]].median()
+        print(summary.round(3).to_string())
+        off = (check["elevation_ratio"] - 1).abs() > 0.05
+        print(f"{int(off.sum())} of {len(check)} rows are more than 5% off the rate rebuilt from ElevationChange_mean")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import data_cache
+import melt_catalog
+import melt_rates
+
+# This module keeps small per-partition summaries (one partition = one site/date pair meltinfo file)
+# so the statistics dashboard can aggregate any set of sites and date pairs by merging a handful of
+# pre-aggregated partials instead of rescanning the raw rows.
+#
+# Each summary holds the count, the column sums and the co-moment matrix (sum of the products of
+# deviations from the mean, whose diagonal is the sum of squared deviations). Two summaries merge
+# exactly with the pairwise update of Chan, Golub & LeVeque, so means, standard deviations,
+# covariances and correlations of a merged selection match those of the concatenated rows.
+
+STAT_COLUMNS = ["VolumeChangeRate", "ElevationChange_mean", "MedianDraft_mean", "SubmergedArea_mean", "MeltRate"]
+
+
+def add_melt_rate(table):
+    """Add the MeltRate column (m/day water equivalent, see melt_rates.py)."""
+    table = table.copy()
+    table["MeltRate"] = melt_rates.compute_melt_rates(table)["MeltRate"]
+    return table
+
+
+class PartitionSummary:
+    """Count, sums and co-moments of the STAT_COLUMNS for one block of rows (mergeable)."""
+
+    def __init__(self, count, sums, comoments, columns=STAT_COLUMNS):
+        self.columns = list(columns)
+        self.count = int(count)
+        self.sums = np.asarray(sums, dtype="float64")
+        self.comoments = np.asarray(comoments, dtype="float64")
+
+    @classmethod
+    def empty(cls, columns=STAT_COLUMNS):
+        k = len(columns)
+        return cls(0, np.zeros(k), np.zeros((k, k)), columns)
+
+    @classmethod
+    def from_frame(cls, frame, columns=STAT_COLUMNS):
+        return cls.from_values(frame[columns].to_numpy(dtype="float64"), columns)
+
+    @classmethod
+    def from_values(cls, values, columns=STAT_COLUMNS):
+        # Rows with a missing value in any column are left out so every statistic uses the same rows.
+        values = values[np.isfinite(values).all(axis=1)]
+        if len(values) == 0:
+            return cls.empty(columns)
+        deviations = values - values.mean(axis=0)
+        return cls(len(values), values.sum(axis=0), deviations.T @ deviations, columns)
+
+    @property
+    def mean(self):
+        return self.sums / self.count if self.count else np.full(len(self.columns), np.nan)
+
+    # This function will combine two summaries as if their rows had been scanned together:
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            return other
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        comoments = self.comoments + other.comoments + np.outer(delta, delta) * (self.count * other.count / count)
+        return PartitionSummary(count, self.sums + other.sums, comoments, self.columns)
+
+    def covariance(self, ddof=1):
+        if self.count <= ddof:
+            return np.full_like(self.comoments, np.nan)
+        return self.comoments / (self.count - ddof)
+
+    def std(self, ddof=1):
+        return np.sqrt(np.diag(self.covariance(ddof)))
+
+    def correlation(self):
+        spread = np.sqrt(np.diag(self.comoments))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return pd.DataFrame(self.comoments / np.outer(spread, spread), index=self.columns, columns=self.columns)
+
+    def to_frame(self):
+        """One row per statistic column: count, mean, standard deviation and sum."""
+        return pd.DataFrame({"count": self.count, "mean": self.mean, "std": self.std(), "sum": self.sums}, index=self.columns)
+
+
+# This function will give the (cached) summary of one site/date pair:
+def partition_summary(site, date_pair, catalog=None):
+    if catalog is None:
+        catalog = melt_catalog.get_catalog()
+    sources = [os.path.join(melt_catalog.MELT_RATES_PATH, path) for path in catalog.source_files(site, date_pair)]
+
+    def load():
+        # The raw rows are only picked out of the catalog when the summary isn't cached yet.
+        return PartitionSummary.from_frame(add_melt_rate(catalog.query(sites=site, date_pairs=[date_pair])))
+
+    # Keyed on the partition's own CSV, so a changed or newly added file only recomputes its own summary.
+    return data_cache.cached("melt-summary", sources, load, site, date_pair)
+
+
+# This function will merge the summaries of every picked site/date pair:
+def combine(partitions, catalog=None):
+    total = PartitionSummary.empty()
+    for site, date_pair in partitions:
+        total = total.merge(partition_summary(site, date_pair, catalog))
+    return total
+
+
+def site_partitions(sites, catalog=None, date_pairs=None):
+    """Every (site, date pair) partition of the given sites, optionally limited to some date pairs."""
+    if catalog is None:
+        catalog = melt_catalog.get_catalog()
+    return [(site, pair) for site in sites for pair in catalog.date_pairs(site) if date_pairs is None or pair in date_pairs]
+
+
+# This function will build the per-site comparison table (plus an "All selected" row):
+def site_comparison(partitions, column, catalog=None):
+    index = STAT_COLUMNS.index(column)
+    by_site = {}
+    for site, date_pair in partitions:
+        by_site[site] = by_site.get(site, PartitionSummary.empty()).merge(partition_summary(site, date_pair, catalog))
+
+    total = PartitionSummary.empty()
+    rows = []
+    for site, summary in by_site.items():
+        total = total.merge(summary)
+        rows.append({"site": site, "icebergs": summary.count, "mean": summary.mean[index], "std": summary.std()[index]})
+    rows.append({"site": "All selected", "icebergs": total.count, "mean": total.mean[index], "std": total.std()[index]})
+    return pd.DataFrame(rows)
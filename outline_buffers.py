@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+
+import app_paths
+import data_cache
+
+# This module keeps every iceberg outline as flat, memory-mapped coordinate buffers (the GeoArrow
+# layout), so several Streamlit processes on one machine share one copy of the geometry in the OS
+# page cache instead of each decoding the GeoParquet store onto its own heap:
+#
+#   coords.npy       (n, 2) float64   every vertex of every outline, EPSG:3413
+#   coords-4326.npy  (n, 2) float64   the same vertices in lon/lat for the web maps
+#   offsets-0.npy    int32            where each ring starts in coords
+#   offsets-1.npy    int32            where each polygon starts in the rings
+#   offsets-2.npy    int32            where each outline starts in the polygons (only for MultiPolygons)
+#   buffers.json                      geometry type, number of offset levels, store version
+#
+# Row i of the buffers is row i of the berg catalog (berg_catalog.py), which holds the attributes,
+# so a site/date selection is one contiguous slice of every array. Taking a slice is zero-copy;
+# shapely geometries (GEOS objects live on the heap of each process) are only made for the rows a
+# page asks for, with one shapely.from_ragged_array call.
+#
+# The buffers are named after the outline store's store_version() and built together with the berg
+# catalog by `outline_store.py ingest` (or by hand). The pages never build them: until buffers and a
+# catalog exist for the current store they read the GeoParquet store instead.
+#   $ python outline_buffers.py ingest
+#   $ python benchmarks/bench_worker_memory.py        (memory per worker: GeoParquet vs. buffers)
+
+OUTLINE_BUFFERS_PATH = app_paths.derived_path("Outline-buffers")
+BUFFERS_MANIFEST = "buffers.json"
+
+
+def buffers_folder(version, buffers_path=OUTLINE_BUFFERS_PATH):
+    return os.path.join(buffers_path, f"outlines-{version}")
+
+
+# This function will write an array of shapely geometries as flat coordinate buffers into a new folder:
+def write_buffers(geoms, folder, version):
+    import shapely
+
+    import projection
+
+    if len(geoms):
+        geometry_type, coords, offsets = shapely.to_ragged_array(geoms)
+    else:
+        # An empty store: no vertices, and offsets saying there are no polygons either.
+        geometry_type, coords, offsets = shapely.GeometryType.POLYGON, np.zeros((0, 2)), (np.zeros(1, "i4"), np.zeros(1, "i4"))
+    lon, lat = projection.transform_xy(coords[:, 0], coords[:, 1], projection.CANONICAL_CRS, projection.WEB_CRS)
+
+    # Everything goes into a temporary folder that is renamed into place, so readers never see half of it.
+    tmp_folder = f"{folder}.{os.getpid()}.tmp"
+    os.makedirs(tmp_folder, exist_ok=True)
+    np.save(os.path.join(tmp_folder, "coords.npy"), np.ascontiguousarray(coords, dtype="f8"))
+    np.save(os.path.join(tmp_folder, "coords-4326.npy"), np.column_stack([lon, lat]).astype("f8"))
+    for level, offset in enumerate(offsets):
+        np.save(os.path.join(tmp_folder, f"offsets-{level}.npy"), offset.astype("i4"))
+    with open(os.path.join(tmp_folder, BUFFERS_MANIFEST), "w") as f:
+        json.dump({"geometry_type": int(geometry_type), "levels": len(offsets), "rows": len(geoms), "version": version, "crs": projection.CANONICAL_CRS}, f)
+    try:
+        os.rename(tmp_folder, folder)
+    except OSError:
+        # Another process finished the same version first; its copy is identical.
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+    return folder
+
+
+# This function will write the geometry of every outline, in berg catalog order, as flat coordinate buffers:
+def ingest(store_path=None, base_path=None, buffers_path=OUTLINE_BUFFERS_PATH):
+    import outline_store
+    from berg_catalog import load_collection
+
+    store_path = store_path or outline_store.OUTLINE_STORE_PATH
+    base_path = base_path or outline_store.SHAPEFILE_BASE_PATH
+    version = outline_store.store_version(store_path, base_path)
+    _, frames = load_collection(store_path, base_path)
+    geoms = np.concatenate([np.asarray(frame.geometry.values, dtype=object) for frame in frames] or [np.array([], dtype=object)])
+    folder = write_buffers(geoms, buffers_folder(version, buffers_path), version)
+
+    # Buffers of older store versions are no longer used (processes that still have them mapped keep reading them fine).
+    for name in os.listdir(buffers_path):
+        path = os.path.join(buffers_path, name)
+        if name.startswith("outlines-") and path != folder and not name.endswith(".tmp"):
+            shutil.rmtree(path, ignore_errors=True)
+    return folder
+
+
+class OutlineBuffers:
+    """Coordinates and ring/polygon offsets of every outline, memory-mapped read-only."""
+
+    def __init__(self, folder):
+        with open(os.path.join(folder, BUFFERS_MANIFEST)) as f:
+            manifest = json.load(f)
+        self.folder = folder
+        self.version = manifest["version"]
+        self.geometry_type = manifest["geometry_type"]
+        self.coords = np.load(os.path.join(folder, "coords.npy"), mmap_mode="r")
+        self.web_coords = np.load(os.path.join(folder, "coords-4326.npy"), mmap_mode="r")
+        # Innermost level first (rings), as shapely.to_ragged_array/from_ragged_array order them.
+        self.offsets = [np.load(os.path.join(folder, f"offsets-{level}.npy"), mmap_mode="r") for level in range(manifest["levels"])]
+
+    def __len__(self):
+        return len(self.offsets[-1]) - 1
+
+    def _slice(self, start, stop):
+        # Follow the offsets from the outlines down to the vertices, rebasing each level to start at zero.
+        rebased = []
+        for offset in reversed(self.offsets):
+            part = np.asarray(offset[start:stop + 1])
+            rebased.append(part - part[0])
+            start, stop = int(part[0]), int(part[-1])
+        return start, stop, rebased[::-1]
+
+    def coordinates(self, start, stop, web=False):
+        """Vertices of rows start..stop-1, as a read-only view of the mapped file (no copy)."""
+        first, last, _ = self._slice(start, stop)
+        return (self.web_coords if web else self.coords)[first:last]
+
+    # This function will turn rows start..stop-1 into shapely geometries (only those rows' vertices are copied into GEOS):
+    def geometries(self, start, stop, web=False):
+        import shapely
+        if stop <= start:
+            return np.array([], dtype=object)
+        first, last, offsets = self._slice(start, stop)
+        coords = (self.web_coords if web else self.coords)[first:last]
+        # GEOS adds a closing point to the few degenerate 3-point rings in the shapefiles (zero area either way).
+        return shapely.from_ragged_array(shapely.GeometryType(self.geometry_type), coords, tuple(offsets))
+
+
+# This function will open the buffers for the current outline store, building them first if they don't exist yet:
+def get_buffers(store_path=None, base_path=None, buffers_path=OUTLINE_BUFFERS_PATH, build=True):
+    """With build=False nothing is written: None comes back unless buffers for the current store version exist."""
+    import outline_store
+    store_path = store_path or outline_store.OUTLINE_STORE_PATH
+    base_path = base_path or outline_store.SHAPEFILE_BASE_PATH
+    version = outline_store.store_version(store_path, base_path)
+    if not build and not os.path.exists(os.path.join(buffers_folder(version, buffers_path), BUFFERS_MANIFEST)):
+        return None
+
+    def load():
+        folder = buffers_folder(version, buffers_path)
+        if not os.path.exists(os.path.join(folder, BUFFERS_MANIFEST)):
+            ingest(store_path, base_path, buffers_path)
+        return OutlineBuffers(folder)
+
+    return data_cache.cached("outline-buffers", [], load, os.path.abspath(buffers_path), version)
+
+
+# This function will give the outlines of a site (optionally one date pair; all sites when site is None) from the buffers:
+def load_outlines(site=None, date_pair=None):
+    """Same columns as outline_store.load_outlines (polygons only), attributes from the berg catalog.
+
+    Raises OSError when the buffers or the catalog haven't been built for the current store (or don't
+    match each other, e.g. while another process re-ingests), so callers can read the store instead.
+    """
+    import geopandas as gpd
+
+    import outline_store
+    import projection
+    from berg_catalog import get_berg_catalog
+
+    catalog = get_berg_catalog(build=False)
+    buffers = get_buffers(build=False)
+    if catalog is None or buffers is None:
+        raise FileNotFoundError("No outline buffers and berg catalog for the current outline store; run: python outline_store.py ingest")
+    if buffers.version != catalog.version or len(buffers) != len(catalog):
+        raise OSError(f"Outline buffers ({len(buffers)} rows) don't match the berg catalog ({len(catalog)} rows); rebuild both.")
+    start, stop = (0, len(catalog)) if site is None else catalog.row_range(site, date_pair)
+
+    frame = catalog.frame(catalog.records[start:stop])
+    outlines = gpd.GeoDataFrame({
+        "site": frame["site"].astype(str),
+        "date_pair": frame["date_pair"].astype(str),
+        "berg_id": frame["berg_id"].astype("int64"),
+        "date_tag": frame["date_tag"],
+        "acquired": frame["acquired"].astype("datetime64[us]"),
+        "is_early": frame["is_early"],
+        "source_file": frame["source_file"],
+    }, geometry=gpd.GeoSeries(buffers.geometries(start, stop), crs=outline_store.DEFAULT_CRS), crs=outline_store.DEFAULT_CRS)
+    outlines[projection.WEB_GEOMETRY_COLUMN] = gpd.GeoSeries(buffers.geometries(start, stop, web=True), crs=projection.WEB_CRS)
+    return outlines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write every iceberg outline as memory-mapped coordinate buffers.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Build the buffers from the outline store")
+    ingest_parser.add_argument("--store", default=None, help="Outline store to read (default: the configured one)")
+    ingest_parser.add_argument("--buffers", default=OUTLINE_BUFFERS_PATH, help="Where to write the buffers")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        buffers = OutlineBuffers(ingest(args.store, None, args.buffers))
+        size = buffers.coords.nbytes + buffers.web_coords.nbytes + sum(offset.nbytes for offset in buffers.offsets)
+        print(f"Wrote {len(buffers)} outlines, {len(buffers.coords)} vertices ({size / 1e6:.2f} MB) to {buffers.folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+import data_cache
+import outline_store
+import projection
+
+# This module keeps a spatial index (shapely STRtree) over every iceberg outline, so the map pages can
+# ask "which bergs are in this viewport / within this distance / nearest to this point" without
+# loading every shapefile.
+#
+# The index inputs (keys, bounds and outlines in EPSG:3413) are written next to the outline store at
+# ingest time; the STRtree itself is rebuilt from them when the index is first used in a process,
+# which takes a few milliseconds for the whole catalog. The file records the store_version() it was
+# built from, and the pages rebuild it when the outlines have changed since. Rebuild it on its own with:
+#   $ python outline_index.py build
+
+INDEX_PATH = outline_store.OUTLINE_STORE_PATH + ".index.parquet"
+KEY_COLUMNS = ["site", "date_pair", "source_file"]
+
+
+def _to_store_crs(x, y, crs):
+    # Queries can be given in lon/lat (EPSG:4326) or directly in the store's EPSG:3413 meters.
+    return projection.transform_xy(x, y, crs, outline_store.DEFAULT_CRS)
+
+
+class OutlineIndex:
+    """STRtree over iceberg outlines with bbox, radius and k-nearest queries (distances in meters)."""
+
+    def __init__(self, entries):
+        self.entries = entries.reset_index(drop=True)
+        self.geometries = self.entries.geometry.values
+        self.tree = shapely.STRtree(np.asarray(self.geometries, dtype=object))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _rows(self, positions, distances=None):
+        rows = self.entries.iloc[positions][KEY_COLUMNS + ["berg_id", "date_tag"]].copy()
+        if distances is not None:
+            rows["distance_m"] = distances
+            rows = rows.sort_values("distance_m")
+        return rows
+
+    # This function will return every berg whose outline intersects the box:
+    def query_bbox(self, minx, miny, maxx, maxy, crs=None):
+        if crs not in (None, outline_store.DEFAULT_CRS):
+            # Project all four corners, since a lon/lat box isn't a rectangle in polar stereographic.
+            xs, ys = _to_store_crs(np.array([minx, minx, maxx, maxx]), np.array([miny, maxy, miny, maxy]), crs)
+            minx, miny, maxx, maxy = min(xs), min(ys), max(xs), max(ys)
+        positions = self.tree.query(shapely.box(minx, miny, maxx, maxy), predicate="intersects")
+        return self._rows(np.sort(positions))
+
+    # This function will return every berg within radius_m meters of a point, nearest first:
+    def query_radius(self, x, y, radius_m, crs=None):
+        point = shapely.Point(*_to_store_crs(x, y, crs))
+        positions = self.tree.query(point, predicate="dwithin", distance=radius_m)
+        return self._rows(positions, shapely.distance(self.geometries[positions], point))
+
+    # This function will return the k bergs closest to a point:
+    def nearest(self, x, y, k=1, crs=None):
+        point = shapely.Point(*_to_store_crs(x, y, crs))
+        k = min(k, len(self))
+        if k <= 0:
+            return self._rows([], [])
+
+        # Start with the single nearest distance, then widen the search until it holds k bergs.
+        _, nearest_distance = self.tree.query_nearest(point, return_distance=True)
+        radius = max(float(nearest_distance[0]), 1.0)
+        while True:
+            positions = self.tree.query(point, predicate="dwithin", distance=radius)
+            if len(positions) >= k or len(positions) == len(self):
+                break
+            radius *= 2
+        distances = shapely.distance(self.geometries[positions], point)
+        order = np.argsort(distances)[:k]
+        return self._rows(positions[order], distances[order])
+
+
+# This function will write the index file from the outline store (or the shapefiles when there is no store):
+def build_index(index_path=INDEX_PATH, store_path=outline_store.OUTLINE_STORE_PATH, base_path=outline_store.SHAPEFILE_BASE_PATH):
+    sites = sorted({site for site, _ in outline_store.iter_date_pairs(base_path)})
+    frames = [outline_store.load_outlines(site, None, store_path, base_path) for site in sites]
+    frames = [frame for frame in frames if not frame.empty]
+    outlines = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), geometry="geometry", crs=outline_store.DEFAULT_CRS)
+
+    entries = outlines[KEY_COLUMNS + ["berg_id", "date_tag", "geometry"]].copy()
+    bounds = shapely.bounds(entries.geometry.values)
+    for i, column in enumerate(["minx", "miny", "maxx", "maxy"]):
+        entries[column] = bounds[:, i]
+
+    os.makedirs(os.path.dirname(index_path) or ".", exist_ok=True)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    entries.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, index_path)
+    with open(tmp_path, "w") as f:
+        json.dump({"version": outline_store.store_version(store_path, base_path), "outlines": len(entries)}, f)
+    os.replace(tmp_path, version_path(index_path))
+    return len(entries)
+
+
+def version_path(index_path):
+    return index_path + ".json"
+
+
+def index_version(index_path=INDEX_PATH):
+    try:
+        with open(version_path(index_path)) as f:
+            return json.load(f)["version"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+# This function is what the pages use to get the (cached) index, rebuilt first when the outlines have changed:
+def get_index(index_path=INDEX_PATH, store_path=outline_store.OUTLINE_STORE_PATH, base_path=outline_store.SHAPEFILE_BASE_PATH):
+    version = outline_store.store_version(store_path, base_path)
+
+    def load():
+        if not os.path.exists(index_path) or index_version(index_path) != version:
+            build_index(index_path, store_path, base_path)
+        return OutlineIndex(gpd.read_parquet(index_path))
+    return data_cache.cached("outline-index", [], load, os.path.abspath(index_path), version)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Spatial index over every iceberg outline.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build", help="Rebuild the index file next to the outline store")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        count = build_index()
+        print(f"Indexed {count} outlines into {INDEX_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import os
+import re
+import warnings
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+import app_paths
+import projection
+
+# This module packs every iceberg outline in Iceberg-shapefiles/<SITE>/<DATES>/ into one
+# GeoParquet store partitioned by site and date pair, so the pages can load a whole
+# selection with a single filtered read instead of opening hundreds of shapefiles.
+#
+# Build (or rebuild) the store from the command line:
+#   $ python outline_store.py ingest
+#
+# Store layout:  Derived-data/Iceberg-outlines/site=KOG/date_pair=20170515-20170611/part-0.parquet
+#
+# part-0.parquet holds the shapefile outlines. Other sources append their own file to the same
+# partition (e.g. pscoords-0.parquet from pscoords.py) and are read back together with it.
+
+SHAPEFILE_BASE_PATH = app_paths.shapefiles_path()
+OUTLINE_STORE_PATH = app_paths.derived_path("Iceberg-outlines")
+
+# Proper projection for Greenland; the shapefiles ship without a usable .prj so we assume it.
+DEFAULT_CRS = projection.CANONICAL_CRS
+
+# Two naming schemes are used in the shapefile folders:
+#   WV_20170515174800_icebergshape01.shp  (WorldView acquisition timestamp, YYYYMMDDHHMMSS)
+#   KOG_20170515_iceberg01.shp            (site prefix, acquisition date only)
+WV_FILENAME = re.compile(r"^WV_(?P<stamp>\d{14})_icebergshape(?P<berg>\d+)\.shp$", re.IGNORECASE)
+SITE_FILENAME = re.compile(r"^(?P<prefix>[A-Za-z]+)_(?P<stamp>\d{8})_iceberg(?P<berg>\d+)\.shp$", re.IGNORECASE)
+
+OUTLINE_COLUMNS = ["site", "date_pair", "berg_id", "date_tag", "acquired", "is_early", "source_file", "geometry"]
+
+
+def parse_outline_filename(filename, date_pair):
+    """Parse the berg id, date tag and acquisition timestamp out of a shapefile name."""
+    match = WV_FILENAME.match(filename) or SITE_FILENAME.match(filename)
+    if match is None:
+        return None
+
+    stamp = match.group("stamp")
+    acquired = pd.to_datetime(stamp, format="%Y%m%d%H%M%S" if len(stamp) == 14 else "%Y%m%d")
+    date_tag = stamp[:8]
+    early_date = date_pair.split("-")[0]
+
+    return {
+        "berg_id": int(match.group("berg")),
+        "date_tag": date_tag,
+        "acquired": acquired,
+        "is_early": date_tag == early_date,
+    }
+
+
+# This function will read every shapefile in one date folder into a single GeoDataFrame:
+def read_shapefile_folder(site, date_pair, base_path=SHAPEFILE_BASE_PATH):
+    """Read all outlines of one site/date pair directly from the shapefiles."""
+    folder = os.path.join(base_path, site, date_pair)
+    frames = []
+
+    if os.path.isdir(folder):
+        for filename in sorted(os.listdir(folder)):
+            if not filename.endswith(".shp"):
+                continue
+            info = parse_outline_filename(filename, date_pair)
+            if info is None:
+                continue
+            try:
+                gdf = gpd.read_file(os.path.join(folder, filename))
+            except Exception as e:
+                # A handful of outlines are missing their .shx/.dbf sidecars; skip them rather than fail the whole folder.
+                warnings.warn(f"Skipping unreadable shapefile {filename}: {e}")
+                continue
+            if gdf.empty:
+                continue
+
+            # Files without a .prj are already in EPSG:3413; files that are in it aren't reprojected again.
+            gdf = projection.to_crs(gdf, DEFAULT_CRS)
+
+            gdf = gdf[["geometry"]].copy()
+            gdf["site"] = site
+            gdf["date_pair"] = date_pair
+            gdf["source_file"] = filename
+            for key, value in info.items():
+                gdf[key] = value
+            frames.append(gdf)
+
+    if not frames:
+        return gpd.GeoDataFrame(columns=OUTLINE_COLUMNS, geometry="geometry", crs=DEFAULT_CRS)
+
+    outlines = pd.concat(frames, ignore_index=True)
+    return gpd.GeoDataFrame(outlines[OUTLINE_COLUMNS], geometry="geometry", crs=DEFAULT_CRS)
+
+
+def partition_path(site, date_pair, store_path=OUTLINE_STORE_PATH):
+    return os.path.join(store_path, f"site={site}", f"date_pair={date_pair}")
+
+
+# This function will list every (site, date pair) folder in the shapefile tree:
+def iter_date_pairs(base_path=SHAPEFILE_BASE_PATH, sites=None):
+    # The folder listing comes from the shapefile catalog, which only re-lists folders that changed.
+    import shapefile_catalog
+    yield from shapefile_catalog.get_catalog(base_path).iter_date_pairs(sites)
+
+
+# This function will pack the whole Iceberg-shapefiles tree into the partitioned store:
+def ingest_shapefiles(base_path=SHAPEFILE_BASE_PATH, store_path=OUTLINE_STORE_PATH, sites=None):
+    """Write one GeoParquet partition per site/date pair and return the number of outlines written."""
+    total = 0
+    for site, date_pair in iter_date_pairs(base_path, sites):
+        outlines = read_shapefile_folder(site, date_pair, base_path)
+        target = partition_path(site, date_pair, store_path)
+        # Only the shapefile part is replaced; files appended by other sources stay in place.
+        part_file = os.path.join(target, "part-0.parquet")
+        if os.path.exists(part_file):
+            os.remove(part_file)
+        if outlines.empty:
+            continue
+
+        os.makedirs(target, exist_ok=True)
+        write_partition_file(outlines, part_file)
+        total += len(outlines)
+        print(f"{site} {date_pair}: {len(outlines)} outlines")
+
+    return total
+
+
+def write_partition_file(outlines, path):
+    """Write outlines of one site/date pair into a file inside its partition folder."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # The partition columns live in the directory names, so they are dropped from the file itself.
+    # The EPSG:4326 copy for the web maps is computed here, once, instead of on every map view.
+    projection.add_web_geometry(outlines).drop(columns=["site", "date_pair"]).to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def store_exists(store_path=OUTLINE_STORE_PATH):
+    return os.path.isdir(store_path) and any(name.startswith("site=") for name in os.listdir(store_path))
+
+
+# This function will give a short fingerprint of the data behind a site/date selection, for cache keys:
+def data_version(site, date_pair, store_path=OUTLINE_STORE_PATH, base_path=SHAPEFILE_BASE_PATH):
+    """Fingerprint built from the modification times and sizes of the files that hold a selection."""
+    if store_exists(store_path):
+        folder = partition_path(site, date_pair, store_path)
+    else:
+        folder = os.path.join(base_path, site, date_pair)
+    if not os.path.isdir(folder):
+        return "missing"
+
+    stamps = []
+    for entry in sorted(os.scandir(folder), key=lambda e: e.name):
+        if entry.is_file():
+            info = entry.stat()
+            stamps.append(f"{entry.name}:{info.st_mtime_ns}:{info.st_size}")
+    return hashlib.sha1("|".join(stamps).encode()).hexdigest()[:16]
+
+
+def store_version(store_path=OUTLINE_STORE_PATH, base_path=SHAPEFILE_BASE_PATH):
+    """Fingerprint of the whole outline collection (every site and date pair)."""
+    stamps = [f"{site}/{date_pair}:{data_version(site, date_pair, store_path, base_path)}" for site, date_pair in iter_date_pairs(base_path)]
+    return hashlib.sha1("|".join(stamps).encode()).hexdigest()[:16]
+
+
+# This function is what the pages use to get the outlines for a site/date selection:
+def load_outlines(site, date_pair=None, store_path=OUTLINE_STORE_PATH, base_path=SHAPEFILE_BASE_PATH, include_points=False):
+    """Load the outlines of a site (optionally one date pair) as a GeoDataFrame in EPSG:3413.
+
+    Reads the partitioned store with a predicate on site/date pair when it has been built,
+    otherwise falls back to reading the shapefiles in the matching folder(s). Tracked positions
+    stored as points (PScoords files with a single vertex) are only returned with include_points.
+    """
+    if store_exists(store_path):
+        filters = [("site", "=", site)]
+        if date_pair is not None:
+            filters.append(("date_pair", "=", date_pair))
+        try:
+            outlines = gpd.read_parquet(store_path, filters=filters)
+        except Exception:
+            # pyarrow raises when no partition matches the filter.
+            outlines = gpd.GeoDataFrame(columns=OUTLINE_COLUMNS, geometry="geometry", crs=DEFAULT_CRS)
+        if outlines.crs is None:
+            outlines = outlines.set_crs(DEFAULT_CRS)
+        for column in ["site", "date_pair"]:
+            outlines[column] = outlines[column].astype(str)
+        # The precomputed EPSG:4326 copy comes along when the store has one (see projection.py).
+        outlines = outlines[OUTLINE_COLUMNS + [column for column in [projection.WEB_GEOMETRY_COLUMN] if column in outlines.columns]]
+        if not include_points and len(outlines):
+            outlines = outlines[shapely.get_dimensions(outlines.geometry.values) == 2]
+    else:
+        if date_pair is not None:
+            date_pairs = [date_pair]
+        else:
+            import shapefile_catalog
+            date_pairs = shapefile_catalog.get_catalog(base_path).date_pairs(site)
+        frames = [read_shapefile_folder(site, pair, base_path) for pair in date_pairs]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return gpd.GeoDataFrame(columns=OUTLINE_COLUMNS, geometry="geometry", crs=DEFAULT_CRS)
+        outlines = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), geometry="geometry", crs=DEFAULT_CRS)
+
+    return outlines.sort_values(["date_pair", "source_file"]).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack the iceberg shapefiles into a partitioned GeoParquet store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Build the outline store from Iceberg-shapefiles/")
+    ingest.add_argument("--source", default=SHAPEFILE_BASE_PATH, help="Root of the shapefile tree")
+    ingest.add_argument("--store", default=OUTLINE_STORE_PATH, help="Where to write the GeoParquet store")
+    ingest.add_argument("--site", action="append", help="Only ingest this site (repeatable)")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        total = ingest_shapefiles(args.source, args.store, args.site)
+        print(f"Wrote {total} outlines to {args.store}")
+
+        # Rebuild the spatial index that lives next to the store:
+        import outline_index
+        index_path = args.store + ".index.parquet"
+        count = outline_index.build_index(index_path, args.store, args.source)
+        print(f"Indexed {count} outlines into {index_path}")
+
+        # And the per-berg measurements and memory-mapped geometry buffers the pages read:
+        import berg_catalog
+        import outline_buffers
+        if args.store == OUTLINE_STORE_PATH:
+            print(f"Measured the outlines into {berg_catalog.ingest(args.store, args.source)}")
+            print(f"Wrote the geometry buffers to {outline_buffers.ingest(args.store, args.source)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,6 @@ import folium
 import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
-import numpy as np
 import contextily as ctx
 import glob
 import graphviz
@@ -13,6 +12,8 @@ import warnings
 
 from streamlit_folium import st_folium
 from shapely.affinity import translate
+from outline_store import load_outlines
+import app_paths
 
 
 st.markdown(
@@ -38,8 +39,8 @@ warnings.filterwarnings("ignore")
 
 
 ##CUSTOMIZE SIDEBAR HERE: 
-st.sidebar.image("Iceberg-images/Swirly-iceberg-streamlit.png", caption = "A sculpted Iceberg drifts off of Baffin Island, Nunavut. Icebergs form when chunks of ice calve, or break off, from glaciers, ice shelves, or a larger iceberg. The North Atlantic and the cold waters surrounding Antarctica are home to most of the icebergs on Earth. Credit: Shari Fox, NSIDC")
-st.sidebar.image("Iceberg-images/Beautiful-icebergs-streamlit.png", caption = "Credit: Twila Moon, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Swirly-iceberg-streamlit.png"), caption = "A sculpted Iceberg drifts off of Baffin Island, Nunavut. Icebergs form when chunks of ice calve, or break off, from glaciers, ice shelves, or a larger iceberg. The North Atlantic and the cold waters surrounding Antarctica are home to most of the icebergs on Earth. Credit: Shari Fox, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Beautiful-icebergs-streamlit.png"), caption = "Credit: Twila Moon, NSIDC")
 #st.sidebar.image('Opal.jpg', caption = '🧡My child for a placeholder🧡')
 
 
@@ -57,7 +58,7 @@ st.info('Click here for the [Fjord Abbreviation List & Paired Dates](https://doc
 st.markdown('⏳Note: The error area_df is not defined will be resolved once your input is complete!')
 
 
-base_path = "Iceberg-shapefiles"
+base_path = app_paths.shapefiles_path()
 if os.path.exists(base_path):
     site_names = [name for name in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, name))]
 
@@ -73,7 +74,9 @@ if site_name and early_date and late_date:
     target_folder = os.path.join(base_path, site_name, date_range_folder)
 
     if os.path.exists(target_folder):
-        shapefiles = [f for f in os.listdir(target_folder) if f.endswith('.shp')]
+        # All outlines of the selection come back from the outline store in a single read:
+        outlines = load_outlines(site_name, date_range_folder, base_path=base_path)
+        shapefiles = list(outlines["source_file"])
 
         if shapefiles:
             st.subheader(f"Displaying {len(shapefiles)} Shapefiles")
@@ -82,13 +85,8 @@ if site_name and early_date and late_date:
             shapefile_metadata = []
             area_data = []
 
-            for filename in shapefiles:
-                shapefile_path = os.path.join(target_folder, filename)
-                gdf = gpd.read_file(shapefile_path)
-
-                if gdf.crs is None:
-                    gdf = gdf.set_crs('EPSG:3413')
-                gdf = gdf.to_crs('EPSG:3413')
+            for filename, gdf in outlines.groupby("source_file", sort=False):
+                gdf = gdf[["geometry"]].copy()
 
                 if not gdf.empty:
                     overall_bounds = gdf.total_bounds
@@ -137,23 +135,6 @@ if site_name and early_date and late_date:
 else:
     st.info("Please select a site name, enter both dates, and hit enter to proceed!")
 
- #THIS FUNCTION WILL FIND THE DOMINANT ANGLE:    
-def calculate_dominant_angle(gdf):
-    """Calculate the dominant angle for the geometry in the shapefile."""
-    gdf = gdf[gdf['geometry'].is_valid]  # Ensure geometry is valid
-    bounds = gdf['geometry'].apply(lambda geom: geom.minimum_rotated_rectangle)
-    
-    def longest_edge_angle(box):
-        coords = np.array(box.exterior.coords)
-        edges = np.diff(coords, axis=0)[:-1]  # Skip closing edge
-        lengths = np.linalg.norm(edges, axis=1)
-        longest_idx = np.argmax(lengths)
-        longest_edge = edges[longest_idx]
-        angle = np.arctan2(longest_edge[1], longest_edge[0])
-        return np.degrees(angle)
-    
-    angles = bounds.apply(longest_edge_angle)
-    return angles.mean()  # Use the average dominant angle
 
 #CUSTOMIZE QUARTILE BASED ICEBERG SHAPE COMPARISON HERE: 
 st.title("📊 Quartile-Based Iceberg Shape Comparison")
@@ -165,12 +146,7 @@ quartile_opacity = {"Q1": 0.4, "Q2": 0.4, "Q3": 0.4, "Q4": 0.4}
 # Determine global plot limits for consistent scaling
 max_width, max_height = 0, 0
 for shapefile in area_df["Shapefile"]:
-    shapefile_path = os.path.join(target_folder, shapefile)
-    gdf = gpd.read_file(shapefile_path)
-    
-    if gdf.crs is None:
-        gdf = gdf.set_crs('EPSG:3413')
-    gdf = gdf.to_crs('EPSG:3413')
+    gdf = outlines[outlines["source_file"] == shapefile][["geometry"]].copy()
     
     if not gdf.empty:
         bounds = gdf.total_bounds
@@ -188,12 +164,7 @@ for i, quartile in enumerate(["Q1", "Q2", "Q3", "Q4"]):
     quartile_files = area_df[area_df["Quartile"] == quartile]["Shapefile"]
     
     for shapefile in quartile_files:
-        shapefile_path = os.path.join(target_folder, shapefile)
-        gdf = gpd.read_file(shapefile_path)
-
-        if gdf.crs is None:
-            gdf = gdf.set_crs('EPSG:3413')
-        gdf = gdf.to_crs('EPSG:3413')
+        gdf = outlines[outlines["source_file"] == shapefile][["geometry"]].copy()
         
         color = quartile_colors[quartile]
         opacity = quartile_opacity[quartile]
@@ -13,6 +13,7 @@ from graphviz import Digraph
 import importlib.util
 import sys
 from pathlib import Path
+import app_paths
 
 # CUSTOMIZE FUN APP COLORS HERE:
 st.markdown(
@@ -49,12 +50,12 @@ map_style = st.sidebar.selectbox(
     index=0  # Default style: CartoDB positron
 )
 
-st.sidebar.image("Iceberg-images/Calving-streamlit.png", caption = "An iceberg towers above the waters of Ilulissat Icefjord, after calving off of Sermeq Kujalleq, or Jakobshavn Glacier, in western Greenland. Credit: Allen Pope, NSIDC")
-st.sidebar.image("Iceberg-images/Boats-n-icebergs-streamlit.png", caption= "A scientific research vessel churns through the coastal waters of western Greenland, leaving an open path through small icebergs and bergy bits. Instruments deployed in the region help researchers to better understand ocean conditions and how narwhal whales use the glacial fjord environment. Credit: Twila Moon, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Calving-streamlit.png"), caption = "An iceberg towers above the waters of Ilulissat Icefjord, after calving off of Sermeq Kujalleq, or Jakobshavn Glacier, in western Greenland. Credit: Allen Pope, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Boats-n-icebergs-streamlit.png"), caption= "A scientific research vessel churns through the coastal waters of western Greenland, leaving an open path through small icebergs and bergy bits. Instruments deployed in the region help researchers to better understand ocean conditions and how narwhal whales use the glacial fjord environment. Credit: Twila Moon, NSIDC")
 #CUSTOMIZE GREENLAND MAP HERE: 
 st.title("🗺️ Map of Greenland with selected study sites:")
-csv_file_path = "/workspaces/Greenland-icebergmeltrate-interactive/Glacier-Locations.csv"
-natural_earth_path = "/workspaces/Greenland-icebergmeltrate-interactive/ne_110m_admin_0_countries.zip"
+csv_file_path = app_paths.data_path("Glacier-Locations.csv")
+natural_earth_path = app_paths.data_path("ne_110m_admin_0_countries.zip")
 
 def create_interactive_map(glacier_sites, map_style):
     # Load Natural Earth dataset
@@ -143,7 +144,7 @@ dot.edges(['AB', 'BC', 'CD', 'DE', 'EF', 'FG', 'GH'])
 col1 = st.container()
 with col1:
     st.graphviz_chart(dot)
-    st.image("Iceberg-images/Aman-cool-scientist.png", caption="Woot woot", use_container_width=True)  # Replace with your image path
+    st.image(app_paths.app_path("Iceberg-images", "Aman-cool-scientist.png"), caption="Woot woot", use_container_width=True)  # Replace with your image path
 
 
 st.title("Data Generation:")
@@ -5,6 +5,8 @@ import folium
 from streamlit_folium import st_folium
 import os
 import warnings
+import app_paths
+import projection
 
 # Suppress CRS warning for missing EPSG
 warnings.filterwarnings("ignore", message=".*CRS is None.*")
@@ -12,7 +14,7 @@ warnings.filterwarnings("ignore", message=".*CRS is None.*")
 st.title("🗺️ Visualize iceberg spatial distributions")
 st.markdown("This is an interactive map that will allow you to zoom into specific sites in order to visualize spatial distributions of icebergs in Greenland.")
 # Sidebar image and information
-st.sidebar.image("Iceberg-images/Glacier-iceberg-Streamlit.png", caption="An iceberg sits in Kongsfjord, with Midtre Lovénbreen in the background, at 79°N, in northern Svalbard. Located near the research town of Ny-Ålesund, it is an ideal location to study Arctic glaciology. Credit: Allen Pope, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Glacier-iceberg-Streamlit.png"), caption="An iceberg sits in Kongsfjord, with Midtre Lovénbreen in the background, at 79°N, in northern Svalbard. Located near the research town of Ny-Ålesund, it is an ideal location to study Arctic glaciology. Credit: Allen Pope, NSIDC")
 
 st.info('Fill out the prompts in the sidebar to display the interactive map! Enjoy puffins while you wait. :)')
 st.markdown('👆Click the icebergs to view information pertaining to iceberg width, height, etc.')
@@ -32,21 +34,17 @@ st.info('Click here for the [Fjord Abbreviation List & Paired Dates](https://doc
    # unsafe_allow_html=True
 #)
 # File paths
-csv_file_path = "/workspaces/Greenland-icebergmeltrate-interactive/Glacier-Locations.csv"
-shapefile_base_path = "/workspaces/Greenland-icebergmeltrate-interactive/Iceberg-shapefiles"
+csv_file_path = app_paths.data_path("Glacier-Locations.csv")
+shapefile_base_path = app_paths.shapefiles_path()
 
-# Function to load and reproject shapefile
+# Function to load a shapefile in EPSG:3413 (Greenland's Polar Stereographic, meters), with its EPSG:4326 copy for Folium
 def load_and_reproject_shapefile(filepath):
     gdf = gpd.read_file(filepath)
-    if gdf.crs is None:
-        gdf.set_crs("EPSG:3413", inplace=True)  # Set EPSG:3413 for Greenland's Polar Stereographic
-    return gdf.to_crs("EPSG:4326")  # Reproject to EPSG:4326 for Folium compatibility
+    return projection.add_web_geometry(gdf)
 
 # Function to calculate width and height of the iceberg (bounding box)
 def calculate_width_height(gdf):
-    # Reproject to EPSG:3413 (meters)
-    gdf = gdf.to_crs("EPSG:3413")
-    
+    # The outlines are kept in EPSG:3413 (meters), so there is nothing to reproject
     # Get the bounding box of the iceberg shape in meters
     bounds = gdf.total_bounds
     width = bounds[2] - bounds[0]  # x_max - x_min (in meters)
@@ -95,14 +93,14 @@ def create_interactive_map(glacier_sites, site_id, early_date, later_date, selec
                 
                 # Create GeoJson with popup
                 folium.GeoJson(
-                    gdf.__geo_interface__,
+                    projection.web_frame(gdf).__geo_interface__,
                     name=iceberg,
                     style_function=lambda x, color=color: {"color": color, "weight": 1},
                     popup=folium.Popup(popup_content, max_width=300)  # Add popup
                 ).add_to(m)
                 
                 # Zoom into iceberg centroid
-                centroid = gdf.geometry.centroid.iloc[0]
+                centroid = projection.web_frame(gdf).geometry.centroid.iloc[0]
                 m.location = [centroid.y, centroid.x]
                 m.zoom_start = 12
     else:
@@ -133,14 +131,14 @@ def create_interactive_map(glacier_sites, site_id, early_date, later_date, selec
                 
                 # Create GeoJson with popup
                 folium.GeoJson(
-                    gdf.__geo_interface__,
+                    projection.web_frame(gdf).__geo_interface__,
                     name=iceberg,
                     style_function=lambda x, color=color: {"color": color, "weight": 1},
                     popup=folium.Popup(popup_content, max_width=300)  # Add popup
                 ).add_to(m)
                 
                 # Zoom into iceberg centroid
-                centroid = gdf.geometry.centroid.iloc[0]
+                centroid = projection.web_frame(gdf).geometry.centroid.iloc[0]
                 m.location = [centroid.y, centroid.x]
                 m.zoom_start = 12
     
@@ -1,5 +1,6 @@
 import streamlit as st
 import warnings
+import app_paths
 
 # CUSTOMIZE FUN APP COLORS HERE:
 st.markdown(
@@ -40,8 +41,8 @@ st.markdown("""
 
 
 
-st.sidebar.image("Iceberg-images/Scenic-glacier-streamlit.png", caption = "Tundra ponds form along the coast near Ilulissat, Greenland, while icebergs are visible along the horizon. Credit: Twila Moon, NSIDC")
-st.sidebar.image("Iceberg-images/Chilly-iceberg-streamlit.png", caption = "Credit: Twila Moon, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Scenic-glacier-streamlit.png"), caption = "Tundra ponds form along the coast near Ilulissat, Greenland, while icebergs are visible along the horizon. Credit: Twila Moon, NSIDC")
+st.sidebar.image(app_paths.app_path("Iceberg-images", "Chilly-iceberg-streamlit.png"), caption = "Credit: Twila Moon, NSIDC")
 
 
 st.markdown("<h3>If you liked this ICE-AGE application, you may also be interested in: </h3>", unsafe_allow_html=True)
@@ -0,0 +1,107 @@
+import os
+import sys
+import threading
+import time
+import types
+
+import app_paths
+
+# This module runs the pages in Navigation-pages/ for streamlit_app.py.
+# Streamlit re-runs the app script on every click, so the selected page has to run again each time,
+# but its file only needs to be read and compiled once: the code object is kept per process (and
+# recompiled only when the file changes on disk), and each rerun just executes it in a fresh module.
+#
+# The first run of a page in the process is its "cold" start: it pays for compiling and for the
+# first import of whatever libraries it needs. Later runs are "warm". Both are recorded per page,
+# along with the heavy libraries the cold start pulled in, and shown on the Admin page.
+
+# label shown in the sidebar: (module name, file in Navigation-pages/)
+PAGES = {
+    "Home": ("home", "Home.py"),  # Shows the main focus of the application
+    "Iceberg Shapefile Viewer": ("page1", "Iceberg-shapefile-viewer.py"),  # Loads and displays iceberg shapefiles, then divides plots into quartiles.
+    "Statistics Dashboard": ("page2", "Statistics-dashboard.py"),  # Loads and displays iceberg melt information and associated statistics.
+    "Research Methods": ("page3", "Research-methods.py"),  # Displays the methods used for data generation and work flow
+    "Map of Iceberg Distributions": ("page4", "Iceberg-spatial-distributions.py"),  # Interactive map to see spatial orientation of icebergs
+    "Field Work Experiences": ("page5", "Field-Work-images.py"),  # Fun pictures from the field!
+    "Acknowledgements": ("acknowledgements", "Acknowledgements.py"),  # Displays authors and award numbers.
+    "Admin": ("admin", "Admin.py"),  # Shows data cache hit/miss counters, page load times and memory use.
+}
+
+# Libraries that take long enough to import that we want to know which page pulls them in:
+HEAVY_MODULES = ["geopandas", "folium", "seaborn", "graphviz", "contextily", "matplotlib", "shapely", "pyproj", "scipy"]
+
+_lock = threading.Lock()
+_code = {}  # path: (mtime, code object)
+_timings = {}  # label: {...}
+
+
+def page_path(label):
+    return app_paths.app_path("Navigation-pages", PAGES[label][1])
+
+
+# This function will give back the compiled code of a page, compiling it only the first time (or after an edit):
+def compiled_page(path):
+    mtime = os.path.getmtime(path)
+    with _lock:
+        entry = _code.get(path)
+        if entry is not None and entry[0] == mtime:
+            return entry[1], 0.0
+    start = time.perf_counter()
+    with open(path, encoding="utf-8") as f:
+        code = compile(f.read(), path, "exec")
+    seconds = time.perf_counter() - start
+    with _lock:
+        _code[path] = (mtime, code)
+    return code, seconds
+
+
+# This function will run one page and record how long it took:
+def run_page(label):
+    name, _ = PAGES[label]
+    path = page_path(label)
+    code, compile_seconds = compiled_page(path)
+    module = types.ModuleType(name)
+    module.__file__ = path
+    sys.modules[name] = module
+
+    already_imported = {lib for lib in HEAVY_MODULES if lib in sys.modules}
+    start = time.perf_counter()
+    try:
+        exec(code, module.__dict__)
+    finally:
+        # st.stop()/st.rerun() end a page with an exception; the time up to there still counts.
+        _record(label, time.perf_counter() - start, compile_seconds,
+                [lib for lib in HEAVY_MODULES if lib in sys.modules and lib not in already_imported])
+    return module
+
+
+def _record(label, seconds, compile_seconds, new_imports):
+    with _lock:
+        timing = _timings.get(label)
+        if timing is None:
+            _timings[label] = {"cold_s": seconds + compile_seconds, "compile_s": compile_seconds, "imported": new_imports,
+                               "warm_runs": 0, "warm_total_s": 0.0, "last_s": seconds}
+            return
+        timing["warm_runs"] += 1
+        timing["warm_total_s"] += seconds + compile_seconds
+        timing["last_s"] = seconds + compile_seconds
+
+
+def page_timings():
+    """One row per page that has run in this process: cold start, warm average and heavy imports."""
+    with _lock:
+        rows = []
+        for label in PAGES:
+            timing = _timings.get(label)
+            if timing is None:
+                continue
+            rows.append({
+                "page": label,
+                "cold start (s)": round(timing["cold_s"], 3),
+                "compile (s)": round(timing["compile_s"], 4),
+                "warm runs": timing["warm_runs"],
+                "warm average (s)": round(timing["warm_total_s"] / timing["warm_runs"], 3) if timing["warm_runs"] else None,
+                "last run (s)": round(timing["last_s"], 3),
+                "libraries first imported": ", ".join(timing["imported"]),
+            })
+        return rows
@@ -0,0 +1,150 @@
+import argparse
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+import app_paths
+import outline_store
+
+# This module reads the iceberg tracking files exported next to the DEM pairs:
+#   <DATES>/<DATES>-PScoords/icebergNN_PScoords.txt
+# Each file holds paired polar-stereographic vertices of one iceberg in both DEMs:
+#   DEM1: Y (m),DEM1: X (m),DEM2: Y (m),DEM2: X (m)
+# DEM1 is the early date and DEM2 the later one. A file with three or more vertices becomes an
+# early and a late Polygon; a file with fewer (the tracked position only) becomes two Points.
+# Both get the iceberg number from the file name as their berg_id, matching the shapefile outlines.
+#
+# The parsed geometries are appended to the outline store as pscoords-0.parquet inside the
+# site/date pair partition. The folder names don't carry the site, so it is taken from the
+# nearest outline of the same date pair in the spatial index unless --site is given.
+#   $ python pscoords.py ingest                         (every *-PScoords folder under the data root)
+#   $ python pscoords.py ingest 20170611-20170713/20170611-20170713-PScoords --site KOG
+
+PSCOORDS_FOLDER = re.compile(r"^(?P<early>\d{8})-(?P<later>\d{8})-PScoords$")
+PSCOORDS_FILENAME = re.compile(r"^iceberg(?P<berg>\d+)_PScoords\.txt$", re.IGNORECASE)
+PSCOORDS_PART_FILE = "pscoords-0.parquet"
+
+
+def discover_pscoords_folders(root=app_paths.data_path()):
+    """Every <DATES>-PScoords folder under root (macOS resource-fork copies are skipped)."""
+    folders = glob.glob(os.path.join(root, "**", "*-PScoords"), recursive=True)
+    return sorted(folder for folder in folders
+                  if os.path.isdir(folder) and PSCOORDS_FOLDER.match(os.path.basename(folder)) and "__MACOSX" not in folder)
+
+
+def read_pscoords(path):
+    """(early_xy, late_xy) vertex arrays of one file, read in one bulk call."""
+    values = np.loadtxt(path, delimiter=",", skiprows=1, ndmin=2, dtype="float64")
+    # Columns are Y before X for each DEM.
+    return values[:, [1, 0]], values[:, [3, 2]]
+
+
+def _to_geometry(xy):
+    if len(xy) >= 3:
+        return shapely.polygons(xy)
+    return shapely.points(xy[0])
+
+
+def parse_file(path):
+    """Parse one PScoords file into (berg_id, early geometry WKB, late geometry WKB), or None."""
+    match = PSCOORDS_FILENAME.match(os.path.basename(path))
+    if match is None:
+        return None
+    early_xy, late_xy = read_pscoords(path)
+    if len(early_xy) == 0:
+        return None
+    # WKB keeps the results cheap to send back from the worker processes.
+    return int(match.group("berg")), shapely.to_wkb(_to_geometry(early_xy)), shapely.to_wkb(_to_geometry(late_xy))
+
+
+# This function will turn one PScoords folder into early/late rows in the outline store's columns:
+def read_pscoords_folder(folder, site, executor=None):
+    date_pair = PSCOORDS_FOLDER.match(os.path.basename(folder)).group(0)[:-len("-PScoords")]
+    early_date, later_date = date_pair.split("-")
+    paths = sorted(glob.glob(os.path.join(folder, "*_PScoords.txt")))
+
+    if executor is not None:
+        parsed = list(executor.map(parse_file, paths, chunksize=max(1, len(paths) // 64)))
+    else:
+        parsed = [parse_file(path) for path in paths]
+    parsed = [(path, result) for path, result in zip(paths, parsed) if result is not None]
+    if not parsed:
+        return gpd.GeoDataFrame(columns=outline_store.OUTLINE_COLUMNS, geometry="geometry", crs=outline_store.DEFAULT_CRS)
+
+    rows = []
+    for path, (berg_id, early_wkb, late_wkb) in parsed:
+        for date_tag, wkb in [(early_date, early_wkb), (later_date, late_wkb)]:
+            rows.append({
+                "site": site,
+                "date_pair": date_pair,
+                "berg_id": berg_id,
+                "date_tag": date_tag,
+                "acquired": pd.to_datetime(date_tag, format="%Y%m%d"),
+                "is_early": date_tag == early_date,
+                "source_file": os.path.basename(path),
+                "geometry": wkb,
+            })
+    frame = pd.DataFrame(rows)
+    frame["geometry"] = shapely.from_wkb(frame["geometry"].values)
+    return gpd.GeoDataFrame(frame[outline_store.OUTLINE_COLUMNS], geometry="geometry", crs=outline_store.DEFAULT_CRS)
+
+
+def infer_site(folder, date_pair):
+    """Site of the outline nearest to the folder's first tracked position (same date pair preferred)."""
+    import outline_index
+
+    paths = sorted(glob.glob(os.path.join(folder, "*_PScoords.txt")))
+    if not paths:
+        return None
+    early_xy, _ = read_pscoords(paths[0])
+    candidates = outline_index.get_index().nearest(early_xy[0, 0], early_xy[0, 1], k=20)
+    same_pair = candidates[candidates["date_pair"] == date_pair]
+    return (same_pair if not same_pair.empty else candidates)["site"].iloc[0] if not candidates.empty else None
+
+
+# This function will parse every PScoords folder and append the results to the outline store:
+def ingest_pscoords(folders=None, site=None, store_path=outline_store.OUTLINE_STORE_PATH, workers=None):
+    folders = folders or discover_pscoords_folders()
+    written = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for folder in folders:
+            date_pair = os.path.basename(os.path.normpath(folder))[:-len("-PScoords")]
+            folder_site = site or infer_site(folder, date_pair)
+            if folder_site is None:
+                print(f"{folder}: could not work out the site, pass --site")
+                continue
+
+            tracks = read_pscoords_folder(folder, folder_site, executor)
+            if tracks.empty:
+                continue
+            target = outline_store.partition_path(folder_site, date_pair, store_path)
+            os.makedirs(target, exist_ok=True)
+            outline_store.write_partition_file(tracks, os.path.join(target, PSCOORDS_PART_FILE))
+            written[(folder_site, date_pair)] = len(tracks)
+            print(f"{folder_site} {date_pair}: {len(tracks) // 2} tracked icebergs from {folder}")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append PScoords tracking files to the outline store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest = subparsers.add_parser("ingest", help="Parse PScoords folders into the outline store")
+    ingest.add_argument("folders", nargs="*", help="PScoords folders (default: every *-PScoords folder)")
+    ingest.add_argument("--site", help="Site of the folders (default: inferred from the outline index)")
+    ingest.add_argument("--store", default=outline_store.OUTLINE_STORE_PATH, help="Outline store to append to")
+    ingest.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+
+    args = parser.parse_args()
+    if args.command == "ingest":
+        written = ingest_pscoords(args.folders, args.site, args.store, args.workers)
+        print(f"Wrote {sum(written.values())} geometries into {len(written)} partitions of {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import threading
+import time
+
+import app_paths
+
+# This module keeps one catalog of the Iceberg-shapefiles tree, so the pages can fill their
+# site/date selectboxes without listing directories on every rerun:
+#
+#   site -> date pair -> berg shapefiles (berg id, date tag, and which of its .shx/.dbf/.prj are missing)
+#
+# A shapefile counts as readable when its .shx is there; without a .dbf or .prj the outline still
+# loads (without attributes, in the default CRS), so those are only reported.
+#
+# The tree is scanned once and the result saved to Derived-data/Shapefile-catalog.json. After that
+# it is refreshed incrementally: a folder is only listed again when its modification time changed
+# (adding, removing or renaming a file or folder updates the mtime of the folder that holds it).
+# When watchdog is installed (it comes with streamlit) the tree is also watched for changes, so a
+# rerun with nothing changed doesn't even stat the folders; without it the folders are checked at
+# most every CATALOG_POLL_SECONDS.
+#   $ python shapefile_catalog.py scan          (rescan everything and list incomplete shapefiles)
+
+CATALOG_INDEX_PATH = app_paths.derived_path("Shapefile-catalog.json")
+SIDECAR_EXTENSIONS = (".shp", ".shx", ".dbf", ".prj")
+REQUIRED_EXTENSIONS = (".shp", ".shx")
+CATALOG_POLL_SECONDS = 2.0
+
+# Bump when the index layout changes, so old index files are rescanned instead of misread.
+CATALOG_VERSION = 1
+
+
+def _scan_date_pair(folder, date_pair):
+    # Imported here so reading the catalog doesn't pull in geopandas; only a rescan needs the filename parser.
+    import outline_store
+
+    # One listing of the folder gives every shapefile and its sidecar files.
+    names = os.listdir(folder)
+    by_stem = {}
+    for name in names:
+        stem, ext = os.path.splitext(name)
+        by_stem.setdefault(stem, set()).add(ext.lower())
+
+    bergs = []
+    for name in sorted(names):
+        if not name.endswith(".shp"):
+            continue
+        info = outline_store.parse_outline_filename(name, date_pair)
+        missing = [ext for ext in SIDECAR_EXTENSIONS if ext not in by_stem[os.path.splitext(name)[0]]]
+        bergs.append({
+            "file": name,
+            "berg_id": info["berg_id"] if info else None,
+            "date_tag": info["date_tag"] if info else None,
+            "is_early": info["is_early"] if info else None,
+            "missing": missing,
+            "readable": not any(ext in REQUIRED_EXTENSIONS for ext in missing),
+        })
+    return bergs
+
+
+def _refresh_tree(base_path, tree):
+    """Bring a catalog tree up to date, listing only the folders whose mtime changed. Returns (tree, changed)."""
+    changed = False
+    root_mtime = os.stat(base_path).st_mtime_ns
+    old_sites = tree.get("sites", {})
+    if tree.get("root_mtime_ns") == root_mtime:
+        site_names = list(old_sites)
+    else:
+        site_names = sorted(name for name in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, name)))
+        changed = True
+
+    sites = {}
+    for site in site_names:
+        site_path = os.path.join(base_path, site)
+        old = old_sites.get(site, {})
+        try:
+            site_mtime = os.stat(site_path).st_mtime_ns
+        except FileNotFoundError:
+            changed = True
+            continue
+        old_pairs = old.get("date_pairs", {})
+        if old.get("mtime_ns") == site_mtime:
+            pair_names = list(old_pairs)
+        else:
+            pair_names = sorted(name for name in os.listdir(site_path) if '-' in name and os.path.isdir(os.path.join(site_path, name)))
+            changed = True
+
+        date_pairs = {}
+        for date_pair in pair_names:
+            folder = os.path.join(site_path, date_pair)
+            try:
+                pair_mtime = os.stat(folder).st_mtime_ns
+            except FileNotFoundError:
+                changed = True
+                continue
+            old_pair = old_pairs.get(date_pair, {})
+            if old_pair.get("mtime_ns") == pair_mtime:
+                date_pairs[date_pair] = old_pair
+            else:
+                date_pairs[date_pair] = {"mtime_ns": pair_mtime, "bergs": _scan_date_pair(folder, date_pair)}
+                changed = True
+        sites[site] = {"mtime_ns": site_mtime, "date_pairs": date_pairs}
+
+    return {"version": CATALOG_VERSION, "base_path": os.path.abspath(base_path), "root_mtime_ns": root_mtime, "sites": sites}, changed
+
+
+class ShapefileCatalog:
+    """Site -> date pair -> berg shapefiles of one Iceberg-shapefiles tree, kept up to date incrementally."""
+
+    def __init__(self, base_path=app_paths.shapefiles_path(), index_path=CATALOG_INDEX_PATH):
+        self.base_path = base_path
+        self.index_path = index_path
+        self.tree = self._read_index()
+        self._lock = threading.Lock()
+        self._dirty = True
+        self._checked_at = 0.0
+        self._observer = None
+        self.refreshes = 0
+        self.rescanned_at = None
+
+    def _read_index(self):
+        try:
+            with open(self.index_path) as f:
+                tree = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if tree.get("version") != CATALOG_VERSION or tree.get("base_path") != os.path.abspath(self.base_path):
+            return {}
+        return tree
+
+    def _write_index(self):
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.tree, f)
+        os.replace(tmp_path, self.index_path)
+
+    def watch(self):
+        """Watch the tree with watchdog (if installed) so unchanged reruns skip the mtime checks."""
+        if self._observer is not None or not os.path.isdir(self.base_path):
+            return self._observer is not None
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return False
+
+        catalog = self
+
+        class _MarkDirty(FileSystemEventHandler):
+            def on_any_event(self, event):
+                # Only adding, removing or renaming changes the catalog (not reading or rewriting a file).
+                if event.event_type in ("created", "deleted", "moved"):
+                    catalog._dirty = True
+
+        observer = Observer()
+        observer.daemon = True
+        observer.schedule(_MarkDirty(), self.base_path, recursive=True)
+        try:
+            observer.start()
+        except OSError:
+            # e.g. out of inotify watches; polling the mtimes still works.
+            return False
+        self._observer = observer
+        return True
+
+    # This function will bring the catalog up to date, as cheaply as the situation allows:
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force:
+            if self._observer is not None and not self._dirty:
+                return self
+            if self._observer is None and now - self._checked_at < CATALOG_POLL_SECONDS:
+                return self
+        with self._lock:
+            self._dirty = False
+            self._checked_at = now
+            if not os.path.isdir(self.base_path):
+                self.tree = {}
+                return self
+            tree, changed = _refresh_tree(self.base_path, {} if force else self.tree)
+            self.tree = tree
+            if changed:
+                self.refreshes += 1
+                self.rescanned_at = time.time()
+                try:
+                    self._write_index()
+                except OSError:
+                    pass  # A read-only derived folder only costs a rescan on the next start.
+        return self
+
+    def sites(self):
+        return list(self.tree.get("sites", {}))
+
+    def date_pairs(self, site):
+        return list(self.tree.get("sites", {}).get(site, {}).get("date_pairs", {}))
+
+    def bergs(self, site, date_pair):
+        return self.tree.get("sites", {}).get(site, {}).get("date_pairs", {}).get(date_pair, {}).get("bergs", [])
+
+    def shapefiles(self, site, date_pair, readable_only=True):
+        """Names of the .shp files of a date pair (by default only those that can be read)."""
+        return [berg["file"] for berg in self.bergs(site, date_pair) if berg["readable"] or not readable_only]
+
+    def iter_date_pairs(self, sites=None):
+        for site in self.sites():
+            if sites and site not in sites:
+                continue
+            for date_pair in self.date_pairs(site):
+                yield site, date_pair
+
+    def incomplete(self):
+        """(site, date pair, file, missing extensions) for every shapefile missing a sidecar file."""
+        return [(site, date_pair, berg["file"], berg["missing"])
+                for site, date_pair in self.iter_date_pairs() for berg in self.bergs(site, date_pair) if berg["missing"]]
+
+    def stats(self):
+        pairs = list(self.iter_date_pairs())
+        return {
+            "sites": len(self.sites()),
+            "date_pairs": len(pairs),
+            "shapefiles": sum(len(self.bergs(site, date_pair)) for site, date_pair in pairs),
+            "incomplete": len(self.incomplete()),
+            "unreadable": sum(1 for *_, missing in self.incomplete() if any(ext in REQUIRED_EXTENSIONS for ext in missing)),
+            "watching": self._observer is not None,
+            "refreshes": self.refreshes,
+            "rescanned_at": self.rescanned_at,
+        }
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+# This function is what the pages use to get the (up to date) shapefile catalog:
+def get_catalog(base_path=app_paths.shapefiles_path()):
+    key = os.path.abspath(base_path)
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is None:
+            catalog = _catalogs[key] = ShapefileCatalog(base_path)
+            catalog.watch()
+    return catalog.refresh()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan Iceberg-shapefiles/ into the shapefile catalog.")
+    parser.add_argument("command", choices=["scan"])
+    parser.add_argument("--base", default=app_paths.shapefiles_path(), help="Iceberg-shapefiles directory")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    catalog = ShapefileCatalog(args.base).refresh(force=True)
+    stats = catalog.stats()
+    print(f"{stats['sites']} sites, {stats['date_pairs']} date pairs, {stats['shapefiles']} shapefiles in {time.perf_counter() - start:.2f} s -> {catalog.index_path}")
+    for site, date_pair, name, missing in catalog.incomplete():
+        status = "unreadable" if any(ext in REQUIRED_EXTENSIONS for ext in missing) else "incomplete"
+        print(f"  {status}: {site}/{date_pair}/{name} (missing {', '.join(missing)})")
+
+
+if __name__ == "__main__":
+    main()